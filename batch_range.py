@@ -0,0 +1,269 @@
+"""
+War Thunder Rangefinder - Batch Ranging
+Runs the overlay's marker and player detection over a directory of
+screenshots, in parallel, streaming one result row per image
+
+Usage:
+    python batch_range.py shots/                         # saved calibration, CSV to stdout
+    python batch_range.py shots/ --out results.jsonl     # JSON Lines
+    python batch_range.py shots/ --map 1500 660 1900 1060 --map-size 16
+    python batch_range.py crops/ --minimap --map-size 16 --out results.csv
+    python batch_range.py shots/ --locate --workers 8
+
+The map rectangle comes from ``--map`` (screen pixels), ``--minimap``
+(images are already minimap crops), ``--locate`` (found on each image as
+F9 does) or, by default, the saved calibration for the screenshot's
+resolution. Without ``--map-size`` the map size is the saved one, or is
+derived from the grid on each map as F6 does (``--grid-size`` km per
+square); a map without a readable grid gets an error row, as does any
+image whose ranging fails. Workers receive paths and return small rows,
+so memory stays flat however many images there are.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from frame_sources import BBox, DirectoryFrameSource
+from rangefinder_core import MapConfig
+
+FIELDS = ['path', 'width', 'height', 'map_left', 'map_top', 'map_right', 'map_bottom',
+          'map_km', 'found', 'marker_x', 'marker_y', 'player_found', 'player_x', 'player_y',
+          'metres', 'ms', 'error']
+
+# Per-process state, set up once by _init_worker
+_analyzer = None
+_options: Dict = {}
+_profiles: Dict[Tuple[int, int], Optional[object]] = {}
+
+
+def list_images(directory: str) -> List[str]:
+    """Screenshot paths in name order"""
+    return sorted(entry.path for entry in os.scandir(directory)
+                  if entry.is_file() and entry.name.lower().endswith(DirectoryFrameSource.EXTENSIONS))
+
+
+def _init_worker(options: Dict):
+    global _analyzer, _options
+    import cv2
+    from detection_worker import FrameAnalyzer
+    # One OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    _analyzer = FrameAnalyzer()
+    _options = options
+
+
+def saved_calibration(profiles_path: str, size: Tuple[int, int], key: Optional[str] = None):
+    """The calibration saved under ``key``, else the newest for a resolution"""
+    from calibration_profiles import ProfileStore
+    store = ProfileStore(profiles_path)
+    if key is not None:
+        return store.get(key)
+    prefix = f"{size[0]}x{size[1]}/"
+    matches = [p for k, p in store.profiles.items() if k.startswith(prefix)]
+    return max(matches, key=lambda p: p.saved_at) if matches else None
+
+
+def map_size_from_grid(frame, grid_size_km: float,
+                       pitch: Optional[float] = None) -> Optional[float]:
+    """Map size in km from the grid squares across a minimap, as F6 derives it"""
+    from grid_detection import detect_grid_pitch
+    if pitch is None:
+        estimate = detect_grid_pitch(frame)
+        if estimate is None:
+            return None
+        pitch = estimate.pitch
+    height, width = frame.shape[:2]
+    config = MapConfig(top_left=(0, 0), bottom_right=(width, height),
+                       grid_size_km=grid_size_km, grid_pixel_size=pitch)
+    return config.auto_calculate_map_size()
+
+
+def positive_float(text: str) -> float:
+    """argparse type for sizes: a number above zero"""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, not {text}")
+    return value
+
+
+def _stored_profile(size: Tuple[int, int]):
+    """Saved calibration for a screen resolution (cached per process)"""
+    if size not in _profiles:
+        _profiles[size] = saved_calibration(_options['profiles'], size, _options['profile_key'])
+    return _profiles[size]
+
+
+def _map_for(image) -> Tuple[Optional[BBox], Optional[float], Optional[float], str]:
+    """Minimap bbox, map size and grid pitch (when known) for one screenshot,
+    or an error. A ``None`` size is derived from the grid by the caller."""
+    height, width = image.shape[:2]
+    map_size = _options['map_size']
+    mode = _options['mode']
+    if mode == 'map':
+        return tuple(_options['map']), map_size, None, ""
+    if mode == 'minimap':
+        return (0, 0, width, height), map_size, None, ""
+    if mode == 'locate':
+        from map_locator import find_minimap
+        location = find_minimap(image)
+        if location is None:
+            return None, None, None, "map not found"
+        return location.bbox, map_size, location.grid.pitch, ""
+    profile = _stored_profile((width, height))
+    if profile is None:
+        return None, None, None, f"no saved calibration for {width}x{height}"
+    return profile.bbox, map_size or profile.map_size_km, None, ""
+
+
+def range_image(path: str) -> Dict:
+    """Detect the marker and player in one screenshot and range between them.
+
+    Never raises: a failure becomes the row's ``error``, so one bad image
+    can't abort the pool's ``imap`` and lose the rest of the batch.
+    """
+    row: Dict = {'path': path, 'found': False, 'player_found': False, 'error': ""}
+    try:
+        _range_into(row, path)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _range_into(row: Dict, path: str):
+    """Fill ``row`` for one screenshot; expected failures set ``row['error']``"""
+    from frame_sources import load_rgb
+    from rangefinder_core import ranges_from_m
+
+    start = time.perf_counter()
+    try:
+        image = load_rgb(path)
+    except (OSError, ValueError) as e:
+        row['error'] = f"unreadable: {e}"
+        return
+    row['height'], row['width'] = image.shape[:2]
+
+    bbox, map_size, pitch, error = _map_for(image)
+    if bbox is None:
+        row['error'] = error
+        return
+    row['map_left'], row['map_top'], row['map_right'], row['map_bottom'] = bbox
+    frame = image[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+    if frame.shape[0] != bbox[3] - bbox[1] or frame.shape[1] != bbox[2] - bbox[0]:
+        row['error'] = "map rectangle outside the image"
+        return
+    if map_size is None:
+        map_size = map_size_from_grid(frame, _options['grid_size'], pitch)
+        if map_size is None:
+            row['error'] = "grid not found, pass --map-size"
+            return
+    row['map_km'] = round(map_size, 2)
+
+    # Screenshots are unrelated, so no fix carries over between them
+    _analyzer.tracker.reset()
+    _analyzer.player_locator.reset()
+    result, _, player = _analyzer.analyze(frame, bbox, start, range_all=False)
+
+    config = MapConfig(top_left=bbox[:2], bottom_right=bbox[2:], map_size_km=map_size)
+    if player.found:
+        row['player_found'] = True
+        row['player_x'], row['player_y'] = (round(v, 1) for v in player.center)
+    if result.found and result.center is not None:
+        row['found'] = True
+        row['marker_x'], row['marker_y'] = (int(v) for v in result.center)
+        origin = player.center if player.found else config.centre
+        row['metres'] = round(float(ranges_from_m(config, origin, result.center)), 1)
+    row['ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def run_batch(paths: List[str], options: Dict, workers: int,
+              chunksize: int = 4) -> Iterator[Dict]:
+    """Rows for ``paths`` in order, computed by ``workers`` processes"""
+    if workers <= 1:
+        _init_worker(options)
+        for path in paths:
+            yield range_image(path)
+        return
+    with get_context('spawn').Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        yield from pool.imap(range_image, paths, chunksize=chunksize)
+
+
+class RowWriter:
+    """Streams rows as CSV (with ``fields`` as columns) or JSON Lines"""
+
+    def __init__(self, stream, json_lines: bool, fields: List[str] = FIELDS):
+        self.stream = stream
+        self.json_lines = json_lines
+        if not json_lines:
+            self.csv = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, row: Dict):
+        if self.json_lines:
+            self.stream.write(json.dumps(row) + "\n")
+        else:
+            self.csv.writerow(row)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Range every screenshot in a directory")
+    parser.add_argument('directory', help="Folder of PNG/JPG/BMP screenshots")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument('--map', nargs=4, type=int, metavar=('LEFT', 'TOP', 'RIGHT', 'BOTTOM'),
+                       help="Minimap rectangle in screenshot pixels")
+    where.add_argument('--minimap', action='store_true', help="Images are minimap crops")
+    where.add_argument('--locate', action='store_true', help="Find the minimap on each image")
+    where.add_argument('--profile-key', help="Use this saved calibration (default: by resolution)")
+    parser.add_argument('--profiles', default=None, help="Calibration profiles file")
+    parser.add_argument('--map-size', type=positive_float,
+                        help="Map size in km (default: saved, else read from the grid)")
+    parser.add_argument('--grid-size', type=positive_float, default=MapConfig.grid_size_km,
+                        help="Grid square size in km, to derive the map size (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes")
+    parser.add_argument('--out', help="Output file; .jsonl/.json for JSON Lines, else CSV")
+    parser.add_argument('--jsonl', action='store_true', help="JSON Lines on stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from calibration_profiles import PROFILE_PATH
+
+    if args.map:
+        mode = 'map'
+    elif args.minimap:
+        mode = 'minimap'
+    elif args.locate:
+        mode = 'locate'
+    else:
+        mode = 'profile'
+    options = {'mode': mode, 'map': args.map, 'map_size': args.map_size, 'grid_size': args.grid_size,
+               'profile_key': args.profile_key, 'profiles': args.profiles or PROFILE_PATH}
+
+    paths = list_images(args.directory)
+    json_lines = args.jsonl or (args.out or '').lower().endswith(('.jsonl', '.json'))
+    stream = open(args.out, 'w', newline='') if args.out else sys.stdout
+    writer = RowWriter(stream, json_lines)
+
+    start = time.perf_counter()
+    found = failed = 0
+    try:
+        for row in run_batch(paths, options, args.workers):
+            writer.write(row)
+            found += row['found']
+            failed += bool(row['error'])
+    finally:
+        if args.out:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} images in {elapsed:.1f} s ({len(paths) / max(elapsed, 1e-9):.1f}/s, "
+          f"{args.workers} workers): marker found in {found}, {failed} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+War Thunder Rangefinder - Detection Benchmark
+Measures marker detection latency and accuracy on synthetic minimaps
+
+Usage:
+    python bench_detection.py
+    python bench_detection.py --sizes 1080p 4K --frames 200 --decoys 40
+    python bench_detection.py --json bench_results.json
+    python bench_detection.py --tracemalloc
+    python bench_detection.py --track
+    python bench_detection.py --player
+    python bench_detection.py --capture
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from capture_backends import SCREEN_BACKENDS, open_backend, time_grabs
+from frame_sources import ArrayFrameSource, DirectoryFrameSource, SyntheticMinimap, render_minimap
+from marker_detection import MarkerDetector, MarkerResult, PyramidMarkerDetector, detect_marker
+from marker_tracking import MarkerTracker
+from player_locator import PlayerLocator
+
+# Approximate tactical map size (pixels, square) at each screen resolution
+MINIMAP_SIZES = {
+    '1080p': 900,
+    '1440p': 1200,
+    '4K': 1800,
+}
+
+# Detector name -> callable(frame, timings) used by both editions
+DETECTORS: Dict[str, Callable[[np.ndarray, Optional[Dict[str, float]]], MarkerResult]] = {
+    'hsv': detect_marker,
+    'prealloc': MarkerDetector().detect,
+    'lut': MarkerDetector(classifier='lut').detect,
+    'pyramid': PyramidMarkerDetector().detect,
+    'pyramid-lut': PyramidMarkerDetector(classifier='lut').detect,
+}
+
+PERCENTILES = (50, 95, 99)
+
+# Player-icon lookup runs on every capture next to marker detection, so it
+# gets its own p95 budget (ms) regardless of minimap size
+PLAYER_BUDGET_MS = 2.0
+
+
+@dataclass
+class BenchResult:
+    """Aggregated numbers for one detector at one minimap size"""
+    detector: str
+    size: str
+    pixels: int
+    frames: int
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)  # stage -> pNN -> ms
+    total: Dict[str, float] = field(default_factory=dict)  # pNN -> ms
+    scans_per_second: float = 0.0
+    detection_rate: float = 0.0
+    mean_error_px: float = 0.0
+    max_error_px: float = 0.0
+    alloc_bytes_per_scan: Optional[float] = None  # Mean tracemalloc peak, if measured
+    budget_ms: Optional[float] = None  # p95 latency budget, if the stage has one
+
+
+def build_corpus(size: int, frames: int, noise: float, decoys: int,
+                 seed: int) -> List[SyntheticMinimap]:
+    """Render a deterministic set of minimaps with random marker positions"""
+    rng = np.random.default_rng(seed)
+    margin = max(8, size // 20)
+    corpus = []
+    for _ in range(frames):
+        marker = (float(rng.integers(margin, size - margin)),
+                  float(rng.integers(margin, size - margin)))
+        player = (float(rng.integers(margin, size - margin)),
+                  float(rng.integers(margin, size - margin)))
+        corpus.append(render_minimap(size, size, marker=marker, noise=noise,
+                                     decoys=decoys, rng=rng, player=player,
+                                     player_heading=float(rng.uniform(0, 360))))
+    return corpus
+
+
+def build_track(size: int, frames: int, noise: float, decoys: int, seed: int,
+                speed: float = 4.0, jump_every: int = 50) -> List[SyntheticMinimap]:
+    """Render a sequence with a drifting marker that is re-placed now and then.
+
+    The player icon drives slowly across the map, facing where it goes.
+    """
+    rng = np.random.default_rng(seed)
+    margin = max(8, size // 20)
+    position = rng.uniform(margin, size - margin, 2)
+    velocity = rng.normal(0, speed, 2)
+    player = rng.uniform(margin, size - margin, 2)
+    player_velocity = rng.normal(0, speed / 4, 2)
+    corpus = []
+    for i in range(frames):
+        if jump_every and i and i % jump_every == 0:
+            position = rng.uniform(margin, size - margin, 2)
+        velocity = 0.9 * velocity + rng.normal(0, speed * 0.3, 2)
+        position = np.clip(position + velocity, margin, size - margin)
+        player_velocity = 0.95 * player_velocity + rng.normal(0, speed * 0.05, 2)
+        player = np.clip(player + player_velocity, margin, size - margin)
+        heading = float(np.degrees(np.arctan2(player_velocity[0], -player_velocity[1])))
+        corpus.append(render_minimap(size, size, marker=(float(position[0]), float(position[1])),
+                                     noise=noise, decoys=decoys, rng=rng,
+                                     player=(float(player[0]), float(player[1])),
+                                     player_heading=heading))
+    return corpus
+
+
+def percentiles_ms(samples: List[float]) -> Dict[str, float]:
+    """Convert a list of second timings into pNN milliseconds"""
+    if not samples:
+        return {f'p{p}': 0.0 for p in PERCENTILES}
+    values = np.percentile(np.asarray(samples) * 1000.0, PERCENTILES)
+    return {f'p{p}': float(v) for p, v in zip(PERCENTILES, values)}
+
+
+def measure_allocations(detector_name: str, corpus: List[SyntheticMinimap]) -> float:
+    """Mean peak bytes allocated by one scan, as seen by tracemalloc"""
+    detector = DETECTORS[detector_name]
+    detector(corpus[0].frame, None)  # Let lazily sized buffers settle first
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for minimap in corpus:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            detector(minimap.frame, None)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks))
+
+
+def run_benchmark(detector_name: str, size_name: str, corpus: List[SyntheticMinimap],
+                  warmup: int = 3) -> BenchResult:
+    """Time one detector over a corpus and score its localisation error"""
+    detector = DETECTORS[detector_name]
+
+    for minimap in corpus[:warmup]:
+        detector(minimap.frame, None)
+
+    stage_samples: Dict[str, List[float]] = {}
+    totals = []
+    errors = []
+    detected = 0
+    for minimap in corpus:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        result = detector(minimap.frame, timings)
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stage_samples.setdefault(stage, []).append(seconds)
+
+        if result.center is not None and minimap.marker is not None:
+            detected += 1
+            errors.append(float(np.hypot(result.center[0] - minimap.marker[0],
+                                         result.center[1] - minimap.marker[1])))
+
+    height, width = corpus[0].frame.shape[:2]
+    return BenchResult(
+        detector=detector_name,
+        size=size_name,
+        pixels=width * height,
+        frames=len(corpus),
+        stages={stage: percentiles_ms(samples) for stage, samples in stage_samples.items()},
+        total=percentiles_ms(totals),
+        scans_per_second=len(totals) / sum(totals) if totals else 0.0,
+        detection_rate=detected / len(corpus) if corpus else 0.0,
+        mean_error_px=float(np.mean(errors)) if errors else float('nan'),
+        max_error_px=float(np.max(errors)) if errors else float('nan'),
+    )
+
+
+def run_tracking_benchmark(size_name: str, corpus: List[SyntheticMinimap],
+                           classifier: str = 'hsv', tick: float = 0.1) -> BenchResult:
+    """Time ROI tracking over a moving-marker sequence, one scan per tick"""
+    size = corpus[0].frame.shape[0]
+    map_bbox = (0, 0, size, size)
+    tracker = MarkerTracker(classifier=classifier)
+    tracker.detector.detect(corpus[0].frame)  # Build buffers / LUT outside the timings
+
+    totals = []
+    errors = []
+    detected = 0
+    for i, minimap in enumerate(corpus):
+        source = ArrayFrameSource([minimap.frame], origin=(0, 0))
+        start = time.perf_counter()
+        result = tracker.scan(source, map_bbox, now=i * tick)
+        totals.append(time.perf_counter() - start)
+        if result.center is not None:
+            detected += 1
+            errors.append(float(np.hypot(result.center[0] - minimap.marker[0],
+                                         result.center[1] - minimap.marker[1])))
+
+    scans = tracker.roi_scans + tracker.full_scans
+    return BenchResult(
+        detector=f'track-{classifier} (roi {tracker.roi_scans}/{scans}, fallbacks {tracker.fallbacks})',
+        size=size_name,
+        pixels=size * size,
+        frames=len(corpus),
+        total=percentiles_ms(totals),
+        scans_per_second=len(totals) / sum(totals) if totals else 0.0,
+        detection_rate=detected / len(corpus) if corpus else 0.0,
+        mean_error_px=float(np.mean(errors)) if errors else float('nan'),
+        max_error_px=float(np.max(errors)) if errors else float('nan'),
+    )
+
+
+def run_player_benchmark(size_name: str, corpus: List[SyntheticMinimap]) -> BenchResult:
+    """Time the player-icon locator over a sequence, scored against its budget"""
+    size = corpus[0].frame.shape[0]
+    locator = PlayerLocator()
+
+    stage_samples: Dict[str, List[float]] = {}
+    totals = []
+    errors = []
+    detected = 0
+    for minimap in corpus:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        result = locator.locate(minimap.frame, timings)
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stage_samples.setdefault(stage, []).append(seconds)
+        if result.found and minimap.player is not None:
+            detected += 1
+            errors.append(float(np.hypot(result.center[0] - minimap.player[0],
+                                         result.center[1] - minimap.player[1])))
+
+    return BenchResult(
+        detector=f'player (roi {locator.roi_scans}/{len(corpus)}, acquisitions {locator.acquisitions})',
+        size=size_name,
+        pixels=size * size,
+        frames=len(corpus),
+        stages={stage: percentiles_ms(samples) for stage, samples in stage_samples.items()},
+        total=percentiles_ms(totals),
+        scans_per_second=len(totals) / sum(totals) if totals else 0.0,
+        detection_rate=detected / len(corpus) if corpus else 0.0,
+        mean_error_px=float(np.mean(errors)) if errors else float('nan'),
+        max_error_px=float(np.max(errors)) if errors else float('nan'),
+        budget_ms=PLAYER_BUDGET_MS,
+    )
+
+
+def run_capture_benchmark(size_name: str, corpus: List[SyntheticMinimap],
+                          backends: List[str]) -> List[BenchResult]:
+    """Time ``grab`` of a minimap-sized region for each capture backend.
+
+    ``array`` (in-memory frames) is the floor and ``file`` replays PNGs of
+    the corpus from disk; screen backends grab the top-left of the real
+    screen, clipped to it, and are skipped with a note when unavailable.
+    """
+    size = corpus[0].frame.shape[0]
+    bbox = (0, 0, size, size)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for index, minimap in enumerate(corpus[:10]):
+            cv2.imwrite(os.path.join(directory, f'{index:03d}.png'),
+                        cv2.cvtColor(minimap.frame, cv2.COLOR_RGB2BGR))
+        for name in ['array', 'file'] + backends:
+            try:
+                if name == 'array':
+                    source = ArrayFrameSource([m.frame for m in corpus], origin=(0, 0))
+                elif name == 'file':
+                    source = DirectoryFrameSource(directory, origin=(0, 0))
+                else:
+                    source = open_backend(name)
+            except Exception as exc:
+                print(f"[capture-{name}] {size_name}: unavailable ({exc})")
+                continue
+            try:
+                frame = source.grab(bbox)
+                samples = time_grabs(source, bbox, len(corpus))
+            except Exception as exc:
+                print(f"[capture-{name}] {size_name}: grab failed ({exc or type(exc).__name__})")
+                continue
+            finally:
+                source.close()
+            grabs = percentiles_ms(samples)
+            results.append(BenchResult(
+                detector=f'capture-{name}',
+                size=size_name,
+                pixels=frame.shape[0] * frame.shape[1],
+                frames=len(samples),
+                stages={'grab': grabs},
+                total=grabs,
+                scans_per_second=len(samples) / sum(samples) if sum(samples) else 0.0,
+                mean_error_px=float('nan'),
+                max_error_px=float('nan'),
+            ))
+    return results
+
+
+def format_result(result: BenchResult) -> str:
+    """Render one result as a readable text block"""
+    lines = [
+        f"[{result.detector}] {result.size} "
+        f"({int(np.sqrt(result.pixels))}px square, {result.frames} frames)",
+        f"  {'stage':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for stage, values in result.stages.items():
+        lines.append(f"  {stage:<14}{values['p50']:>10.3f}{values['p95']:>10.3f}{values['p99']:>10.3f}")
+    lines.append(f"  {'total':<14}{result.total['p50']:>10.3f}"
+                 f"{result.total['p95']:>10.3f}{result.total['p99']:>10.3f}")
+    if result.detector.startswith('capture-'):
+        lines.append(f"  throughput: {result.scans_per_second:.1f} grabs/s")
+    else:
+        lines.append(f"  throughput: {result.scans_per_second:.1f} scans/s   "
+                     f"detected: {result.detection_rate * 100:.1f}%   "
+                     f"error: mean {result.mean_error_px:.2f}px, max {result.max_error_px:.2f}px")
+    if result.alloc_bytes_per_scan is not None:
+        lines.append(f"  allocated: {result.alloc_bytes_per_scan / 1024:.1f} KiB/scan (tracemalloc peak)")
+    if result.budget_ms is not None:
+        verdict = 'OK' if result.total['p95'] <= result.budget_ms else 'OVER BUDGET'
+        lines.append(f"  budget: p95 {result.total['p95']:.3f} ms of {result.budget_ms:.1f} ms ({verdict})")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark yellow marker detection")
+    parser.add_argument('--sizes', nargs='+', default=list(MINIMAP_SIZES),
+                        choices=list(MINIMAP_SIZES), help="Minimap sizes to test")
+    parser.add_argument('--detectors', nargs='+', default=list(DETECTORS),
+                        choices=list(DETECTORS), help="Detector variants to test")
+    parser.add_argument('--frames', type=int, default=100, help="Frames per size")
+    parser.add_argument('--noise', type=float, default=6.0, help="Terrain noise sigma")
+    parser.add_argument('--decoys', type=int, default=20, help="Yellow decoy specks per frame")
+    parser.add_argument('--seed', type=int, default=1234, help="Corpus RNG seed")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Also measure bytes allocated per scan (slower)")
+    parser.add_argument('--track', action='store_true',
+                        help="Also benchmark ROI tracking on a moving marker")
+    parser.add_argument('--player', action='store_true',
+                        help="Also benchmark the player-icon locator against its budget")
+    parser.add_argument('--capture', nargs='*', metavar='BACKEND',
+                        choices=list(SCREEN_BACKENDS),
+                        help="Also time frame capture per backend (default: all screen backends)")
+    parser.add_argument('--json', metavar='PATH', help="Also write results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for size_name in args.sizes:
+        size = MINIMAP_SIZES[size_name]
+        corpus = build_corpus(size, args.frames, args.noise, args.decoys, args.seed)
+        for detector_name in args.detectors:
+            result = run_benchmark(detector_name, size_name, corpus)
+            if args.tracemalloc:
+                result.alloc_bytes_per_scan = measure_allocations(detector_name, corpus)
+            results.append(result)
+            print(format_result(result))
+            print()
+
+        if args.track:
+            track = build_track(size, args.frames, args.noise, args.decoys, args.seed)
+            for detector_name in args.detectors:
+                baseline = run_benchmark(detector_name, size_name, track)
+                baseline.detector += ' (moving)'
+                results.append(baseline)
+                print(format_result(baseline))
+                print()
+            result = run_tracking_benchmark(size_name, track)
+            results.append(result)
+            print(format_result(result))
+            print()
+
+        if args.player:
+            track = build_track(size, args.frames, args.noise, args.decoys, args.seed)
+            result = run_player_benchmark(size_name, track)
+            results.append(result)
+            print(format_result(result))
+            print()
+
+        if args.capture is not None:
+            backends = args.capture or list(SCREEN_BACKENDS)
+            for result in run_capture_benchmark(size_name, corpus, backends):
+                results.append(result)
+                print(format_result(result))
+                print()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([result.__dict__ for result in results], f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+War Thunder Rangefinder - Calibration Profiles
+Saved map calibrations keyed by screen resolution and game window layout
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from frame_sources import BBox
+from paths import CACHE_DIR
+
+PROFILE_PATH = os.path.join(CACHE_DIR, 'profiles.json')
+PROFILE_VERSION = 1
+
+# A real minimap is textured; a flat capture means the bbox is off-map
+MIN_FRAME_STDDEV = 4.0
+
+# Median darkening (grey levels) of grid lines at the saved pitch; a pitch
+# that no longer fits scores about 0-5
+MIN_GRID_CONTRAST = 8.0
+
+
+@dataclass
+class CalibrationProfile:
+    """Everything F6/F9 and the size fields set up"""
+    top_left: Tuple[int, int]
+    bottom_right: Tuple[int, int]
+    map_size_km: float
+    grid_size_km: float
+    grid_pixel_size: Optional[float] = None
+    map_size_manual: bool = False
+    saved_at: float = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> 'CalibrationProfile':
+        return cls(top_left=tuple(config.top_left),
+                   bottom_right=tuple(config.bottom_right),
+                   map_size_km=config.map_size_km,
+                   grid_size_km=config.grid_size_km,
+                   grid_pixel_size=config.grid_pixel_size,
+                   map_size_manual=config.map_size_manual,
+                   saved_at=time.time())
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CalibrationProfile':
+        return cls(top_left=tuple(data['top_left']),
+                   bottom_right=tuple(data['bottom_right']),
+                   map_size_km=float(data['map_size_km']),
+                   grid_size_km=float(data['grid_size_km']),
+                   grid_pixel_size=data.get('grid_pixel_size'),
+                   map_size_manual=bool(data.get('map_size_manual', False)),
+                   saved_at=float(data.get('saved_at', 0.0)))
+
+    @property
+    def bbox(self) -> BBox:
+        return (self.top_left[0], self.top_left[1],
+                self.bottom_right[0], self.bottom_right[1])
+
+    def apply(self, config):
+        """Copy this calibration into a ``MapConfig``"""
+        config.top_left = self.top_left
+        config.bottom_right = self.bottom_right
+        config.map_size_km = self.map_size_km
+        config.grid_size_km = self.grid_size_km
+        config.grid_pixel_size = self.grid_pixel_size
+        config.map_size_manual = self.map_size_manual
+
+
+def game_window_rect() -> Optional[BBox]:
+    """Screen rect of the War Thunder window, if it can be found (Windows only)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        hwnd = user32.FindWindowW(None, "War Thunder")
+        if not hwnd:
+            return None
+        rect = wintypes.RECT()
+        if not user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+            return None
+        return rect.left, rect.top, rect.right, rect.bottom
+    except (AttributeError, OSError):
+        return None
+
+
+def layout_key(screen_size: Tuple[int, int], window_rect: Optional[BBox] = None) -> str:
+    """Profile key, e.g. ``2560x1440/window 0,0,1920,1080`` or ``2560x1440/screen``"""
+    key = f"{screen_size[0]}x{screen_size[1]}"
+    if window_rect is None:
+        return key + "/screen"
+    return key + "/window " + ",".join(str(v) for v in window_rect)
+
+
+class ProfileStore:
+    """JSON file of calibration profiles, one per layout key"""
+
+    def __init__(self, path: str = PROFILE_PATH):
+        self.path = path
+        self.profiles: Dict[str, CalibrationProfile] = {}
+        self.load()
+
+    def load(self):
+        """Read profiles from disk; a missing or corrupt file means none"""
+        self.profiles = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != PROFILE_VERSION:
+                return
+            for key, entry in data.get('profiles', {}).items():
+                self.profiles[key] = CalibrationProfile.from_dict(entry)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.profiles = {}
+
+    def get(self, key: str) -> Optional[CalibrationProfile]:
+        return self.profiles.get(key)
+
+    def put(self, key: str, profile: CalibrationProfile):
+        """Store a profile and write the file"""
+        self.profiles[key] = profile
+        self.save()
+
+    def save(self):
+        """Write all profiles, replacing the file atomically"""
+        data = {'version': PROFILE_VERSION,
+                'profiles': {key: asdict(p) for key, p in self.profiles.items()}}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Profiles are a convenience only
+
+
+def _line_contrast(profile: np.ndarray, pitch: float) -> float:
+    """Median darkening of the grid lines in one mean profile at ``pitch``"""
+    size = profile.size
+    bins = max(2, int(round(pitch)))
+    phase_bin = ((np.arange(size) % pitch) / pitch * bins).astype(np.int64) % bins
+    counts = np.bincount(phase_bin, minlength=bins)
+    sums = np.bincount(phase_bin, weights=profile, minlength=bins)
+    phase = np.argmin(sums / np.maximum(counts, 1)) * pitch / bins
+
+    lines = np.round(np.arange(phase, size - 1, pitch)).astype(np.int64)
+    lines = lines[(lines >= 1) & (lines < size - 1)]
+    mids = np.round(lines + pitch / 2).astype(np.int64) % size
+    line_values = np.minimum(np.minimum(profile[lines - 1], profile[lines]), profile[lines + 1])
+    return float(np.median(profile[mids] - line_values))
+
+
+def grid_contrast(frame: np.ndarray, pitch: float, tolerance: float = 0.02) -> float:
+    """How much darker the grid lines are near ``pitch``, in grey levels.
+
+    Row and column mean profiles are folded modulo the pitch to find the
+    grid phase. Each predicted line position is then compared with the
+    point half a pitch away, and the median difference is used, so a
+    pitch that no longer fits (lines drift off the predictions) scores
+    near zero. Pitches within ``tolerance`` are tried because clicked
+    measurements are a pixel or so off; the weaker axis is returned.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    if min(gray.shape) < 2 * pitch + 3:
+        return 0.0
+    profiles = [cv2.reduce(gray, axis, cv2.REDUCE_AVG, dtype=cv2.CV_32F).ravel()
+                for axis in (0, 1)]
+    candidates = pitch * (1 + np.linspace(-tolerance, tolerance, 17))
+    return min(max(_line_contrast(profile, p) for p in candidates) for profile in profiles)
+
+
+def validate_profile(profile: CalibrationProfile, frame: Optional[np.ndarray]) -> bool:
+    """Check a quick capture of the saved bbox still looks like the minimap"""
+    if frame is None or frame.size == 0:
+        return False
+    width = profile.bottom_right[0] - profile.top_left[0]
+    height = profile.bottom_right[1] - profile.top_left[1]
+    if frame.shape[0] != height or frame.shape[1] != width:
+        return False
+    if float(frame.std()) < MIN_FRAME_STDDEV:
+        return False
+    if profile.grid_pixel_size:
+        return grid_contrast(frame, profile.grid_pixel_size) >= MIN_GRID_CONTRAST
+    return True
@@ -0,0 +1,417 @@
+"""
+War Thunder Rangefinder - Capture Backends
+Screen capture implementations behind the ``FrameSource`` interface, and a
+startup probe that picks the fastest one that works on this machine
+
+Backends:
+    pil   - PIL ImageGrab (Windows, macOS, X11); a full copy per call
+    xshm  - X11 MIT-SHM via ctypes; the X server writes straight into a
+            shared memory segment that is reused between grabs
+    file  - screenshots from a directory or a single image (replay/tests)
+
+``WT_CAPTURE_BACKEND`` (e.g. ``xshm`` or ``file:shots/``) overrides the probe.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import cv2
+
+from frame_sources import (ArrayFrameSource, BBox, DirectoryFrameSource, FrameSource,
+                           ScreenFrameSource, load_rgb)
+
+BACKEND_ENV = 'WT_CAPTURE_BACKEND'
+
+# Region grabbed by the probe; small enough to be on any screen
+PROBE_BBOX: BBox = (0, 0, 256, 256)
+
+
+class CaptureUnavailable(RuntimeError):
+    """The backend cannot run here (no display, library or extension)"""
+
+
+# ----------------------------------------------------------------------
+# X11 MIT-SHM
+# ----------------------------------------------------------------------
+
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFFFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong),
+                ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p),
+                ('readOnly', ctypes.c_int)]
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; the function table after them is unused
+    _fields_ = [('width', ctypes.c_int),
+                ('height', ctypes.c_int),
+                ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int),
+                ('data', ctypes.c_void_p),
+                ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int),
+                ('bitmap_bit_order', ctypes.c_int),
+                ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int),
+                ('bytes_per_line', ctypes.c_int),
+                ('bits_per_pixel', ctypes.c_int),
+                ('red_mask', ctypes.c_ulong),
+                ('green_mask', ctypes.c_ulong),
+                ('blue_mask', ctypes.c_ulong)]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_int),
+                ('display', ctypes.c_void_p),
+                ('resourceid', ctypes.c_ulong),
+                ('serial', ctypes.c_ulong),
+                ('error_code', ctypes.c_ubyte),
+                ('request_code', ctypes.c_ubyte),
+                ('minor_code', ctypes.c_ubyte)]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+# Xlib's error handler is process-wide, and its default exits the process.
+# One handler is installed the first time a backend opens its display and
+# is never swapped again: errors on our displays are recorded in that
+# display's list, anything else (Tk's connection in the overlay) goes to
+# the handler that was installed before ours.
+_error_lock = threading.Lock()
+_error_lists: Dict[int, List[int]] = {}
+_previous_handler = None
+_installed_handler = None
+
+
+def _on_x_error(display, event) -> int:
+    errors = _error_lists.get(display)
+    if errors is not None:
+        errors.append(event.contents.error_code)
+        return 0
+    if _previous_handler is not None:
+        return _previous_handler(display, event)
+    return 0
+
+
+def _trap_errors(libs: '_XLibs', display: int) -> List[int]:
+    """Record X errors on ``display`` from now on; returns the list they go to"""
+    global _previous_handler, _installed_handler
+    with _error_lock:
+        if _installed_handler is None:
+            _installed_handler = _XErrorHandler(_on_x_error)
+            previous = libs.x11.XSetErrorHandler(ctypes.cast(_installed_handler, ctypes.c_void_p))
+            _previous_handler = _XErrorHandler(previous) if previous else None
+        return _error_lists.setdefault(display, [])
+
+
+def _release_errors(display: int):
+    with _error_lock:
+        _error_lists.pop(display, None)
+
+
+def _load_library(name: str):
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise CaptureUnavailable(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+
+class _XLibs:
+    """ctypes bindings for the few Xlib, XShm and SysV calls needed"""
+
+    def __init__(self):
+        self.x11 = _load_library('X11')
+        self.xext = _load_library('Xext')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        x11, xext, libc = self.x11, self.xext, self.libc
+        p = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = p
+        x11.XCloseDisplay.argtypes = [p]
+        x11.XDefaultScreen.argtypes = [p]
+        x11.XRootWindow.argtypes = [p, ctypes.c_int]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [p, ctypes.c_int]
+        x11.XDefaultVisual.restype = p
+        x11.XDefaultDepth.argtypes = [p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [p, ctypes.c_int]
+        x11.XSync.argtypes = [p, ctypes.c_int]
+        x11.XFree.argtypes = [p]
+        x11.XSetErrorHandler.argtypes = [p]  # Handlers passed as addresses, so the previous one can be called
+        x11.XSetErrorHandler.restype = p
+
+        xext.XShmQueryExtension.argtypes = [p]
+        xext.XShmCreateImage.argtypes = [p, p, ctypes.c_uint, ctypes.c_int, p,
+                                         ctypes.POINTER(_XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmAttach.argtypes = [p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, p, ctypes.c_int]
+        libc.shmat.restype = p
+        libc.shmdt.argtypes = [p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, p]
+
+
+class _ShmImage:
+    """One shared-memory XImage of a fixed size"""
+
+    def __init__(self, libs: _XLibs, display, visual, depth: int, width: int, height: int):
+        self.libs = libs
+        self.display = display
+        self.info = _XShmSegmentInfo()
+        self.image = libs.xext.XShmCreateImage(display, visual, depth, ZPIXMAP, None,
+                                               ctypes.byref(self.info), width, height)
+        if not self.image:
+            raise CaptureUnavailable("XShmCreateImage failed")
+        image = self.image.contents
+        if image.bits_per_pixel != 32:
+            libs.x11.XFree(self.image)
+            raise CaptureUnavailable(f"unsupported {image.bits_per_pixel} bpp visual")
+        size = image.bytes_per_line * height
+
+        self.info.shmid = libs.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            libs.x11.XFree(self.image)
+            raise CaptureUnavailable(f"shmget failed (errno {ctypes.get_errno()})")
+        address = libs.libc.shmat(self.info.shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            libs.libc.shmctl(self.info.shmid, IPC_RMID, None)
+            libs.x11.XFree(self.image)
+            raise CaptureUnavailable("shmat failed")
+        self.info.shmaddr = address
+        self.info.readOnly = 0
+        image.data = address
+        attached = libs.xext.XShmAttach(display, ctypes.byref(self.info))
+        libs.x11.XSync(display, 0)
+        # Removed once both sides detach, so a crash can't leak the segment
+        libs.libc.shmctl(self.info.shmid, IPC_RMID, None)
+        if not attached:
+            self.close(attached=False)
+            raise CaptureUnavailable("XShmAttach failed")
+
+        # BGRX pixels as a (height, width, 4) view of the segment
+        buffer = (ctypes.c_uint8 * size).from_address(address)
+        rows = np.frombuffer(buffer, dtype=np.uint8).reshape(height, image.bytes_per_line)
+        self.pixels = rows[:, :width * 4].reshape(height, width, 4)
+
+    def close(self, attached: bool = True):
+        if attached:
+            self.libs.xext.XShmDetach(self.display, ctypes.byref(self.info))
+            self.libs.x11.XSync(self.display, 0)
+        self.libs.libc.shmdt(self.info.shmaddr)
+        self.libs.x11.XFree(self.image)
+        self.pixels = None
+
+
+class XShmFrameSource(FrameSource):
+    """X11 screen capture through the MIT shared-memory extension.
+
+    ``XShmGetImage`` has the server copy the region straight into a SysV
+    shared segment, skipping the socket transfer of a plain ``XGetImage``.
+    Segments are created per capture size and kept (the map bbox and the
+    map watcher's full-screen bbox alternate), up to ``max_segments``. The
+    BGRX pixels are converted into a fresh RGB array, so a returned frame
+    is never overwritten by a later grab. Grabs are serialised with a lock
+    because Xlib connections are not thread-safe. X errors on this
+    connection are recorded rather than fatal (see ``_trap_errors``); every
+    call made under the lock ends with a round trip (a reply or
+    ``XSync``), so its errors have arrived by the time it returns.
+    """
+
+    def __init__(self, display: Optional[str] = None, max_segments: int = 4):
+        name = display or os.environ.get('DISPLAY')
+        if not name:
+            raise CaptureUnavailable("DISPLAY is not set")
+        self.libs = _XLibs()
+        self.display = self.libs.x11.XOpenDisplay(name.encode())
+        if not self.display:
+            raise CaptureUnavailable(f"cannot open display {name}")
+        self._errors = _trap_errors(self.libs, self.display)
+        if not self.libs.xext.XShmQueryExtension(self.display):
+            self._close_display()
+            raise CaptureUnavailable("MIT-SHM extension not available")
+
+        screen = self.libs.x11.XDefaultScreen(self.display)
+        self.root = self.libs.x11.XRootWindow(self.display, screen)
+        self.visual = self.libs.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.libs.x11.XDefaultDepth(self.display, screen)
+        self.screen_size = (self.libs.x11.XDisplayWidth(self.display, screen),
+                            self.libs.x11.XDisplayHeight(self.display, screen))
+        self.max_segments = max_segments
+        self._images: 'OrderedDict[Tuple[int, int], _ShmImage]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.grabs = 0
+        self.segments_created = 0
+
+    def _image(self, width: int, height: int) -> _ShmImage:
+        key = (width, height)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+        if len(self._images) >= self.max_segments:
+            _, oldest = self._images.popitem(last=False)
+            oldest.close()
+        image = _ShmImage(self.libs, self.display, self.visual, self.depth, width, height)
+        self._images[key] = image
+        self.segments_created += 1
+        return image
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        left = max(0, bbox[0])
+        top = max(0, bbox[1])
+        right = min(self.screen_size[0], bbox[2])
+        bottom = min(self.screen_size[1], bbox[3])
+        if right <= left or bottom <= top:
+            return None
+        with self._lock:
+            image = self._image(right - left, bottom - top)
+            self._errors.clear()
+            ok = self.libs.xext.XShmGetImage(self.display, self.root, image.image,
+                                             left, top, ALL_PLANES)
+            if not ok or self._errors:
+                return None
+            self.grabs += 1
+            return cv2.cvtColor(image.pixels, cv2.COLOR_BGRA2RGB)
+
+    def _close_display(self):
+        self.libs.x11.XCloseDisplay(self.display)
+        _release_errors(self.display)
+        self.display = None
+
+    def close(self):
+        with self._lock:
+            for image in self._images.values():
+                image.close()
+            self._images.clear()
+            if self.display:
+                self._close_display()
+
+
+# ----------------------------------------------------------------------
+# Registry and probe
+# ----------------------------------------------------------------------
+
+def _file_source(path: str) -> FrameSource:
+    """A directory of screenshots, or a single image repeated"""
+    if os.path.isdir(path):
+        return DirectoryFrameSource(path, origin=(0, 0))
+    if os.path.isfile(path):
+        return ArrayFrameSource([load_rgb(path)], origin=(0, 0))
+    raise CaptureUnavailable(f"no such file or directory: {path}")
+
+
+# Live screen backends, in preference order when the probe ties
+SCREEN_BACKENDS: Dict[str, Callable[[], FrameSource]] = {
+    'xshm': XShmFrameSource,
+    'pil': ScreenFrameSource,
+}
+
+
+def open_backend(spec: str) -> FrameSource:
+    """Create a backend from ``pil``, ``xshm`` or ``file:<path>``"""
+    name, _, argument = spec.partition(':')
+    if name == 'file':
+        return _file_source(argument)
+    factory = SCREEN_BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"unknown capture backend {spec!r} "
+                         f"(choose from {', '.join(SCREEN_BACKENDS)} or file:<path>)")
+    return factory()
+
+
+@dataclass
+class BackendProbe:
+    """How one backend did in the startup probe"""
+    name: str
+    available: bool
+    median_ms: float = float('inf')
+    error: str = ""
+
+
+def time_grabs(source: FrameSource, bbox: BBox, grabs: int) -> List[float]:
+    """Seconds per ``grab`` call; raises if a grab returns nothing"""
+    samples = []
+    for _ in range(grabs):
+        start = time.perf_counter()
+        frame = source.grab(bbox)
+        samples.append(time.perf_counter() - start)
+        if frame is None or frame.size == 0:
+            raise CaptureUnavailable("grab returned no frame")
+    return samples
+
+
+def probe_backends(names: Sequence[str] = tuple(SCREEN_BACKENDS), bbox: BBox = PROBE_BBOX,
+                   grabs: int = 5) -> Tuple[Optional[FrameSource], List[BackendProbe]]:
+    """Try each screen backend and keep the fastest working one open.
+
+    The first grab of each backend is a warm-up and not timed. Returns the
+    chosen source (``None`` if none works) and one probe per backend.
+    """
+    probes: List[BackendProbe] = []
+    best: Optional[FrameSource] = None
+    best_ms = float('inf')
+    for name in names:
+        try:
+            source = open_backend(name)
+        except Exception as exc:
+            probes.append(BackendProbe(name, False, error=str(exc)))
+            continue
+        try:
+            time_grabs(source, bbox, 1)
+            median_ms = float(np.median(time_grabs(source, bbox, grabs))) * 1000
+        except Exception as exc:
+            source.close()
+            probes.append(BackendProbe(name, False, error=str(exc) or type(exc).__name__))
+            continue
+        probes.append(BackendProbe(name, True, median_ms))
+        if median_ms < best_ms:
+            if best is not None:
+                best.close()
+            best, best_ms = source, median_ms
+        else:
+            source.close()
+    return best, probes
+
+
+def select_capture_source() -> Tuple[FrameSource, str]:
+    """The capture backend for the overlay and a one-line report.
+
+    ``WT_CAPTURE_BACKEND`` forces a backend; otherwise the probe picks the
+    fastest. With nothing working, PIL is returned so errors surface on
+    the first real grab as before.
+    """
+    spec = os.environ.get(BACKEND_ENV)
+    if spec:
+        return open_backend(spec), f"Capture: {spec} (from {BACKEND_ENV})"
+    source, probes = probe_backends()
+    report = "Capture: " + ", ".join(
+        f"{p.name} {p.median_ms:.2f} ms" if p.available else f"{p.name} unavailable ({p.error})"
+        for p in probes)
+    if source is None:
+        return ScreenFrameSource(), report + " -> pil"
+    chosen = min((p for p in probes if p.available), key=lambda p: p.median_ms)
+    return source, report + f" -> {chosen.name}"
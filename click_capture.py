@@ -0,0 +1,118 @@
+"""
+War Thunder Rangefinder - Click Capture
+One long-lived mouse listener feeding a single measurement state machine
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+Point = Tuple[int, int]
+
+
+@dataclass
+class ClickSequence:
+    """A measurement that needs one click per prompt"""
+    prompts: Sequence[str]  # Status shown while waiting for each click
+    on_done: Callable[[List[Point]], None]  # Gets the clicks (Tk thread)
+    accept: Optional[Callable[[int, int], bool]] = None  # Filters clicks
+    reject_message: str = ""  # Status shown for a filtered click
+    on_cancel: Optional[Callable[[], None]] = None  # ESC (Tk thread)
+
+
+class ClickCapture:
+    """Collects clicks for one ``ClickSequence`` at a time.
+
+    A single ``pynput`` mouse listener is started once and stays up for
+    the whole session; while no sequence is active a click costs one
+    attribute check. ``begin`` arms a sequence, ``cancel`` drops it, and
+    ``on_done``/``on_cancel`` are handed to ``call_soon`` so they run on
+    the Tk thread. ``status`` must be safe to call from any thread.
+    """
+
+    def __init__(self, status: Callable[[str], None],
+                 call_soon: Callable[..., None]):
+        self.status = status
+        self.call_soon = call_soon
+        self.sequence: Optional[ClickSequence] = None
+        self.points: List[Point] = []
+        self._lock = threading.Lock()
+        self._listener = None
+
+        # Counters
+        self.clicks = 0  # Presses seen while a sequence was active
+        self.ignored = 0  # Presses seen while idle
+        self.completed = 0
+        self.cancelled = 0
+
+    @property
+    def active(self) -> bool:
+        return self.sequence is not None
+
+    def start(self):
+        """Start the mouse listener (once per session)"""
+        if self._listener is not None:
+            return
+        from pynput import mouse
+        self._listener = mouse.Listener(on_click=self.feed)
+        self._listener.daemon = True
+        self._listener.start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def begin(self, sequence: ClickSequence) -> bool:
+        """Arm ``sequence``; ``False`` if another one is still collecting"""
+        with self._lock:
+            if self.sequence is not None:
+                return False
+            self.sequence = sequence
+            self.points = []
+        self.status(sequence.prompts[0])
+        return True
+
+    def cancel(self) -> bool:
+        """Drop the active sequence; ``False`` if there was none"""
+        with self._lock:
+            sequence, self.sequence = self.sequence, None
+            self.points = []
+        if sequence is None:
+            return False
+        self.cancelled += 1
+        if sequence.on_cancel:
+            self.call_soon(sequence.on_cancel)
+        return True
+
+    def feed(self, x: int, y: int, button=None, pressed: bool = True):
+        """Listener callback (listener thread); also usable to inject clicks"""
+        if not pressed:
+            return
+        if self.sequence is None:
+            self.ignored += 1
+            return
+
+        with self._lock:
+            sequence = self.sequence
+            if sequence is None:
+                return
+            self.clicks += 1
+            if sequence.accept is not None and not sequence.accept(x, y):
+                message = sequence.reject_message
+                points = None
+            else:
+                self.points.append((x, y))
+                if len(self.points) < len(sequence.prompts):
+                    message = sequence.prompts[len(self.points)]
+                    points = None
+                else:
+                    message = None
+                    points, self.points = self.points, []
+                    self.sequence = None
+                    self.completed += 1
+
+        if message:
+            self.status(message)
+        if points is not None:
+            self.call_soon(sequence.on_done, points)
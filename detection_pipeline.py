@@ -0,0 +1,195 @@
+"""
+War Thunder Rangefinder - Detection Pipeline
+Capture, detection and UI stages decoupled through bounded queues
+
+    hotkey / scheduler --request()--> [capture thread] --frames--> [detect thread]
+        --results--> Tk loop (root.after poll) --> deliver()
+
+Capture of the next frame overlaps detection of the current one. Both
+queues hold only the newest item, so a slow stage drops stale frames
+instead of building a backlog. Everything that touches Tk runs inside the
+poll callback on the Tk thread, including calls queued with ``call_soon``
+from hotkey and mouse-hook threads.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from frame_sources import BBox
+
+
+class LatestQueue:
+    """Thread-safe bounded queue that drops the oldest item when full"""
+
+    def __init__(self, maxlen: int = 1):
+        self._items = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Pop the oldest item, or return ``None`` after ``timeout``"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def get_nowait(self):
+        with self._cond:
+            return self._items.popleft() if self._items else None
+
+    def wake(self):
+        """Release any thread blocked in ``get``"""
+        with self._cond:
+            self._cond.notify_all()
+
+
+@dataclass
+class FramePacket:
+    """A captured frame travelling from the capture to the detect stage"""
+    frame: np.ndarray
+    bbox: BBox
+    captured_at: float
+    manual: bool  # Requested by the user (F11) rather than auto-scan
+    cost: float = 0.0  # Capture and detect seconds spent on this frame so far
+
+
+class DetectionPipeline:
+    """Runs capture and detection on worker threads, results on the Tk thread.
+
+    ``capture(manual)`` and ``detect(packet)`` are supplied by the overlay.
+    ``capture`` receives the request's ``manual`` flag and returns a
+    ``FramePacket`` (or ``None`` to skip); ``detect`` returns any result
+    object (or ``None`` to drop it). ``deliver(result)`` and
+    ``on_error(exc)`` are called on the Tk thread. ``schedule`` is
+    ``root.after``.
+    """
+
+    def __init__(self, capture: Callable[[bool], Optional[FramePacket]],
+                 detect: Callable[[FramePacket], Any],
+                 deliver: Callable[[Any], None],
+                 schedule: Callable[[int, Callable], Any],
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 poll_ms: int = 15):
+        self.capture = capture
+        self.detect = detect
+        self.deliver = deliver
+        self.schedule = schedule
+        self.on_error = on_error
+        self.poll_ms = poll_ms
+
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self._calls = deque()
+        self._requested = threading.Event()
+        self._manual_pending = False
+        self._request_lock = threading.Lock()  # Guards the event and the flag together
+        self._stop = threading.Event()
+        self._threads = []
+
+        # Counters
+        self.captured = 0
+        self.detected = 0
+        self.last_capture_cost = 0.0
+        self.last_detect_cost = 0.0
+
+    def start(self):
+        """Start the worker threads and the Tk poll loop"""
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._detect_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.schedule(self.poll_ms, self._poll)
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the worker threads"""
+        self._stop.set()
+        self._requested.set()
+        self.frames.wake()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def request(self, manual: bool = False):
+        """Ask for a capture; requests made while one is pending coalesce"""
+        with self._request_lock:
+            self._manual_pending = self._manual_pending or manual
+            self._requested.set()
+
+    def call_soon(self, func: Callable, *args):
+        """Run ``func(*args)`` on the Tk thread at the next poll"""
+        self._calls.append((func, args))
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.frames.dropped + self.results.dropped
+
+    def _report_error(self, exc: Exception):
+        if self.on_error:
+            self.call_soon(self.on_error, exc)
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            self._requested.wait()
+            if self._stop.is_set():
+                break
+            # Taken together with the clear, so a manual request arriving
+            # now is either in this capture or triggers the next one
+            with self._request_lock:
+                self._requested.clear()
+                manual, self._manual_pending = self._manual_pending, False
+            start = time.perf_counter()
+            try:
+                packet = self.capture(manual)
+            except Exception as e:
+                self._report_error(e)
+                continue
+            self.last_capture_cost = time.perf_counter() - start
+            if packet is not None:
+                self.captured += 1
+                self.frames.put(packet)
+
+    def _detect_loop(self):
+        while not self._stop.is_set():
+            packet = self.frames.get(timeout=0.5)
+            if packet is None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.detect(packet)
+            except Exception as e:
+                self._report_error(e)
+                continue
+            self.last_detect_cost = time.perf_counter() - start
+            if result is not None:
+                self.detected += 1
+                self.results.put(result)
+
+    def _poll(self):
+        """Tk-thread side: run queued calls and deliver the newest result"""
+        try:
+            while self._calls:
+                func, args = self._calls.popleft()
+                func(*args)
+            result = self.results.get_nowait()
+            if result is not None:
+                self.deliver(result)
+        finally:
+            if not self._stop.is_set():
+                self.schedule(self.poll_ms, self._poll)
@@ -0,0 +1,230 @@
+"""
+War Thunder Rangefinder - Detection Worker
+Per-frame detection, run in-process or in a separate worker process
+
+``FrameAnalyzer`` is the detect-stage work of the pro overlay: marker
+tracking, the player icon and (optionally) every yellow ping. In worker
+mode a ``DetectionWorker`` runs the same analyzer in a child process so
+OpenCV and NumPy never hold the overlay's GIL:
+
+    detect thread --copy--> shared memory ring slot --(slot, bbox)--> worker
+    detect thread <--------- (result, targets, player, timings) ------ worker
+
+Only small tuples cross the pipe; frames are written once into a
+``multiprocessing.shared_memory`` ring. A worker that dies or stops
+answering is replaced and the frame retried once, so callers only ever see
+a dropped frame.
+"""
+
+import time
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from frame_sources import ArrayFrameSource, BBox
+from marker_detection import MarkerDetector, MarkerResult
+from marker_tracking import MarkerTracker, MultiTargetTracker, Target
+from player_locator import PlayerLocator, PlayerResult
+
+Analysis = Tuple[MarkerResult, Optional[List[Target]], PlayerResult]
+
+
+class FrameAnalyzer:
+    """Marker tracking, player icon and all-marker tracking for one map"""
+
+    def __init__(self):
+        self.tracker = MarkerTracker(pyramid_factor=4)
+        self.player_locator = PlayerLocator()
+        self.multi_detector = MarkerDetector()
+        self.multi_tracker = MultiTargetTracker()
+        self.multi_bbox: Optional[BBox] = None
+
+    @property
+    def position(self) -> Optional[Tuple[float, float]]:
+        """Tracked marker position in map pixels"""
+        return self.tracker.position
+
+    def warm_up(self, bbox: BBox):
+        from startup import warm_up
+        warm_up(self.tracker, self.player_locator, bbox, detectors=[self.multi_detector])
+
+    def analyze(self, frame: np.ndarray, bbox: BBox, captured_at: float, range_all: bool,
+                timings: Optional[Dict[str, float]] = None) -> Optional[Analysis]:
+        """Detect everything in one minimap capture taken at ``bbox``"""
+        # Let the tracker crop its window from this capture
+        source = ArrayFrameSource([frame], origin=bbox[:2])
+        result = self.tracker.scan(source, bbox, captured_at, timings)
+
+        targets = None
+        if range_all:
+            if self.multi_bbox != bbox:
+                self.multi_tracker.reset()
+                self.multi_bbox = bbox
+            t0 = time.perf_counter()
+            targets = self.multi_tracker.update(self.multi_detector.detect_all(frame))
+            if timings is not None:
+                timings['multi'] = time.perf_counter() - t0
+        return result, targets, self.player_locator.locate(frame, timings)
+
+    def close(self):
+        pass
+
+
+def _worker_main(conn, warm_up_bbox: Optional[BBox]):
+    """Worker process loop: analyse ring slots until told to stop"""
+    analyzer = FrameAnalyzer()
+    if warm_up_bbox is not None:
+        analyzer.warm_up(warm_up_bbox)
+    ring = None
+    slot_bytes = 0
+    conn.send(('ready',))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break  # Overlay went away
+        kind = message[0]
+        if kind == 'detect':
+            _, seq, slot, shape, bbox, captured_at, range_all = message
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=ring.buf, offset=slot * slot_bytes)
+            timings: Dict[str, float] = {}
+            analysis = analyzer.analyze(frame, bbox, captured_at, range_all, timings)
+            del frame  # The ring can't be closed while a view exists
+            conn.send(('result', seq, analysis, analyzer.position, timings))
+        elif kind == 'ring':
+            if ring is not None:
+                ring.close()
+            _, name, slot_bytes = message
+            ring = shared_memory.SharedMemory(name=name)
+        elif kind == 'stop':
+            break
+    if ring is not None:
+        ring.close()
+
+
+class DetectionWorker:
+    """``FrameAnalyzer`` in a child process, fed through a shared memory ring.
+
+    ``analyze`` has the analyzer's signature and is meant to be called
+    from one thread (the pipeline's detect thread). Each frame is copied
+    into the next of ``slots`` ring slots; the ring grows when a bigger
+    minimap arrives. A reply slower than ``timeout`` seconds, or a dead
+    worker, gets the process replaced (``restarts``) and the frame retried
+    once; ``None`` is returned if that fails too.
+    """
+
+    def __init__(self, warm_up_bbox: Optional[BBox] = None, slots: int = 3,
+                 timeout: float = 2.0, start_timeout: float = 30.0):
+        self.warm_up_bbox = warm_up_bbox
+        self.slots = slots
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.position: Optional[Tuple[float, float]] = None  # Last tracked marker position
+
+        # Spawned, not forked: the overlay has Tk and input hook threads
+        self._context = get_context('spawn')
+        self._process = None
+        self._conn = None
+        self._ring: Optional[shared_memory.SharedMemory] = None
+        self._slot_bytes = 0
+        self._seq = 0
+
+        # Counters
+        self.frames = 0
+        self.restarts = 0
+        self.failures = 0
+
+    def start(self):
+        """Start the worker process and wait for it to warm up"""
+        parent, child = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child, self.warm_up_bbox),
+                                              name='detection-worker', daemon=True)
+        self._process.start()
+        child.close()
+        self._conn = parent
+        if not parent.poll(self.start_timeout):
+            raise RuntimeError("detection worker did not start")
+        parent.recv()
+        if self._ring is not None:
+            parent.send(('ring', self._ring.name, self._slot_bytes))
+
+    def restart(self):
+        """Replace the worker process (its tracking state starts over)"""
+        self._stop_process()
+        self.restarts += 1
+        self.position = None
+        self.start()
+
+    def _stop_process(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(('stop',))
+            except (OSError, ValueError):
+                pass
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.join(timeout=0.5)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout=1.0)
+            self._process = None
+
+    def _ensure_ring(self, nbytes: int):
+        if self._ring is not None and nbytes <= self._slot_bytes:
+            return
+        if self._ring is not None:
+            self._ring.close()
+            self._ring.unlink()
+        self._slot_bytes = nbytes
+        self._ring = shared_memory.SharedMemory(create=True, size=nbytes * self.slots)
+        self._conn.send(('ring', self._ring.name, self._slot_bytes))
+
+    def _request(self, frame: np.ndarray, bbox: BBox, captured_at: float,
+                 range_all: bool) -> Tuple[Optional[Analysis], Dict[str, float]]:
+        self._ensure_ring(frame.nbytes)
+        self._seq += 1
+        slot = self._seq % self.slots
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._ring.buf,
+                          offset=slot * self._slot_bytes)
+        np.copyto(view, frame)
+        del view
+        self._conn.send(('detect', self._seq, slot, frame.shape, tuple(bbox), captured_at, range_all))
+
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self._conn.poll(remaining):
+                raise TimeoutError("detection worker timed out")
+            _, seq, analysis, position, timings = self._conn.recv()
+            if seq == self._seq:  # Older replies belong to abandoned requests
+                self.position = position
+                return analysis, timings
+
+    def analyze(self, frame: np.ndarray, bbox: BBox, captured_at: float, range_all: bool,
+                timings: Optional[Dict[str, float]] = None) -> Optional[Analysis]:
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        for attempt in range(2):
+            try:
+                if self._process is None:
+                    self.restart()
+                analysis, worker_timings = self._request(frame, bbox, captured_at, range_all)
+            except (TimeoutError, EOFError, OSError, ValueError, RuntimeError):
+                # Crashed, hung or failed to start; replaced on the next attempt
+                self.failures += 1
+                self._stop_process()
+                continue
+            self.frames += 1
+            if timings is not None:
+                timings.update(worker_timings)
+            return analysis
+        return None
+
+    def close(self):
+        """Stop the worker and free the ring"""
+        self._stop_process()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring.unlink()
+            self._ring = None
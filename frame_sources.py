@@ -0,0 +1,301 @@
+"""
+War Thunder Rangefinder - Frame Sources
+Interchangeable providers of minimap frames for the marker detector
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bounding box in screen coordinates: (left, top, right, bottom)
+BBox = Tuple[int, int, int, int]
+
+
+def _crop_to_bbox(frame: np.ndarray, bbox: BBox,
+                  origin: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """Return the bbox region of a stored frame.
+
+    ``origin`` is the screen position of the frame's top-left pixel. Without
+    one, frames that already have the bbox size are treated as pre-cropped
+    minimaps and returned untouched, and larger frames are treated as full
+    screenshots. Crops are views, not copies.
+    """
+    if origin is None:
+        width = bbox[2] - bbox[0]
+        height = bbox[3] - bbox[1]
+        if frame.shape[0] == height and frame.shape[1] == width:
+            return frame
+        origin = (0, 0)
+    left, top = bbox[0] - origin[0], bbox[1] - origin[1]
+    right, bottom = bbox[2] - origin[0], bbox[3] - origin[1]
+    return frame[max(0, top):bottom, max(0, left):right]
+
+
+class FrameSource:
+    """Base class for anything that can supply an RGB minimap frame.
+
+    ``grab`` returns a ``(height, width, 3)`` uint8 RGB array for the
+    requested screen bbox, or ``None`` when the source is exhausted.
+    """
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the source"""
+
+
+class ScreenFrameSource(FrameSource):
+    """Live desktop capture via PIL ImageGrab"""
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        from PIL import ImageGrab
+        screenshot = ImageGrab.grab(bbox=bbox)
+        if screenshot.mode != 'RGB':
+            screenshot = screenshot.convert('RGB')
+        return np.asarray(screenshot)
+
+
+class ArrayFrameSource(FrameSource):
+    """In-memory NumPy frames, replayed in order (optionally looping)"""
+
+    def __init__(self, frames: Iterable[np.ndarray], loop: bool = True,
+                 origin: Optional[Tuple[int, int]] = None):
+        self.frames = [np.ascontiguousarray(f, dtype=np.uint8) for f in frames]
+        self.loop = loop
+        self.origin = origin
+        self.index = 0
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        if not self.frames:
+            return None
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return None
+            self.index = 0
+        frame = self.frames[self.index]
+        self.index += 1
+        return _crop_to_bbox(frame, bbox, self.origin)
+
+
+class DirectoryFrameSource(FrameSource):
+    """PNG/JPG screenshots from a directory, read lazily in name order"""
+
+    EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, directory: str, loop: bool = True,
+                 origin: Optional[Tuple[int, int]] = None):
+        self.directory = directory
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(self.EXTENSIONS)
+        )
+        self.loop = loop
+        self.origin = origin
+        self.index = 0
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        if not self.paths:
+            return None
+        if self.index >= len(self.paths):
+            if not self.loop:
+                return None
+            self.index = 0
+        path = self.paths[self.index]
+        self.index += 1
+        return _crop_to_bbox(load_rgb(path), bbox, self.origin)
+
+
+def load_rgb(path: str) -> np.ndarray:
+    """Load an image file as an RGB uint8 array"""
+    from PIL import Image
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+# ----------------------------------------------------------------------
+# Synthetic minimaps
+# ----------------------------------------------------------------------
+
+# RGB colours roughly matching the in-game tactical map
+TERRAIN_RGB = (86, 98, 72)
+GRID_RGB = (40, 44, 38)
+MARKER_RGB = (255, 214, 0)
+DECOY_RGB = (240, 200, 30)
+PLAYER_RGB = (250, 250, 250)
+
+
+def player_icon_polygon(center: Tuple[float, float], size: float,
+                        heading: float) -> np.ndarray:
+    """Corners of the player arrow icon.
+
+    ``size`` is the distance from ``center`` to the tip and ``heading`` is
+    in degrees clockwise from map north. Returns float (x, y) points.
+    """
+    shape = np.array([(0.0, -1.0), (0.65, 0.7), (0.0, 0.35), (-0.65, 0.7)]) * size
+    angle = np.deg2rad(heading)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)],
+                         [np.sin(angle), np.cos(angle)]])
+    return shape @ rotation.T + np.asarray(center, dtype=np.float64)
+
+
+@dataclass
+class SyntheticMinimap:
+    """A rendered minimap together with its ground truth"""
+    frame: np.ndarray
+    marker: Optional[Tuple[float, float]]
+    grid_pixel_size: float
+    decoys: List[Tuple[int, int]] = field(default_factory=list)
+    player: Optional[Tuple[float, float]] = None
+    player_heading: float = 0.0
+
+
+def render_minimap(width: int, height: int,
+                   marker: Optional[Tuple[float, float]] = None,
+                   marker_radius: Optional[int] = None,
+                   grid_pixel_size: Optional[float] = None,
+                   noise: float = 6.0,
+                   decoys: int = 0,
+                   rng: Optional[np.random.Generator] = None,
+                   player: Optional[Tuple[float, float]] = None,
+                   player_heading: float = 0.0,
+                   player_size: Optional[float] = None) -> SyntheticMinimap:
+    """Render a synthetic minimap with a yellow squad marker.
+
+    The marker is a filled circle, so its true centroid is the circle
+    centre. Decoys are small yellow specks that are always smaller than
+    the marker, matching the "largest contour wins" rule of the detector.
+    An optional white player arrow is drawn around ``player``.
+    """
+    import cv2
+
+    rng = rng if rng is not None else np.random.default_rng()
+    if marker_radius is None:
+        marker_radius = max(4, min(width, height) // 60)
+    if grid_pixel_size is None:
+        grid_pixel_size = min(width, height) / 8.0
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = TERRAIN_RGB
+
+    # Low-frequency terrain shading plus per-pixel sensor noise
+    if noise > 0:
+        shade = rng.normal(0, noise * 2, size=(max(1, height // 32), max(1, width // 32)))
+        shade = cv2.resize(shade.astype(np.float32), (width, height),
+                           interpolation=cv2.INTER_LINEAR)
+        grain = rng.normal(0, noise, size=(height, width)).astype(np.float32)
+        frame = np.clip(frame.astype(np.float32) + (shade + grain)[..., None],
+                        0, 255).astype(np.uint8)
+
+    # Grid lines
+    offset = 0.0
+    while offset < width:
+        cv2.line(frame, (int(round(offset)), 0), (int(round(offset)), height - 1), GRID_RGB, 1)
+        offset += grid_pixel_size
+    offset = 0.0
+    while offset < height:
+        cv2.line(frame, (0, int(round(offset))), (width - 1, int(round(offset))), GRID_RGB, 1)
+        offset += grid_pixel_size
+
+    # Decoy specks, kept well below the marker area
+    decoy_positions = []
+    decoy_size = max(1, marker_radius // 3)
+    for _ in range(decoys):
+        dx = int(rng.integers(0, width - decoy_size))
+        dy = int(rng.integers(0, height - decoy_size))
+        frame[dy:dy + decoy_size, dx:dx + decoy_size] = DECOY_RGB
+        decoy_positions.append((dx, dy))
+
+    if player is not None:
+        if player_size is None:
+            player_size = max(5.0, min(width, height) / 75.0)
+        points = player_icon_polygon(player, player_size, player_heading)
+        cv2.fillPoly(frame, [np.round(points * 16).astype(np.int32)], PLAYER_RGB,
+                     lineType=cv2.LINE_AA, shift=4)
+
+    # Marker drawn last so decoys can't split it
+    if marker is not None:
+        cv2.circle(frame, (int(round(marker[0])), int(round(marker[1]))),
+                   marker_radius, MARKER_RGB, -1)
+
+    return SyntheticMinimap(frame=frame, marker=marker,
+                            grid_pixel_size=grid_pixel_size,
+                            decoys=decoy_positions, player=player,
+                            player_heading=player_heading)
+
+
+@dataclass
+class SyntheticScreen:
+    """A rendered full screen with a minimap somewhere on it"""
+    frame: np.ndarray
+    map_bbox: BBox
+    minimap: SyntheticMinimap
+
+
+def render_screen(width: int, height: int, map_bbox: BBox,
+                  border: int = 2, clutter: int = 12,
+                  rng: Optional[np.random.Generator] = None,
+                  **minimap_args) -> SyntheticScreen:
+    """Render a game screen with a framed minimap at ``map_bbox``.
+
+    The background is a blurry, noisy scene with some rectangular HUD
+    clutter, so only the minimap carries a long regular grid. Extra
+    keyword arguments go to ``render_minimap``.
+    """
+    import cv2
+
+    rng = rng if rng is not None else np.random.default_rng()
+    scene = rng.integers(20, 200, size=(max(2, height // 90), max(2, width // 90), 3))
+    frame = cv2.resize(scene.astype(np.uint8), (width, height), interpolation=cv2.INTER_CUBIC)
+    grain = rng.normal(0, 6, size=(height, width, 1))
+    frame = np.clip(frame + grain, 0, 255).astype(np.uint8)
+
+    # HUD panels and text-like strokes
+    for _ in range(clutter):
+        w = int(rng.integers(20, max(21, width // 6)))
+        h = int(rng.integers(10, max(11, height // 10)))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        colour = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), colour, int(rng.integers(1, 3)))
+
+    # Dark frame exactly ``border`` pixels wide around the map
+    left, top, right, bottom = map_bbox
+    frame[max(0, top - border):bottom + border, max(0, left - border):right + border] = (20, 22, 20)
+    minimap = render_minimap(right - left, bottom - top, rng=rng, **minimap_args)
+    frame[top:bottom, left:right] = minimap.frame
+    return SyntheticScreen(frame=frame, map_bbox=tuple(map_bbox), minimap=minimap)
+
+
+class SyntheticFrameSource(FrameSource):
+    """Generates synthetic minimaps on demand.
+
+    The marker position is random unless a fixed sequence of positions is
+    given; the ground truth of the most recent frame is kept in ``last``.
+    """
+
+    def __init__(self, noise: float = 6.0, decoys: int = 0,
+                 positions: Optional[Sequence[Tuple[float, float]]] = None,
+                 seed: Optional[int] = None):
+        self.noise = noise
+        self.decoys = decoys
+        self.positions = list(positions) if positions else None
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        self.last: Optional[SyntheticMinimap] = None
+
+    def grab(self, bbox: BBox) -> Optional[np.ndarray]:
+        width = bbox[2] - bbox[0]
+        height = bbox[3] - bbox[1]
+        if self.positions:
+            marker = self.positions[self.index % len(self.positions)]
+        else:
+            margin = max(8, min(width, height) // 20)
+            marker = (float(self.rng.integers(margin, width - margin)),
+                      float(self.rng.integers(margin, height - margin)))
+        self.index += 1
+        self.last = render_minimap(width, height, marker=marker, noise=self.noise,
+                                   decoys=self.decoys, rng=self.rng)
+        return self.last.frame
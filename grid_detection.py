@@ -0,0 +1,217 @@
+"""
+War Thunder Rangefinder - Grid Detection
+Measures the minimap grid pitch from a capture instead of two F6 clicks
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import cv2
+
+
+@dataclass
+class GridEstimate:
+    """Grid line period found in a minimap frame"""
+    pitch: float  # Pixels per grid square (sub-pixel)
+    phase: float  # Offset of the first vertical line from the left edge
+    lines: int  # Grid lines used for the fit, both axes
+    residual: float  # RMS distance of those lines from the fitted comb (px)
+
+
+def line_profile(frame: np.ndarray, axis: int) -> np.ndarray:
+    """Grid-line strength along one axis of an RGB frame.
+
+    The frame is summed along ``axis`` (0 gives a per-column profile) as a
+    single-channel ``(height, width * 3)`` view, which is much faster than
+    a grey conversion or a multi-channel reduce, and the channels are then
+    added up. The slow terrain shading is removed with a short box filter
+    and only dips are kept, leaving a spike train at the lines.
+    """
+    height, width = frame.shape[:2]
+    flat = np.ascontiguousarray(frame).reshape(height, width * 3)
+    if axis == 0:
+        sums = cv2.reduce(flat, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).reshape(width, 3).sum(axis=1)
+        count = 3 * height
+    else:
+        sums = cv2.reduce(flat, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+        count = 3 * width
+    profile = (sums / count).astype(np.float32).reshape(1, -1)
+    background = cv2.blur(profile, (9, 1), borderType=cv2.BORDER_REFLECT)
+    return np.maximum(background - profile, 0).ravel()
+
+
+def coarse_period(spikes: np.ndarray, min_pitch: float, max_pitch: float) -> Optional[float]:
+    """Approximate period of a spike train from its FFT autocorrelation.
+
+    Multiples of the period correlate as well as the period itself, so the
+    shortest lag within 60% of the strongest peak is taken, refined to
+    the centroid of the raw autocorrelation around it (lines at a
+    non-integer pitch split each peak between neighbouring lags).
+    """
+    n = spikes.size
+    lo, hi = int(np.floor(min_pitch)), int(np.ceil(min(max_pitch, n / 2)))
+    if hi <= lo + 2:
+        return None
+    centred = spikes - spikes.mean()
+    spectrum = np.fft.rfft(centred, 2 * n)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if autocorr[0] <= 0:
+        return None
+    smoothed = autocorr.copy()
+    smoothed[1:-1] = autocorr[:-2] + autocorr[1:-1] + autocorr[2:]
+    window = smoothed[lo:hi + 1] / smoothed[1]
+
+    peaks = np.nonzero((window[1:-1] > window[:-2]) & (window[1:-1] >= window[2:]))[0] + 1
+    if peaks.size == 0:
+        return None
+    best = window[peaks].max()
+    if best < 0.2:
+        return None  # No periodic structure
+    lag = lo + int(peaks[window[peaks] >= 0.6 * best][0])
+    lags = np.arange(lag - 1, lag + 2)
+    weights = np.maximum(autocorr[lags], 0)
+    return float(np.dot(lags, weights) / weights.sum())
+
+
+def fit_lines(spikes: np.ndarray, period: float, phase: Optional[float] = None):
+    """Sub-pixel comb fit to a spike train near ``period``.
+
+    Each line is located at the strongest spike near its predicted spot
+    and refined with a parabola through its neighbours; a least-squares
+    line through (index, position), refitted without outliers, then gives
+    pitch and phase. Returns ``(pitch, phase, positions, residuals)`` or
+    ``None``.
+    """
+    n = spikes.size
+    if phase is None:
+        # Phase from folding the spike train at the coarse period
+        folded = np.bincount((np.arange(n) % period).astype(np.int64), weights=spikes)
+        phase = float(np.argmax(folded))
+
+    reach = max(2, int(period * 0.15))
+    indices, positions, strengths = [], [], []
+    k_first = int(np.ceil((0 - phase) / period))
+    k_last = int(np.floor((n - 1 - phase) / period))
+    for k in range(k_first, k_last + 1):
+        guess = int(round(phase + k * period))
+        lo, hi = max(1, guess - reach), min(n - 1, guess + reach + 1)
+        if hi <= lo:
+            continue
+        peak = lo + int(np.argmax(spikes[lo:hi]))
+        if spikes[peak] <= 0 or peak <= 0 or peak >= n - 1:
+            continue
+        left, centre, right = spikes[peak - 1], spikes[peak], spikes[peak + 1]
+        denom = left - 2 * centre + right
+        offset = 0.5 * (left - right) / denom if denom < 0 else 0.0
+        indices.append(k)
+        positions.append(peak + offset)
+        strengths.append(centre)
+
+    # Weak spikes are terrain noise where a line was expected but missing
+    strengths = np.asarray(strengths)
+    keep = strengths >= 0.25 * np.median(strengths) if strengths.size else strengths > 0
+    indices = np.asarray(indices, dtype=np.float64)[keep]
+    positions = np.asarray(positions)[keep]
+
+    # Fit, dropping the worst outlier until every line sits on the comb
+    expected = max(3, (n - 2) / period * 0.5)
+    while True:
+        if len(indices) < expected:
+            return None  # Too few lines agree on this period
+        pitch, phase = np.polyfit(indices, positions, 1)
+        residuals = positions - (phase + pitch * indices)
+        worst = int(np.argmax(np.abs(residuals)))
+        if abs(residuals[worst]) <= 1.0:
+            break
+        indices = np.delete(indices, worst)
+        positions = np.delete(positions, worst)
+    return float(pitch), float(phase % pitch), positions, residuals
+
+
+def detect_grid_pitch(frame: np.ndarray, min_pitch: float = 12.0,
+                      max_pitch: Optional[float] = None) -> Optional[GridEstimate]:
+    """Find the grid square size of an RGB minimap frame.
+
+    Both axes are measured separately and must agree within 2%; the
+    result is the line-count weighted mean. Grid lines need to be darker
+    than the terrain around them, as they are on the tactical map.
+    """
+    height, width = frame.shape[:2]
+    if max_pitch is None:
+        max_pitch = min(width, height) / 3.0  # At least three squares across
+
+    fits = []
+    for axis in (0, 1):
+        spikes = line_profile(frame, axis)
+        period = coarse_period(spikes, min_pitch, max_pitch)
+        if period is None:
+            return None
+        fit = fit_lines(spikes, period)
+        if fit is None:
+            return None
+        # A whole-pixel period drifts off long combs; refit from the estimate
+        fit = fit_lines(spikes, fit[0], fit[1]) or fit
+        fits.append(fit)
+
+    (pitch_x, phase_x, _, res_x), (pitch_y, _, _, res_y) = fits
+    if abs(pitch_x - pitch_y) > 0.02 * max(pitch_x, pitch_y):
+        return None
+    lines = len(res_x) + len(res_y)
+    pitch = (pitch_x * len(res_x) + pitch_y * len(res_y)) / lines
+    residual = float(np.sqrt(np.mean(np.concatenate((res_x, res_y)) ** 2)))
+    return GridEstimate(pitch=pitch, phase=phase_x, lines=lines, residual=residual)
+
+
+class GridWatcher:
+    """Re-measures the grid every ``interval`` seconds to catch zoom changes.
+
+    ``update`` is cheap to call on every captured frame; it only runs the
+    detector when the interval has passed and returns the new pitch when
+    it moved by more than ``tolerance`` (relative), otherwise ``None``.
+    A new pitch has to be read on two checks in a row to count, and
+    without a reference pitch the first reading only becomes the
+    reference, so startup and one-off misreads never report a change.
+    """
+
+    def __init__(self, interval: float = 2.0, tolerance: float = 0.02):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.pitch: Optional[float] = None
+        self.candidate: Optional[float] = None  # Differing pitch awaiting a second reading
+        self.last_check: Optional[float] = None
+
+        # Counters
+        self.checks = 0
+        self.changes = 0
+
+    def reset(self, pitch: Optional[float] = None):
+        """Set the reference pitch, e.g. after a manual measurement"""
+        self.pitch = pitch
+        self.candidate = None
+        self.last_check = None
+
+    def update(self, frame: np.ndarray, now: Optional[float] = None) -> Optional[float]:
+        now = time.perf_counter() if now is None else now
+        if self.last_check is not None and now - self.last_check < self.interval:
+            return None
+        self.last_check = now
+        self.checks += 1
+
+        estimate = detect_grid_pitch(frame)
+        if estimate is None:
+            return None
+        if self.pitch is None:
+            self.pitch = estimate.pitch
+            return None
+        if abs(estimate.pitch - self.pitch) <= self.tolerance * self.pitch:
+            self.candidate = None
+            return None
+        if self.candidate is None or abs(estimate.pitch - self.candidate) > self.tolerance * self.candidate:
+            self.candidate = estimate.pitch
+            return None
+        self.pitch = estimate.pitch
+        self.candidate = None
+        self.changes += 1
+        return estimate.pitch
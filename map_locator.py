@@ -0,0 +1,282 @@
+"""
+War Thunder Rangefinder - Map Locator
+Finds the minimap rectangle on a full-screen capture instead of F9 clicks
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from calibration_profiles import MIN_FRAME_STDDEV, MIN_GRID_CONTRAST, grid_contrast
+from frame_sources import BBox, FrameSource
+from grid_detection import GridEstimate, coarse_period, detect_grid_pitch, fit_lines
+
+# Grey levels a pixel must sit below its neighbours to count as a thin line
+LINE_DEPTH = 6
+
+
+@dataclass
+class MapLocation:
+    """A minimap found on screen"""
+    bbox: BBox  # Screen (left, top, right, bottom)
+    grid: GridEstimate
+
+
+def line_masks(gray: np.ndarray, min_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Masks of long thin dark vertical and horizontal lines.
+
+    A pixel is on a line when it is ``LINE_DEPTH`` darker than the mean of
+    its 5-pixel neighbourhood across the line; a morphological opening
+    with a ``min_length`` bar then drops everything shorter, which removes
+    almost all scene texture and HUD text but keeps grid and border lines.
+    Grid crossings are dark all round and fail both tests, so one-pixel
+    gaps are closed first; otherwise every line would be cut into
+    pitch-long pieces.
+    """
+    gray = gray.astype(np.int16)
+    across_x = cv2.blur(gray, (5, 1)) - gray
+    across_y = cv2.blur(gray, (1, 5)) - gray
+    vertical = cv2.compare(across_x, LINE_DEPTH, cv2.CMP_GE)
+    horizontal = cv2.compare(across_y, LINE_DEPTH, cv2.CMP_GE)
+    vertical = cv2.morphologyEx(vertical, cv2.MORPH_CLOSE, np.ones((3, 1), np.uint8))
+    horizontal = cv2.morphologyEx(horizontal, cv2.MORPH_CLOSE, np.ones((1, 3), np.uint8))
+    vertical = cv2.morphologyEx(vertical, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, min_length)))
+    horizontal = cv2.morphologyEx(horizontal, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (min_length, 1)))
+    return vertical, horizontal
+
+
+def comb_extent(counts: np.ndarray, min_pitch: float = 12.0) -> Optional[Tuple[int, int, float]]:
+    """Span of the regular grid in a per-column (or per-row) line histogram.
+
+    ``counts`` holds how many line pixels each column has. The grid shows
+    up as an evenly spaced comb of tall spikes; HUD lines touching the map
+    do not fit the comb and are ignored. The span is widened to any
+    equally tall line up to one pitch beyond the outermost grid lines,
+    which is the map frame. Returns ``(start, stop, pitch)``.
+    """
+    counts = counts.astype(np.float64)
+    period = coarse_period(counts, min_pitch, counts.size / 3.0)
+    if period is None:
+        return None
+    fit = fit_lines(counts, period)
+    if fit is None:
+        return None
+    pitch, _, positions, _ = fit
+    first, last = int(round(positions.min())), int(round(positions.max()))
+
+    height = np.median(counts[np.round(positions).astype(np.int64)])
+    tall = np.nonzero(counts >= 0.9 * height)[0]
+    reach = int(np.ceil(pitch))
+    outside = tall[(tall >= first - reach) & (tall <= last + reach)]
+    return int(outside.min()), int(outside.max()) + 1, pitch
+
+
+def _trim_border(gray: np.ndarray, x0: int, y0: int, x1: int, y1: int,
+                 max_trim: int = 4) -> Tuple[int, int, int, int]:
+    """Shrink a box past any dark frame drawn around the map"""
+    interior = float(np.median(gray[y0:y1, x0:x1]))
+    limit = 0.35 * interior
+    for _ in range(max_trim):
+        if x1 - x0 > 2 and gray[y0:y1, x0].mean() < limit:
+            x0 += 1
+        if x1 - x0 > 2 and gray[y0:y1, x1 - 1].mean() < limit:
+            x1 -= 1
+        if y1 - y0 > 2 and gray[y0, x0:x1].mean() < limit:
+            y0 += 1
+        if y1 - y0 > 2 and gray[y1 - 1, x0:x1].mean() < limit:
+            y1 -= 1
+    return x0, y0, x1, y1
+
+
+def find_minimap(screen: np.ndarray, origin: Tuple[int, int] = (0, 0),
+                 min_size: int = 150, aspect_tolerance: float = 0.1,
+                 min_squares: float = 3.0) -> Optional[MapLocation]:
+    """Locate the minimap on an RGB screen capture.
+
+    Long thin lines are joined into lattices, largest first. Inside each
+    lattice the vertical and horizontal line histograms must both hold a
+    regular grid comb (``comb_extent``), whose span is the map; HUD panels
+    touching the lattice are not part of the comb. The first roughly
+    square span of at least ``min_size`` pixels and ``min_squares`` grid
+    squares, with a measurable grid, wins. ``origin`` is the screen
+    position of the capture's top-left pixel.
+    """
+    gray = cv2.cvtColor(screen, cv2.COLOR_RGB2GRAY)
+    vertical, horizontal = line_masks(gray, max(8, min_size // 3))
+    lattice = cv2.dilate(cv2.bitwise_or(vertical, horizontal), np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(lattice, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regions = [cv2.boundingRect(c) for c in contours]
+    regions = [r for r in regions if r[2] >= min_size and r[3] >= min_size]
+    for x, y, w, h in sorted(regions, key=lambda r: r[2] * r[3], reverse=True):
+        columns = cv2.reduce(vertical[y:y + h, x:x + w], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+        rows = cv2.reduce(horizontal[y:y + h, x:x + w], 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+        span_x = comb_extent(columns // 255)
+        span_y = comb_extent(rows // 255)
+        if span_x is None or span_y is None:
+            continue
+
+        x0, y0, x1, y1 = _trim_border(gray, x + span_x[0], y + span_y[0],
+                                      x + span_x[1], y + span_y[1])
+        width, height = x1 - x0, y1 - y0
+        if min(width, height) < min_size or abs(width / height - 1) > aspect_tolerance:
+            continue
+        grid = detect_grid_pitch(screen[y0:y1, x0:x1])
+        if grid is None or min(width, height) < min_squares * grid.pitch:
+            continue
+        return MapLocation(bbox=(x0 + origin[0], y0 + origin[1], x1 + origin[0], y1 + origin[1]),
+                           grid=grid)
+    return None
+
+
+def looks_like_map(frame: Optional[np.ndarray], pitch: Optional[float]) -> bool:
+    """Cheap check that a capture of the calibrated bbox is still the minimap.
+
+    A UI-scale change resizes the map, so the grid no longer sits at the
+    calibrated pitch; a closed or moved map loses texture or grid.
+    """
+    if frame is None or frame.size == 0 or float(frame.std()) < MIN_FRAME_STDDEV:
+        return False
+    if pitch:
+        return grid_contrast(frame, pitch) >= MIN_GRID_CONTRAST
+    return detect_grid_pitch(frame) is not None
+
+
+class MapWatcher:
+    """Re-checks the calibrated map on a background timer.
+
+    Every ``interval`` seconds the calibrated bbox is captured and checked
+    with ``looks_like_map``. After ``misses`` failed checks in a row the
+    whole screen is captured and searched, and ``on_change`` receives the
+    new ``MapLocation``, or ``None`` once when no map is visible (e.g. in
+    the hangar). A search that finds nothing new doubles the failed checks
+    needed before the next one, up to ``max_misses``, so a long stay in
+    the hangar doesn't grab the whole screen every few seconds; a passing
+    check or a new calibration (F9, corner clicks, a saved profile)
+    restores ``misses``. ``calibration`` returns the current
+    ``(bbox, grid_pixel_size)``, or ``None`` while uncalibrated. Callbacks
+    run on the watcher thread.
+
+    ``submit`` runs other screen grabs (F9 searches, F6 grid reads) on the
+    same thread, so hotkey handlers on the Tk thread never wait on them.
+    """
+
+    def __init__(self, source: FrameSource, screen_bbox: BBox,
+                 calibration: Callable[[], Optional[Tuple[BBox, Optional[float]]]],
+                 on_change: Callable[[Optional[MapLocation]], None],
+                 interval: float = 2.0, misses: int = 2, max_misses: int = 32):
+        self.source = source
+        self.screen_bbox = screen_bbox
+        self.calibration = calibration
+        self.on_change = on_change
+        self.interval = interval
+        self.misses = misses
+        self.max_misses = max_misses
+
+        self.failed = 0
+        self.search_after = misses
+        self._checked: Optional[Tuple[BBox, Optional[float]]] = None
+        self.lost = False
+        self._jobs = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Counters
+        self.checks = 0
+        self.searches = 0
+        self.jobs = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, job: Callable[[], Any], on_done: Callable[[Any], None]):
+        """Run ``job`` on the watcher thread; ``on_done`` gets its result, or
+        ``None`` if it raised (also on the watcher thread)"""
+        self._jobs.append((job, on_done))
+        self._wake.set()
+
+    def locate(self) -> Optional[MapLocation]:
+        """Search the whole screen for the map"""
+        self.searches += 1
+        screen = self.source.grab(self.screen_bbox)
+        if screen is None:
+            return None
+        return find_minimap(screen, origin=self.screen_bbox[:2])
+
+    def check(self):
+        """One timer tick: verify the calibration, searching again if it broke"""
+        state = self.calibration()
+        if state is None:
+            return
+        bbox, pitch = state
+        state = (tuple(bbox), pitch)
+        if state != self._checked:
+            # Recalibrated: search at the normal rate again
+            self._checked = state
+            self.failed = 0
+            self.search_after = self.misses
+        self.checks += 1
+        if looks_like_map(self.source.grab(bbox), pitch):
+            self.failed = 0
+            self.search_after = self.misses
+            self.lost = False
+            return
+        self.failed += 1
+        if self.failed < self.search_after:
+            return
+        self.failed = 0
+        location = self.locate()
+        if location is not None and location.bbox != tuple(bbox):
+            self.search_after = self.misses
+            self.lost = False
+            self.on_change(location)
+            return
+        self.search_after = min(self.search_after * 2, self.max_misses)
+        if location is None and not self.lost:
+            self.lost = True
+            self.on_change(None)
+
+    def _run_jobs(self):
+        while self._jobs:
+            job, on_done = self._jobs.popleft()
+            self.jobs += 1
+            try:
+                result = job()
+            except Exception:
+                result = None
+            on_done(result)
+
+    def _run(self):
+        next_check = time.perf_counter() + self.interval
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_check - time.perf_counter()))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._run_jobs()
+            if time.perf_counter() < next_check:
+                continue  # Woken for a job, the check isn't due yet
+            next_check = time.perf_counter() + self.interval
+            try:
+                self.check()
+            except Exception:
+                pass  # A failed capture is retried on the next tick
@@ -0,0 +1,288 @@
+"""
+War Thunder Rangefinder - Marker Detection
+Yellow squad marker detection shared by both editions
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+# Yellow color range for War Thunder markers (OpenCV HSV)
+LOWER_YELLOW = np.array([20, 100, 100])
+UPPER_YELLOW = np.array([35, 255, 255])
+
+# Smallest blob (in pixels) counted as a marker when ranging several targets
+MIN_BLOB_AREA = 40
+
+
+@dataclass
+class MarkerResult:
+    """Outcome of one detection pass"""
+    found: bool  # At least one yellow contour was present
+    center: Optional[Tuple[int, int]] = None  # Marker centre in minimap pixels
+    bbox: Optional[Tuple[int, int, int, int]] = None  # Marker x, y, w, h
+
+
+@dataclass
+class Blob:
+    """One qualifying yellow blob"""
+    center: Tuple[float, float]  # Centroid in frame pixels
+    area: int  # Pixel count
+    bbox: Tuple[int, int, int, int]  # x, y, w, h
+
+
+def detect_marker(frame: np.ndarray,
+                  timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+    """Locate the yellow marker in an RGB minimap frame.
+
+    When ``timings`` is given, the seconds spent in each OpenCV stage are
+    written into it keyed by stage name.
+    """
+    t0 = time.perf_counter()
+
+    # Convert to OpenCV format
+    img = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    t1 = time.perf_counter()
+
+    # Create mask
+    mask = cv2.inRange(hsv, LOWER_YELLOW, UPPER_YELLOW)
+    t2 = time.perf_counter()
+
+    if timings is not None:
+        timings['cvtColor'] = t1 - t0
+        timings['inRange'] = t2 - t1
+    return locate_largest_blob(mask, timings)
+
+
+def locate_largest_blob(mask: np.ndarray,
+                        timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+    """Return the centroid of the largest blob in a binary mask"""
+    t0 = time.perf_counter()
+
+    # Find contours
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    t1 = time.perf_counter()
+    if timings is not None:
+        timings['findContours'] = t1 - t0
+    if not contours:
+        return MarkerResult(found=False)
+
+    # Get largest contour (likely the marker)
+    largest_contour = max(contours, key=cv2.contourArea)
+    t2 = time.perf_counter()
+
+    # Get marker center
+    M = cv2.moments(largest_contour)
+    t3 = time.perf_counter()
+    if timings is not None:
+        timings['contourArea'] = t2 - t1
+        timings['moments'] = t3 - t2
+    if M["m00"] == 0:
+        return MarkerResult(found=True)
+
+    marker_x = int(M["m10"] / M["m00"])
+    marker_y = int(M["m01"] / M["m00"])
+    return MarkerResult(found=True, center=(marker_x, marker_y),
+                        bbox=cv2.boundingRect(largest_contour))
+
+
+def locate_blobs(mask: np.ndarray, min_area: int = MIN_BLOB_AREA,
+                 labels: Optional[np.ndarray] = None) -> List[Blob]:
+    """Every blob of at least ``min_area`` pixels, largest first.
+
+    Uses a single connected-components pass, which yields areas and
+    centroids for all blobs at once. ``labels`` may be a reused int32
+    buffer the size of the mask.
+    """
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(
+        mask, labels=labels, connectivity=8, ltype=cv2.CV_32S)
+    areas = stats[1:, cv2.CC_STAT_AREA]  # Row 0 is the background
+    keep = np.nonzero(areas >= min_area)[0]
+    keep = keep[np.argsort(-areas[keep], kind='stable')] + 1
+    return [Blob(center=(float(centroids[i, 0]), float(centroids[i, 1])),
+                 area=int(stats[i, cv2.CC_STAT_AREA]),
+                 bbox=tuple(int(v) for v in stats[i, :4]))
+            for i in keep]
+
+
+class MarkerDetector:
+    """Marker detector that reuses its working buffers between scans.
+
+    The HSV image and mask are allocated once for the calibrated minimap
+    size and rewritten in place on every scan. The RGB frame is converted
+    straight to HSV (no intermediate BGR copy), so a scan performs no
+    full-frame allocations of its own. Buffers are only reallocated when
+    ``configure`` sees a new size, i.e. after a recalibration.
+
+    With ``classifier='lut'`` pixels are classified from their RGB bytes
+    through a precomputed ``ColorLUT`` instead of an HSV conversion. If
+    the table can't reproduce the thresholds exactly (``ColorLUT.exact``),
+    the HSV path is used instead.
+    """
+
+    CLASSIFIERS = ('hsv', 'lut')
+
+    def __init__(self, width: int = 0, height: int = 0, classifier: str = 'hsv',
+                 lower=LOWER_YELLOW, upper=UPPER_YELLOW):
+        if classifier not in self.CLASSIFIERS:
+            raise ValueError(f"Unknown classifier: {classifier}")
+        self.classifier = classifier
+        self.lower = np.array(lower)
+        self.upper = np.array(upper)
+        self.lut = None
+        self.shape: Optional[Tuple[int, int]] = None
+        self.allocations = 0  # Number of times the buffers were (re)built
+        self._hsv: Optional[np.ndarray] = None
+        self._planes: Optional[list] = None
+        self._mask: Optional[np.ndarray] = None
+        self._labels: Optional[np.ndarray] = None
+        if width > 0 and height > 0:
+            self.configure(width, height)
+
+    def set_thresholds(self, lower, upper):
+        """Change the HSV ranges; the lookup table is rebuilt on next use"""
+        self.lower = np.array(lower)
+        self.upper = np.array(upper)
+
+    def ensure_lut(self):
+        """Load (or build) the lookup table for the current thresholds"""
+        from color_lut import ColorLUT
+        if self.lut is None or not self.lut.matches(self.lower, self.upper):
+            self.lut = ColorLUT(self.lower, self.upper)
+
+    def configure(self, width: int, height: int):
+        """Size the working buffers for a ``width`` x ``height`` minimap"""
+        if self.shape == (height, width) or width <= 0 or height <= 0:
+            return
+        self.shape = (height, width)
+        if self.classifier == 'lut':
+            self._planes = [np.empty((height, width), dtype=np.uint8) for _ in range(2)]
+        else:
+            self._hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self._mask = np.empty((height, width), dtype=np.uint8)
+        self._labels = None  # Only needed by detect_all, allocated there
+        self.allocations += 1
+
+    def threshold(self, frame: np.ndarray,
+                  timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Return the marker mask for an RGB frame (a reused buffer)"""
+        self.configure(frame.shape[1], frame.shape[0])
+        t0 = time.perf_counter()
+
+        if self.classifier == 'lut':
+            self.ensure_lut()
+            if self.lut.exact:
+                self.lut.classify(frame, dst=self._mask, planes=self._planes)
+                if timings is not None:
+                    timings['lut'] = time.perf_counter() - t0
+                return self._mask
+            if self._hsv is None or self._hsv.shape[:2] != self.shape:
+                self._hsv = np.empty(self.shape + (3,), dtype=np.uint8)
+
+        cv2.cvtColor(frame, cv2.COLOR_RGB2HSV, dst=self._hsv)
+        t1 = time.perf_counter()
+
+        cv2.inRange(self._hsv, self.lower, self.upper, dst=self._mask)
+        t2 = time.perf_counter()
+
+        if timings is not None:
+            timings['cvtColor'] = t1 - t0
+            timings['inRange'] = t2 - t1
+        return self._mask
+
+    def detect(self, frame: np.ndarray,
+               timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+        """Locate the yellow marker in an RGB minimap frame"""
+        return locate_largest_blob(self.threshold(frame, timings), timings)
+
+    def detect_all(self, frame: np.ndarray, min_area: int = MIN_BLOB_AREA,
+                   timings: Optional[Dict[str, float]] = None) -> List[Blob]:
+        """Every qualifying yellow blob in an RGB minimap frame"""
+        mask = self.threshold(frame, timings)
+        if self._labels is None:
+            self._labels = np.empty(mask.shape, dtype=np.int32)
+        t0 = time.perf_counter()
+        blobs = locate_blobs(mask, min_area, self._labels)
+        if timings is not None:
+            timings['components'] = time.perf_counter() - t0
+        return blobs
+
+
+class PyramidMarkerDetector:
+    """Coarse-to-fine marker detection.
+
+    The frame is point-sampled down by ``factor`` and thresholded to find
+    the largest candidate blob cheaply. Only that blob's bounding box (plus
+    a margin) is then thresholded at full resolution, and the centroid is
+    taken from the full-resolution contour, so it matches a full-frame
+    ``cv2.moments`` result. If the coarse pass finds nothing (e.g. a marker
+    only a few pixels wide) the whole frame is scanned at full resolution.
+    """
+
+    def __init__(self, factor: int = 4, classifier: str = 'hsv',
+                 lower=LOWER_YELLOW, upper=UPPER_YELLOW):
+        self.factor = factor
+        self.coarse = MarkerDetector(classifier=classifier, lower=lower, upper=upper)
+        self.fine = MarkerDetector(classifier=classifier, lower=lower, upper=upper)
+        self.full = MarkerDetector(classifier=classifier, lower=lower, upper=upper)
+        self._small: Optional[np.ndarray] = None
+        self.fallbacks = 0
+
+    def configure(self, width: int, height: int):
+        """Size the coarse and full-resolution buffers for a minimap"""
+        small_w = max(1, width // self.factor)
+        small_h = max(1, height // self.factor)
+        if self._small is None or self._small.shape[:2] != (small_h, small_w):
+            self._small = np.empty((small_h, small_w, 3), dtype=np.uint8)
+        self.coarse.configure(small_w, small_h)
+
+    def set_thresholds(self, lower, upper):
+        for detector in (self.coarse, self.fine, self.full):
+            detector.set_thresholds(lower, upper)
+
+    def detect(self, frame: np.ndarray,
+               timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+        """Locate the yellow marker in an RGB minimap frame"""
+        height, width = frame.shape[:2]
+        self.configure(width, height)
+        t0 = time.perf_counter()
+
+        cv2.resize(frame, self._small.shape[1::-1], dst=self._small,
+                   interpolation=cv2.INTER_NEAREST)
+        coarse = locate_largest_blob(self.coarse.threshold(self._small))
+        t1 = time.perf_counter()
+        if timings is not None:
+            timings['coarse'] = t1 - t0
+
+        if coarse.bbox is None:
+            self.fallbacks += 1
+            return self.full.detect(frame, timings)
+
+        # Candidate box back in full-resolution pixels, with a margin. The
+        # window size is rounded up so the fine buffers are rarely resized.
+        margin = 2 * self.factor
+        bx, by, bw, bh = coarse.bbox
+        win_w = min(width, -(-(bw * self.factor + 2 * margin) // 32) * 32)
+        win_h = min(height, -(-(bh * self.factor + 2 * margin) // 32) * 32)
+        x0 = (2 * bx + bw) * self.factor // 2 - win_w // 2
+        y0 = (2 * by + bh) * self.factor // 2 - win_h // 2
+        x0 = min(max(0, x0), width - win_w)
+        y0 = min(max(0, y0), height - win_h)
+        x1 = x0 + win_w
+        y1 = y0 + win_h
+
+        fine = locate_largest_blob(self.fine.threshold(frame[y0:y1, x0:x1]))
+        t2 = time.perf_counter()
+        if timings is not None:
+            timings['refine'] = t2 - t1
+
+        if fine.center is None:
+            return fine
+        fx, fy, fw, fh = fine.bbox
+        return MarkerResult(found=True,
+                            center=(fine.center[0] + x0, fine.center[1] + y0),
+                            bbox=(fx + x0, fy + y0, fw, fh))
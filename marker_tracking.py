@@ -0,0 +1,238 @@
+"""
+War Thunder Rangefinder - Marker Tracking
+Region-of-interest tracking so repeat scans only look near the last fix
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from frame_sources import BBox, FrameSource
+from marker_detection import Blob, MarkerDetector, MarkerResult, PyramidMarkerDetector
+
+TRACK_WINDOW = 160  # Side of the square searched around the last fix (pixels)
+
+
+def roi_window(center: Tuple[float, float], size: int, width: int,
+               height: int) -> Tuple[int, int, int, int]:
+    """``size`` square (x, y, w, h) around ``center``, shifted to stay inside the map"""
+    roi_w = min(size, width)
+    roi_h = min(size, height)
+    x = int(round(center[0])) - roi_w // 2
+    y = int(round(center[1])) - roi_h // 2
+    x = min(max(0, x), width - roi_w)
+    y = min(max(0, y), height - roi_h)
+    return x, y, roi_w, roi_h
+
+
+class MarkerTracker:
+    """Keeps the last marker position and scans a small window around it.
+
+    Each scan predicts where the marker should be from the last centroid
+    and a smoothed velocity, captures only a ``window`` x ``window`` region
+    around that point and runs detection there. The full map is scanned
+    when there is no fix yet, when the marker is lost or clipped by the
+    window edge, and every ``full_scan_every`` scans so a newly placed
+    (larger) marker elsewhere is still picked up. With ``pyramid_factor``
+    above 1 the full-map scans use coarse-to-fine detection.
+    """
+
+    def __init__(self, window: int = TRACK_WINDOW, classifier: str = 'hsv',
+                 full_scan_every: int = 20, smoothing: float = 0.5,
+                 pyramid_factor: int = 1):
+        self.window = window
+        self.full_scan_every = full_scan_every
+        self.smoothing = smoothing
+
+        # Separate detectors so the ROI and full-map buffers are never resized
+        if pyramid_factor > 1:
+            self.detector = PyramidMarkerDetector(factor=pyramid_factor, classifier=classifier)
+        else:
+            self.detector = MarkerDetector(classifier=classifier)
+        self.roi_detector = MarkerDetector(classifier=classifier)
+
+        self.map_bbox: Optional[BBox] = None
+        self.position: Optional[Tuple[float, float]] = None  # Map pixels
+        self.velocity = (0.0, 0.0)  # Map pixels per second
+        self.last_time: Optional[float] = None
+        self.scans_since_full = 0
+
+        # Counters
+        self.roi_scans = 0
+        self.full_scans = 0
+        self.fallbacks = 0
+
+    def configure(self, map_bbox: BBox):
+        """Size buffers for a new calibration and forget the old fix"""
+        self.map_bbox = tuple(map_bbox)
+        self.detector.configure(map_bbox[2] - map_bbox[0], map_bbox[3] - map_bbox[1])
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked marker so the next scan covers the whole map"""
+        self.position = None
+        self.velocity = (0.0, 0.0)
+        self.last_time = None
+        self.scans_since_full = 0
+
+    def predict(self, now: float) -> Optional[Tuple[float, float]]:
+        """Expected marker position at time ``now``"""
+        if self.position is None:
+            return None
+        dt = now - self.last_time if self.last_time is not None else 0.0
+        return (self.position[0] + self.velocity[0] * dt,
+                self.position[1] + self.velocity[1] * dt)
+
+    def _update(self, center: Tuple[int, int], now: float):
+        if self.position is not None and self.last_time is not None and now > self.last_time:
+            dt = now - self.last_time
+            vx = (center[0] - self.position[0]) / dt
+            vy = (center[1] - self.position[1]) / dt
+            a = self.smoothing
+            self.velocity = (a * vx + (1 - a) * self.velocity[0],
+                             a * vy + (1 - a) * self.velocity[1])
+        self.position = (float(center[0]), float(center[1]))
+        self.last_time = now
+
+    def scan(self, source: FrameSource, map_bbox: BBox, now: Optional[float] = None,
+             timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+        """Detect the marker, returning its centre in map pixels.
+
+        A bbox different from the previous scan's counts as a recalibration,
+        so configuration happens on the scanning thread. ``timings`` gets
+        the detector's per-stage seconds, as in ``MarkerDetector.detect``.
+        """
+        now = time.perf_counter() if now is None else now
+        width = map_bbox[2] - map_bbox[0]
+        height = map_bbox[3] - map_bbox[1]
+        if self.map_bbox != tuple(map_bbox):
+            self.configure(map_bbox)
+
+        predicted = self.predict(now)
+        if (predicted is not None and self.scans_since_full < self.full_scan_every and
+                (self.window < width or self.window < height)):
+            result = self._scan_window(source, map_bbox, predicted, width, height, timings)
+            if result is not None:
+                self.roi_scans += 1
+                self.scans_since_full += 1
+                self._update(result.center, now)
+                return result
+            self.fallbacks += 1
+
+        return self._scan_full(source, map_bbox, now, timings)
+
+    def _scan_window(self, source: FrameSource, map_bbox: BBox,
+                     predicted: Tuple[float, float], width: int, height: int,
+                     timings: Optional[Dict[str, float]] = None) -> Optional[MarkerResult]:
+        """Search the ROI; ``None`` means the marker was lost or clipped"""
+        x, y, roi_w, roi_h = roi_window(predicted, self.window, width, height)
+        frame = source.grab((map_bbox[0] + x, map_bbox[1] + y,
+                             map_bbox[0] + x + roi_w, map_bbox[1] + y + roi_h))
+        if frame is None:
+            return None
+
+        result = self.roi_detector.detect(frame, timings)
+        if result.center is None or result.bbox is None:
+            return None
+
+        # A blob touching an inner window edge may continue outside it
+        bx, by, bw, bh = result.bbox
+        if ((bx == 0 and x > 0) or (by == 0 and y > 0) or
+                (bx + bw >= roi_w and x + roi_w < width) or
+                (by + bh >= roi_h and y + roi_h < height)):
+            return None
+
+        return MarkerResult(found=True,
+                            center=(result.center[0] + x, result.center[1] + y),
+                            bbox=(bx + x, by + y, bw, bh))
+
+    def _scan_full(self, source: FrameSource, map_bbox: BBox, now: float,
+                   timings: Optional[Dict[str, float]] = None) -> MarkerResult:
+        self.full_scans += 1
+        self.scans_since_full = 0
+        frame = source.grab(map_bbox)
+        if frame is None:
+            return MarkerResult(found=False)
+
+        result = self.detector.detect(frame, timings)
+        if result.center is None:
+            self.reset()
+        else:
+            self._update(result.center, now)
+        return result
+
+
+@dataclass
+class Target:
+    """One marker followed across scans by ``MultiTargetTracker``"""
+    id: int
+    position: Tuple[float, float]  # Map pixels
+    area: int
+    hits: int = 1  # Scans the target was seen in
+    misses: int = 0  # Consecutive scans it was missing from
+
+
+class MultiTargetTracker:
+    """Matches every blob of a scan to the previous scan's targets.
+
+    Distances between all targets and all detections are computed at once
+    as a numpy matrix; pairs are then taken greedily from closest to
+    farthest, skipping any further than ``max_distance`` pixels. Matched
+    targets keep their ID, unmatched detections become new targets, and
+    targets missing for more than ``max_misses`` scans are dropped. Greedy
+    matching on sorted distances is exact whenever markers are further
+    apart than they move between scans, which holds at scan rates.
+    """
+
+    def __init__(self, max_distance: float = 40.0, max_misses: int = 2):
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.targets: List[Target] = []
+        self.next_id = 1
+
+    def reset(self):
+        """Forget all targets, e.g. after recalibration"""
+        self.targets = []
+        self.next_id = 1
+
+    def update(self, blobs: List[Blob]) -> List[Target]:
+        """Fold one scan's blobs in and return the visible targets by ID"""
+        matched_targets = set()
+        matched_blobs = set()
+        if self.targets and blobs:
+            old = np.array([t.position for t in self.targets], dtype=np.float64)
+            new = np.array([b.center for b in blobs], dtype=np.float64)
+            dist = np.hypot(old[:, None, 0] - new[None, :, 0],
+                            old[:, None, 1] - new[None, :, 1])
+            rows, cols = np.nonzero(dist <= self.max_distance)
+            order = np.argsort(dist[rows, cols], kind='stable')
+            for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+                if r in matched_targets or c in matched_blobs:
+                    continue
+                matched_targets.add(r)
+                matched_blobs.add(c)
+                target = self.targets[r]
+                target.position = blobs[c].center
+                target.area = blobs[c].area
+                target.hits += 1
+                target.misses = 0
+
+        survivors = []
+        for i, target in enumerate(self.targets):
+            if i not in matched_targets:
+                target.misses += 1
+                if target.misses > self.max_misses:
+                    continue
+            survivors.append(target)
+        for j, blob in enumerate(blobs):
+            if j not in matched_blobs:
+                survivors.append(Target(id=self.next_id, position=blob.center, area=blob.area))
+                self.next_id += 1
+        self.targets = survivors
+        return self.visible()
+
+    def visible(self) -> List[Target]:
+        """Targets seen in the latest scan, ordered by ID"""
+        return sorted((t for t in self.targets if t.misses == 0), key=lambda t: t.id)
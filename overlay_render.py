@@ -0,0 +1,69 @@
+"""
+War Thunder Rangefinder - Overlay Rendering
+Coalesced, rate-limited updates of the overlay's Tk variables
+"""
+
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class OverlayRenderer:
+    """Batches display changes and applies them at a capped frame rate.
+
+    ``set`` may be called from any thread and only records the newest text
+    for a variable. A ``root.after`` loop on the Tk thread applies pending
+    texts at most ``max_fps`` times per second, and only calls
+    ``StringVar.set`` when the text differs from what is already shown, so
+    bursts of identical or superseded updates never reach Tk. Repainting
+    is left to Tk's own idle handling instead of forcing ``root.update()``.
+    """
+
+    def __init__(self, schedule: Callable[[int, Callable], object], max_fps: int = 30):
+        self.schedule = schedule
+        self.frame_ms = max(1, int(1000 / max_fps))
+        self._pending: Dict[str, Tuple[object, str]] = {}
+        self._lock = threading.Lock()
+        self._running = False
+
+        # Counters
+        self.requested = 0  # set() calls
+        self.applied = 0  # StringVar.set() calls actually made
+        self.frames = 0  # Ticks that applied at least one change
+
+    def start(self):
+        """Start the render loop (call on the Tk thread)"""
+        if not self._running:
+            self._running = True
+            self.schedule(self.frame_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def set(self, var, text: str):
+        """Queue ``text`` for a Tk variable; safe from any thread"""
+        with self._lock:
+            self.requested += 1
+            # Tk variables are unhashable, key them by their Tcl name
+            self._pending[str(var)] = (var, text)
+
+    def flush(self):
+        """Apply pending changes now (Tk thread only)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        changed = False
+        for var, text in pending.values():
+            # Compare with the live value: entry fields can be edited by the user
+            if var.get() != text:
+                var.set(text)
+                self.applied += 1
+                changed = True
+        if changed:
+            self.frames += 1
+
+    def _tick(self):
+        try:
+            if self._pending:
+                self.flush()
+        finally:
+            if self._running:
+                self.schedule(self.frame_ms, self._tick)
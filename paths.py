@@ -0,0 +1,8 @@
+"""
+War Thunder Rangefinder - Paths
+Where the rangefinder keeps its caches, profiles, history and metrics
+"""
+
+import os
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.wt_rangefinder')
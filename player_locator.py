@@ -0,0 +1,221 @@
+"""
+War Thunder Rangefinder - Player Locator
+Finds the player's arrow icon so ranges are measured from the player,
+not from the centre of the minimap
+"""
+
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from frame_sources import player_icon_polygon
+
+# Icon sizes tried (centre-to-tip, as a fraction of the shorter map side)
+ICON_SIZE_RATIOS = (1 / 100, 1 / 75, 1 / 56)
+
+# Whiteness the icon centre must reach; normalised correlation alone will
+# happily match the arrow's shape in plain terrain noise
+MIN_ICON_WHITENESS = 160
+
+
+@dataclass
+class PlayerResult:
+    """Player icon location in minimap pixels"""
+    found: bool
+    center: Optional[Tuple[float, float]] = None
+    heading: Optional[float] = None  # Degrees clockwise from north
+    score: float = 0.0
+
+
+@lru_cache(maxsize=64)
+def icon_templates(size: float, headings: int) -> Tuple[np.ndarray, ...]:
+    """Pre-rendered whiteness templates of the icon at one size.
+
+    One template per heading step; the icon centre sits on the template's
+    centre pixel. Cached, so every scale is only rasterised once.
+    """
+    half = int(np.ceil(size)) + 2
+    templates = []
+    for i in range(headings):
+        template = np.zeros((2 * half + 1, 2 * half + 1), dtype=np.uint8)
+        points = player_icon_polygon((half, half), size, 360.0 * i / headings)
+        cv2.fillPoly(template, [np.round(points * 16).astype(np.int32)], 255,
+                     lineType=cv2.LINE_AA, shift=4)
+        templates.append(template)
+    return tuple(templates)
+
+
+class PlayerLocator:
+    """Template-matches the white player arrow, tracking it between scans.
+
+    Matching runs on a whiteness plane (the minimum of R, G and B), in
+    which the icon is bright while terrain, grid lines and the yellow
+    marker are all dark. The first scan, and any scan after the icon is
+    lost, point-samples the frame down by ``factor`` and matches every
+    size at a few headings to acquire the icon. Later scans only match a
+    ``window`` x ``window`` region around the last fix, at the acquired
+    size and the headings within ``turn_steps`` of the last one (all
+    ``headings`` if that fails), which is cheap enough to run on every
+    capture next to marker detection. While no icon can be found the full
+    search is only retried every ``retry_every`` scans.
+    """
+
+    def __init__(self, window: int = 96, factor: int = 4, headings: int = 16,
+                 coarse_headings: int = 4, turn_steps: int = 2, min_score: float = 0.6,
+                 retry_every: int = 10,
+                 size_ratios: Tuple[float, ...] = ICON_SIZE_RATIOS):
+        self.window = window
+        self.factor = factor
+        self.headings = headings
+        self.coarse_headings = coarse_headings
+        self.turn_steps = turn_steps
+        self.min_score = min_score
+        self.retry_every = retry_every
+        self.size_ratios = size_ratios
+
+        self.map_size: Optional[Tuple[int, int]] = None
+        self.sizes: List[float] = []
+        self.position: Optional[Tuple[float, float]] = None
+        self.size_index = 0
+        self.heading_index = 0
+        self.failed_scans = 0
+        self._small: Optional[np.ndarray] = None
+        self._planes: Dict[Tuple[int, int], List[np.ndarray]] = {}
+
+        # Counters
+        self.roi_scans = 0
+        self.acquisitions = 0
+
+    def configure(self, width: int, height: int):
+        """Pick icon sizes and buffers for a minimap size"""
+        if self.map_size == (width, height):
+            return
+        self.map_size = (width, height)
+        self.sizes = [max(3.0, min(width, height) * r) for r in self.size_ratios]
+        small_w = max(1, width // self.factor)
+        small_h = max(1, height // self.factor)
+        self._small = np.empty((small_h, small_w, 3), dtype=np.uint8)
+        self.reset()
+
+    def reset(self):
+        """Forget the last fix so the next scan searches the whole map"""
+        self.position = None
+        self.failed_scans = 0
+
+    def whiteness(self, frame: np.ndarray) -> np.ndarray:
+        """Per-pixel min(R, G, B) of an RGB frame (a reused buffer)"""
+        shape = frame.shape[:2]
+        planes = self._planes.get(shape)
+        if planes is None:
+            planes = [np.empty(shape, dtype=np.uint8) for _ in range(3)]
+            self._planes[shape] = planes
+        r, g, b = cv2.split(frame, planes)
+        cv2.min(r, g, dst=r)
+        return cv2.min(r, b, dst=r)
+
+    @staticmethod
+    def _match(image: np.ndarray, templates, indices):
+        """Best (score, x, y, template index) over ``templates[indices]``"""
+        best = (-1.0, 0.0, 0.0, 0)
+        for i in indices:
+            template = templates[i]
+            if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+                continue
+            scores = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (x, y) = cv2.minMaxLoc(scores)
+            if score > best[0]:
+                half = template.shape[0] // 2
+                best = (score, x + half, y + half, i)
+
+        # Reject dim matches (checks a 3x3 patch, coarse icons are tiny)
+        x, y = best[1], best[2]
+        if best[0] > 0 and image[max(0, y - 1):y + 2, max(0, x - 1):x + 2].max() < MIN_ICON_WHITENESS:
+            return (0.0,) + best[1:]
+        return best
+
+    def locate(self, frame: np.ndarray,
+               timings: Optional[Dict[str, float]] = None) -> PlayerResult:
+        """Find the player icon in an RGB minimap frame"""
+        height, width = frame.shape[:2]
+        self.configure(width, height)
+
+        if self.position is not None:
+            t0 = time.perf_counter()
+            result = self._locate_window(frame, near_heading=True)
+            if timings is not None:
+                timings['player_roi'] = time.perf_counter() - t0
+            if result.found:
+                self.roi_scans += 1
+                self.position = result.center
+                return result
+        elif self.failed_scans % self.retry_every:
+            self.failed_scans += 1
+            return PlayerResult(found=False)
+
+        t0 = time.perf_counter()
+        result = self._acquire(frame)
+        if timings is not None:
+            timings['player_acquire'] = time.perf_counter() - t0
+        self.position = result.center if result.found else None
+        self.failed_scans = 0 if result.found else self.failed_scans + 1
+        return result
+
+    def _locate_window(self, frame: np.ndarray, near_heading: bool = False) -> PlayerResult:
+        """Match headings at the tracked size near the last fix"""
+        height, width = frame.shape[:2]
+        roi_w = min(self.window, width)
+        roi_h = min(self.window, height)
+        x0 = min(max(0, int(round(self.position[0])) - roi_w // 2), width - roi_w)
+        y0 = min(max(0, int(round(self.position[1])) - roi_h // 2), height - roi_h)
+
+        image = self.whiteness(frame[y0:y0 + roi_h, x0:x0 + roi_w])
+        templates = icon_templates(self.sizes[self.size_index], self.headings)
+        score = -1.0
+        if near_heading:
+            turns = range(self.heading_index - self.turn_steps,
+                          self.heading_index + self.turn_steps + 1)
+            score, x, y, index = self._match(image, templates,
+                                             [i % self.headings for i in turns])
+        if score < self.min_score:
+            score, x, y, index = self._match(image, templates, range(self.headings))
+        if score < self.min_score:
+            return PlayerResult(found=False, score=max(0.0, score))
+        self.heading_index = index
+        return PlayerResult(found=True, center=(float(x + x0), float(y + y0)),
+                            heading=360.0 * index / self.headings, score=score)
+
+    def _acquire(self, frame: np.ndarray) -> PlayerResult:
+        """Coarse search over the whole map, then refine in a window"""
+        self.acquisitions += 1
+        cv2.resize(frame, self._small.shape[1::-1], dst=self._small,
+                   interpolation=cv2.INTER_NEAREST)
+        image = self.whiteness(self._small)
+
+        best = (-1.0, 0.0, 0.0, 0)
+        best_size = 0
+        step = max(1, self.headings // self.coarse_headings)
+        for size_index, size in enumerate(self.sizes):
+            candidate = self._match(image, icon_templates(size / self.factor, self.headings),
+                                    range(0, self.headings, step))
+            if candidate[0] > best[0]:
+                best, best_size = candidate, size_index
+
+        if best[0] < self.min_score * 0.75:  # Coarse scores run lower
+            return PlayerResult(found=False, score=max(0.0, best[0]))
+
+        # Refine at full resolution, picking the size there as well
+        self.position = (best[1] * self.factor, best[2] * self.factor)
+        refined = PlayerResult(found=False)
+        for size_index in sorted(range(len(self.sizes)), key=lambda i: abs(i - best_size)):
+            self.size_index = size_index
+            candidate = self._locate_window(frame)
+            if candidate.score > refined.score:
+                refined, chosen = candidate, size_index
+        if refined.found:
+            self.size_index = chosen
+            self.heading_index = int(round(refined.heading * self.headings / 360.0)) % self.headings
+        return refined
@@ -0,0 +1,226 @@
+"""
+War Thunder Rangefinder - Range History
+Append-only log of every range reading, in fixed 36-byte records
+
+The file is a 16-byte header followed by packed records, so it can be
+memory-mapped as a NumPy structured array and filtered without parsing:
+a whole session of readings is a few hundred kilobytes at most, and
+queries over it are vectorised. A torn last record (from a crash) is
+dropped when the log is next opened for writing.
+
+Usage:
+    python range_history.py                      # last 20 readings + stats
+    python range_history.py --since 2h --source auto --stats
+    python range_history.py --since "2024-05-01 18:00" --csv evening.csv
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from paths import CACHE_DIR
+from rangefinder_core import MapConfig
+
+HISTORY_PATH = os.path.join(CACHE_DIR, 'history.wtr')
+MAGIC = b'WTRH'
+VERSION = 1
+
+# Reading sources, stored as their index
+SOURCES = ('manual', 'detect', 'auto')  # F10 clicks, F11, auto-scan
+
+# Positions are minimap pixels: from the player (or first click) to the target
+RECORD = np.dtype([
+    ('time', '<f8'),  # Unix seconds
+    ('x0', '<f4'), ('y0', '<f4'),
+    ('x1', '<f4'), ('y1', '<f4'),
+    ('metres', '<f4'),
+    ('config', '<u4'),  # config_id of the calibration in use
+    ('source', 'u1'),
+    ('pad', 'V3'),
+])
+_PACK = struct.Struct('<d5fIB3x')  # Same layout as RECORD
+HEADER = struct.Struct('<4sHH8x')
+
+
+def config_id(config: MapConfig) -> int:
+    """Short fingerprint of a calibration, so readings can be grouped by map"""
+    key = f"{config.top_left}|{config.bottom_right}|{config.map_size_km:.3f}"
+    return zlib.crc32(key.encode())
+
+
+class RangeHistory:
+    """Appends readings to the log at ``path``, creating it if needed"""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+        else:
+            _check_header(path)
+            # Drop a partly written record left by a crash
+            body = os.path.getsize(path) - HEADER.size
+            if body % RECORD.itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(HEADER.size + body - body % RECORD.itemsize)
+        self._file = open(path, 'ab')
+
+        # Counters
+        self.appended = 0
+
+    def append(self, source: str, start: Tuple[float, float], end: Tuple[float, float],
+               metres: float, config: int, timestamp: Optional[float] = None):
+        """Write one reading (flushed, so a crash loses at most this one)"""
+        self._file.write(_PACK.pack(time.time() if timestamp is None else timestamp,
+                                    start[0], start[1], end[0], end[1], metres,
+                                    config, SOURCES.index(source)))
+        self._file.flush()
+        self.appended += 1
+
+    def close(self):
+        self._file.close()
+
+
+def _check_header(path: str):
+    with open(path, 'rb') as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or size != RECORD.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} range history")
+
+
+def open_history(path: str = HISTORY_PATH) -> np.ndarray:
+    """All readings as a read-only, memory-mapped ``RECORD`` array"""
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=RECORD)
+    _check_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def select(records: np.ndarray, since: Optional[float] = None, until: Optional[float] = None,
+           sources: Optional[Sequence[str]] = None, config: Optional[int] = None) -> np.ndarray:
+    """Readings in ``[since, until)`` from the given sources and calibration"""
+    mask = np.ones(len(records), dtype=bool)
+    if since is not None:
+        mask &= records['time'] >= since
+    if until is not None:
+        mask &= records['time'] < until
+    if sources:
+        mask &= np.isin(records['source'], [SOURCES.index(s) for s in sources])
+    if config is not None:
+        mask &= records['config'] == config
+    return records[mask]
+
+
+def summarise(records: np.ndarray) -> Dict:
+    """Count, time span, range statistics and per-source counts"""
+    if len(records) == 0:
+        return {'count': 0}
+    metres = records['metres'].astype(np.float64)
+    counts = np.bincount(records['source'], minlength=len(SOURCES))
+    return {
+        'count': len(records),
+        'first': float(records['time'].min()),
+        'last': float(records['time'].max()),
+        'min_m': float(metres.min()),
+        'max_m': float(metres.max()),
+        'mean_m': float(metres.mean()),
+        'median_m': float(np.median(metres)),
+        'p95_m': float(np.percentile(metres, 95)),
+        'sources': {name: int(n) for name, n in zip(SOURCES, counts) if n},
+        'configs': len(np.unique(records['config'])),
+    }
+
+
+def parse_time(text: str, now: Optional[float] = None) -> float:
+    """``30m``/``2h``/``1d`` ago, or an ISO date/time, as Unix seconds"""
+    now = time.time() if now is None else now
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text[-1:] in units:
+        try:
+            return now - float(text[:-1]) * units[text[-1]]
+        except ValueError:
+            pass
+    return datetime.fromisoformat(text).timestamp()
+
+
+def time_argument(text: str) -> float:
+    """``parse_time`` for argparse, so a bad --since/--until is a usage error"""
+    try:
+        return parse_time(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid time {text!r} (use e.g. 30m, 2h, 1d or 2024-05-01 18:00)") from None
+
+
+def format_record(record) -> str:
+    stamp = datetime.fromtimestamp(record['time']).strftime('%Y-%m-%d %H:%M:%S')
+    return (f"{stamp}  {SOURCES[record['source']]:<7}"
+            f"({record['x0']:6.1f},{record['y0']:6.1f}) -> ({record['x1']:6.1f},{record['y1']:6.1f})"
+            f"  {record['metres']:8.0f} m  cfg {record['config']:08x}")
+
+
+def write_csv(records: np.ndarray, path: str):
+    with open(path, 'w') as f:
+        f.write("time,source,x0,y0,x1,y1,metres,config\n")
+        for r in records:
+            f.write(f"{r['time']:.3f},{SOURCES[r['source']]},{r['x0']:.1f},{r['y0']:.1f},"
+                    f"{r['x1']:.1f},{r['y1']:.1f},{r['metres']:.1f},{r['config']:08x}\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query the range history log")
+    parser.add_argument('--file', default=HISTORY_PATH, help="History log (default: %(default)s)")
+    parser.add_argument('--since', type=time_argument, help="Start: 30m, 2h, 1d ago or an ISO date/time")
+    parser.add_argument('--until', type=time_argument, help="End, same formats as --since")
+    parser.add_argument('--source', nargs='+', choices=SOURCES, help="Only these sources")
+    parser.add_argument('--config', type=lambda text: int(text, 16), help="Only this calibration (hex id)")
+    parser.add_argument('--last', type=int, default=20, help="Readings to print (0 for none)")
+    parser.add_argument('--stats', action='store_true', help="Only print statistics")
+    parser.add_argument('--csv', metavar='PATH', help="Write the selected readings as CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        records = open_history(args.file)
+    except ValueError as e:
+        sys.exit(str(e))
+    selected = select(records, since=args.since, until=args.until,
+                      sources=args.source, config=args.config)
+
+    if not args.stats and args.last > 0:
+        for record in selected[-args.last:]:
+            print(format_record(record))
+        print()
+
+    stats = summarise(selected)
+    if stats['count'] == 0:
+        print(f"No readings ({len(records)} in {args.file})")
+    else:
+        first = datetime.fromtimestamp(stats['first']).strftime('%Y-%m-%d %H:%M')
+        last = datetime.fromtimestamp(stats['last']).strftime('%Y-%m-%d %H:%M')
+        sources = ", ".join(f"{name} {n}" for name, n in stats['sources'].items())
+        print(f"{stats['count']} readings of {len(records)}, {first} .. {last} ({sources}, "
+              f"{stats['configs']} calibrations)")
+        print(f"range m: min {stats['min_m']:.0f}  median {stats['median_m']:.0f}  "
+              f"mean {stats['mean_m']:.0f}  p95 {stats['p95_m']:.0f}  max {stats['max_m']:.0f}")
+
+    if args.csv:
+        write_csv(selected, args.csv)
+        print(f"{len(selected)} readings written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
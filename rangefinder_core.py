@@ -0,0 +1,109 @@
+"""
+War Thunder Rangefinder - Core Geometry
+Map calibration and pixel -> metre conversion, free of any GUI or input
+library so it can be imported for offline ranging
+
+Every conversion accepts a scalar or a NumPy array and broadcasts, so
+thousands of points are ranged in one call. NumPy itself is only
+imported on first use, so the overlay can draw its window without it.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ArrayLike = Union[float, 'np.ndarray']
+
+
+@dataclass
+class MapConfig:
+    """Configuration for map measurements"""
+    top_left: Optional[Tuple[int, int]] = None
+    bottom_right: Optional[Tuple[int, int]] = None
+    map_size_km: float = 65.0
+    grid_size_km: float = 2.0  # Size of one grid square in km
+    grid_pixel_size: Optional[float] = None  # Measured pixel size of one grid square
+    map_size_manual: bool = False  # Map size typed in; automatic grid re-measures keep it
+
+    @property
+    def is_configured(self) -> bool:
+        return self.top_left is not None and self.bottom_right is not None
+
+    @property
+    def is_grid_measured(self) -> bool:
+        return self.grid_pixel_size is not None
+
+    @property
+    def width(self) -> int:
+        if not self.is_configured:
+            return 0
+        return self.bottom_right[0] - self.top_left[0]
+
+    @property
+    def height(self) -> int:
+        if not self.is_configured:
+            return 0
+        return self.bottom_right[1] - self.top_left[1]
+
+    @property
+    def km_per_pixel(self) -> float:
+        """Map scale, 0 until the corners are set"""
+        if not self.is_configured:
+            return 0.0
+        avg_dimension = (self.width + self.height) / 2
+        return self.map_size_km / avg_dimension
+
+    @property
+    def centre(self) -> Tuple[int, int]:
+        """Map centre in minimap pixels"""
+        return self.width // 2, self.height // 2
+
+    def pixels_to_km(self, pixel_distance: ArrayLike) -> ArrayLike:
+        """Convert pixel distance to kilometers"""
+        return pixel_distance * self.km_per_pixel
+
+    def pixels_to_m(self, pixel_distance: ArrayLike) -> ArrayLike:
+        """Convert pixel distance to metres"""
+        return pixel_distance * (self.km_per_pixel * 1000)
+
+    def auto_calculate_map_size(self) -> Optional[float]:
+        """Auto-calculate map size based on grid measurements"""
+        if not self.is_configured or not self.is_grid_measured:
+            return None
+
+        # Calculate average map dimension in pixels
+        avg_dimension = (self.width + self.height) / 2
+
+        # Calculate number of grid squares that fit in the map
+        num_grids = avg_dimension / self.grid_pixel_size
+
+        # Calculate total map size
+        return num_grids * self.grid_size_km
+
+
+def pixel_distances(starts, ends) -> 'np.ndarray':
+    """Euclidean pixel distances between ``(..., 2)`` point arrays (broadcasts)"""
+    import numpy as np
+
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    return np.hypot(ends[..., 0] - starts[..., 0], ends[..., 1] - starts[..., 1])
+
+
+def ranges_m(config: MapConfig, starts, ends) -> 'np.ndarray':
+    """Ground distances in metres between pixel pairs, e.g. two ``(N, 2)`` arrays"""
+    return config.pixels_to_m(pixel_distances(starts, ends))
+
+
+def ranges_from_m(config: MapConfig, origin, points) -> 'np.ndarray':
+    """Ground distances in metres from one origin (e.g. the player) to many points"""
+    return ranges_m(config, origin, points)
+
+
+def format_range(metres: float) -> str:
+    """Overlay text for a range: metres below 1 km, kilometres above"""
+    if metres >= 1000:
+        return f"{metres / 1000:.2f} km"
+    return f"{int(metres)} m"
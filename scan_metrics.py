@@ -0,0 +1,175 @@
+"""
+War Thunder Rangefinder - Scan Metrics
+Rolling per-stage latency percentiles for the live performance panel
+
+The detect thread records a few floats per scan; percentiles are only
+computed when the panel refreshes or the data is exported, so recording
+costs about as much as the ``perf_counter`` calls around each stage.
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+PERCENTILES = (50, 95, 99)
+
+# Detector timing keys -> panel stage. Keys of one scan that share a stage
+# are summed (e.g. contour area and moments are both centroiding).
+STAGE_GROUPS = {
+    'cvtColor': 'colour',
+    'inRange': 'mask',
+    'lut': 'colour+mask',  # One table lookup does both
+    'findContours': 'contours',
+    'components': 'contours',
+    'contourArea': 'centroid',
+    'moments': 'centroid',
+    'coarse': 'coarse scan',  # Pyramid full-map scans are timed per level
+    'refine': 'refine',
+    'player_roi': 'player',
+    'player_acquire': 'player',
+}
+
+# Panel order; stages not listed here follow in the order first seen
+STAGE_ORDER = ('capture', 'change', 'colour', 'mask', 'colour+mask', 'coarse scan',
+               'refine', 'contours', 'centroid', 'player', 'multi', 'detect', 'ui')
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Linearly interpolated ``p``th percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarise(samples, count: int) -> Dict[str, float]:
+    """pNN in milliseconds of second ``samples``, plus the sample counts"""
+    ordered = sorted(samples)
+    values = {f'p{p}': percentile(ordered, p) * 1000 for p in PERCENTILES}
+    values['window'] = len(ordered)
+    values['count'] = count
+    return values
+
+
+class RollingHistogram:
+    """The last ``size`` samples of one stage, in seconds"""
+
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self.count = 0  # Samples ever recorded
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        return summarise(self.samples, self.count)
+
+
+class ScanMetrics:
+    """Per-stage rolling histograms and the scan rate, shared across threads.
+
+    ``record`` and ``record_timings`` are called from the capture, detect
+    and Tk threads; ``summary``, ``format`` and the exports can be called
+    from any thread. ``rate_window`` is the span in seconds over which
+    scans per second are averaged.
+    """
+
+    def __init__(self, size: int = 500, rate_window: float = 10.0):
+        self.size = size
+        self.rate_window = rate_window
+        self.stages: Dict[str, RollingHistogram] = {}
+        self._scan_times = deque()
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+        # Counters
+        self.scans = 0
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = RollingHistogram(self.size)
+            histogram.add(seconds)
+
+    def record_timings(self, timings: Dict[str, float]):
+        """Record one scan's detector ``timings`` dict, grouped into stages"""
+        grouped: Dict[str, float] = {}
+        for key, seconds in timings.items():
+            stage = STAGE_GROUPS.get(key, key)
+            grouped[stage] = grouped.get(stage, 0.0) + seconds
+        for stage, seconds in grouped.items():
+            self.record(stage, seconds)
+
+    def scan_done(self, now: Optional[float] = None):
+        """Count one completed scan for the scans-per-second figure"""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self.scans += 1
+            self._scan_times.append(now)
+            while self._scan_times and now - self._scan_times[0] > self.rate_window:
+                self._scan_times.popleft()
+
+    def scans_per_second(self, now: Optional[float] = None) -> float:
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            recent = [t for t in self._scan_times if now - t <= self.rate_window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(now - recent[0], 1e-9)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self._scan_times.clear()
+            self.scans = 0
+            self.started = time.time()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Stage -> pNN ms and counts, in panel order"""
+        with self._lock:
+            snapshot = {stage: (list(h.samples), h.count) for stage, h in self.stages.items()}
+        order = [s for s in STAGE_ORDER if s in snapshot]
+        order += [s for s in snapshot if s not in order]
+        return {stage: summarise(*snapshot[stage]) for stage in order}
+
+    def format(self) -> str:
+        """Fixed-width table for the overlay panel"""
+        lines = [f"{'stage':<12}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for stage, values in self.summary().items():
+            lines.append(f"{stage:<12}{values['p50']:>7.2f}{values['p95']:>7.2f}{values['p99']:>7.2f}")
+        lines.append(f"{self.scans_per_second():.1f} scans/s, {self.scans} scans")
+        return "\n".join(lines)
+
+    def export(self) -> Dict:
+        """Everything the panel shows, as plain data"""
+        return {
+            'started': self.started,
+            'exported': time.time(),
+            'scans': self.scans,
+            'scans_per_second': self.scans_per_second(),
+            'stages': self.summary(),
+        }
+
+    def to_json(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.export(), f, indent=2)
+
+    def to_csv(self, path: str):
+        """One row per stage; the scan rate goes in its own row"""
+        data = self.export()
+        fields = ['stage'] + [f'p{p}_ms' for p in PERCENTILES] + ['window', 'count']
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for stage, values in data['stages'].items():
+                writer.writerow([stage] + [round(values[f'p{p}'], 4) for p in PERCENTILES] +
+                                [values['window'], values['count']])
+            writer.writerow(['scans_per_second', round(data['scans_per_second'], 3), '', '',
+                             '', data['scans']])
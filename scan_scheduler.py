@@ -0,0 +1,170 @@
+"""
+War Thunder Rangefinder - Scan Scheduler
+Adaptive, interruptible timing for the auto-scan loop
+"""
+
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+Position = Tuple[float, float]
+
+
+class AdaptiveScanScheduler:
+    """Runs ``scan`` on a background thread at an adaptive interval.
+
+    ``scan(requested)`` returns the marker position in map pixels (or
+    ``None``); ``requested`` is true for a scan asked for through
+    ``request_scan``. With ``deferred`` the scan only starts the work, and
+    whoever receives the result passes its cost and position to ``record``;
+    the wait before the next scan then follows the interval that result
+    sets. The next interval is chosen from:
+
+    - measured scan cost: never spend more than ``cpu_budget`` of one core
+    - recent marker motion: while the marker moves, scan often enough that
+      it travels at most ``motion_tolerance`` pixels between readings, but
+      never less often than ``latency_target`` seconds
+    - quiet periods: when nothing moves the interval backs off towards
+      ``max_interval`` so the CPU stays idle
+
+    Waiting happens on a condition, so ``stop``, ``request_scan`` and a
+    deferred ``record`` take effect immediately instead of after the
+    current sleep.
+    """
+
+    def __init__(self, scan: Callable[[bool], Optional[Position]],
+                 latency_target: float = 0.5,
+                 min_interval: float = 0.05,
+                 max_interval: float = 3.0,
+                 cpu_budget: float = 0.1,
+                 motion_tolerance: float = 3.0,
+                 backoff: float = 1.5,
+                 deferred: bool = False):
+        self.scan = scan
+        self.deferred = deferred
+        self.latency_target = latency_target
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.motion_tolerance = motion_tolerance
+        self.backoff = backoff
+
+        self.interval = min_interval
+        self.scan_cost = 0.0  # Smoothed seconds per scan
+        self.speed = 0.0  # Smoothed marker speed, map pixels per second
+        self.scans = 0
+        self.requested_scans = 0
+
+        self._last_position: Optional[Position] = None
+        self._last_time: Optional[float] = None
+        self._wake = threading.Condition()
+        self._scan_requested = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping: Optional[threading.Thread] = None  # Stopped but still finishing a scan
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def position(self) -> Optional[Position]:
+        """Marker position from the last recorded scan"""
+        return self._last_position
+
+    def start(self):
+        """Start the scan thread (no-op if already running)"""
+        if self.is_running:
+            return
+        # A fresh event per run: a thread still finishing a scan after a
+        # timed-out stop() must not see a restart clear its stop flag
+        self._stop = threading.Event()
+        self._scan_requested = False
+        self.interval = self.min_interval
+        self._thread = threading.Thread(target=self._run, args=(self._stop, self._stopping),
+                                        daemon=True)
+        self._stopping = None
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the scan thread, interrupting any wait"""
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        self._stopping = thread if thread and thread.is_alive() else None
+        self._thread = None
+
+    def request_scan(self):
+        """Scan as soon as possible, e.g. for a manual F11 press"""
+        self.requested_scans += 1
+        with self._wake:
+            self._scan_requested = True
+            self._wake.notify_all()
+
+    def set_latency_target(self, seconds: float):
+        """Change the staleness limit used while the marker moves"""
+        self.latency_target = seconds
+        self.interval = min(self.interval, seconds)
+
+    def _run(self, stop: threading.Event, previous: Optional[threading.Thread]):
+        if previous is not None:
+            previous.join()  # Never scan alongside the last run's final scan
+        while not stop.is_set():
+            with self._wake:
+                requested, self._scan_requested = self._scan_requested, False
+            start = time.perf_counter()
+            position = self.scan(requested)
+            if stop.is_set():
+                break  # Stopped mid-scan; a newer run may own the state now
+            if not self.deferred:
+                self.record(time.perf_counter() - start, position)
+
+            # The interval is re-read on every wake, so a deferred result
+            # arriving during the wait re-times it
+            scanned = time.perf_counter()
+            with self._wake:
+                while not stop.is_set() and not self._scan_requested:
+                    remaining = scanned + self.interval - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+
+    def record(self, cost: float, position: Optional[Position], now: Optional[float] = None):
+        """Fold one scan's cost and result into the next interval"""
+        now = time.perf_counter() if now is None else now
+        self.scans += 1
+        self.scan_cost = cost if self.scans == 1 else 0.7 * self.scan_cost + 0.3 * cost
+
+        moved = False
+        if position is not None and self._last_position is not None and self._last_time is not None:
+            dt = now - self._last_time
+            if dt > 0:
+                distance = ((position[0] - self._last_position[0]) ** 2 +
+                            (position[1] - self._last_position[1]) ** 2) ** 0.5
+                self.speed = 0.5 * self.speed + 0.5 * distance / dt
+                moved = distance > 1.0
+        elif position is not None:
+            moved = True  # Newly acquired marker: keep watching closely
+        if position is not None or self._last_position is not None:
+            self._last_position = position
+            self._last_time = now
+
+        self.interval = self.next_interval(moved)
+        with self._wake:
+            self._wake.notify_all()
+
+    def next_interval(self, moved: bool) -> float:
+        """Pick the wait before the next scan"""
+        if moved and self.speed > 0:
+            interval = min(self.latency_target, self.motion_tolerance / self.speed)
+        elif moved:
+            interval = self.latency_target
+        else:
+            interval = self.interval * self.backoff
+
+        # Cap CPU use: a scan costing c seconds runs at most every c / budget
+        floor = max(self.min_interval, self.scan_cost / self.cpu_budget)
+        return min(self.max_interval, max(floor, interval))
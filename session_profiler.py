@@ -0,0 +1,229 @@
+"""
+War Thunder Rangefinder - Session Profiler
+Profiling mode for stutter reports (``--profile`` on either edition)
+
+While the overlay runs, a sampler thread records the stack of every
+thread every few milliseconds, so the Tk loop, hotkey handlers, auto-scan
+and pipeline threads are all covered at a small constant cost. Entry
+points wrapped with ``wrap`` also get call counts and worst-case times,
+and with ``deterministic`` they run under ``cProfile``. ``tracemalloc``
+snapshots show where memory grew. On ``stop`` the output directory gets:
+
+    report.txt      hottest functions, handler timings, allocation growth
+    stacks.folded   collapsed stacks for flamegraph.pl / speedscope
+    profile.pstats  cProfile data of the wrapped entry points (deterministic)
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class HandlerStats:
+    """Call count and durations of one wrapped entry point"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, seconds: float):
+        self.calls += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+
+
+class SessionProfiler:
+    """Samples all threads and times wrapped entry points until ``stop``.
+
+    ``interval`` is the sampling period in seconds; ``snapshot_every`` is
+    how often (seconds) the newest ``tracemalloc`` snapshot is replaced.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005,
+                 deterministic: bool = False, trace_memory: bool = True,
+                 memory_frames: int = 5, snapshot_every: float = 10.0):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.deterministic = deterministic
+        self.trace_memory = trace_memory
+        self.memory_frames = memory_frames
+        self.snapshot_every = snapshot_every
+
+        self.stacks: Counter = Counter()
+        self.handlers: Dict[str, HandlerStats] = {}
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._first_snapshot = None
+        self._last_snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started = 0.0
+        self.stopped = 0.0
+
+        # Counters
+        self.samples = 0
+
+    def start(self):
+        """Start sampling and memory tracing"""
+        if self._thread is not None:
+            return
+        if self.trace_memory:
+            tracemalloc.start(self.memory_frames)
+            self._first_snapshot = tracemalloc.take_snapshot()
+        self.started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+        self._thread.start()
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """``func`` timed (and cProfiled in deterministic mode) as ``name``"""
+        stats = self.handlers.setdefault(name, HandlerStats())
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = None
+            # cProfile hooks one profiler per thread; an outer one (e.g. the
+            # Tk loop's) already covers nested entry points
+            if self.deterministic and sys.getprofile() is None:
+                key = (name, threading.get_ident())
+                profile = self._profiles.get(key)
+                if profile is None:
+                    with self._lock:
+                        profile = self._profiles.setdefault(key, cProfile.Profile())
+                profile.enable()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                if profile is not None:
+                    profile.disable()
+                with self._lock:
+                    stats.add(seconds)
+        return wrapper
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        next_snapshot = time.perf_counter() + self.snapshot_every
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                                 f":{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if self.trace_memory and time.perf_counter() >= next_snapshot:
+                self._last_snapshot = tracemalloc.take_snapshot()
+                next_snapshot = time.perf_counter() + self.snapshot_every
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and write the output files; returns the report path"""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stopped = time.perf_counter()
+        if self.trace_memory:
+            self._last_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, 'stacks.folded'), 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        if self._profiles:
+            stats = pstats.Stats(*self._profiles.values())
+            stats.dump_stats(os.path.join(self.output_dir, 'profile.pstats'))
+        path = os.path.join(self.output_dir, 'report.txt')
+        with open(path, 'w') as f:
+            f.write(self.format_report())
+        return path
+
+    def hottest(self, limit: int = 25) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """Functions by samples on top of the stack (self) and anywhere in it (total)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return own.most_common(limit), total.most_common(limit)
+
+    def format_report(self) -> str:
+        duration = (self.stopped or time.perf_counter()) - self.started
+        stack_samples = sum(self.stacks.values()) or 1
+        lines = [f"Profiled {duration:.1f} s, {self.samples} samples every "
+                 f"{self.interval * 1000:.0f} ms ({stack_samples} thread stacks)", ""]
+
+        own, total = self.hottest()
+        for title, rows in (("Self time (top of stack)", own), ("Total time (anywhere in stack)", total)):
+            lines.append(title)
+            for frame, count in rows:
+                lines.append(f"  {count / stack_samples * 100:6.1f}%  {frame}")
+            lines.append("")
+
+        lines.append("Entry points")
+        lines.append(f"  {'name':<24}{'calls':>8}{'mean ms':>10}{'max ms':>10}")
+        for name, stats in sorted(self.handlers.items(), key=lambda item: -item[1].total):
+            mean = stats.total / stats.calls * 1000 if stats.calls else 0.0
+            lines.append(f"  {name:<24}{stats.calls:>8}{mean:>10.2f}{stats.worst * 1000:>10.2f}")
+        lines.append("")
+
+        if self._first_snapshot is not None and self._last_snapshot is not None:
+            lines.append("Memory growth since start (tracemalloc)")
+            for diff in self._last_snapshot.compare_to(self._first_snapshot, 'lineno')[:15]:
+                lines.append(f"  {diff.size_diff / 1024:+10.1f} KiB {diff.count_diff:+7d} blocks  "
+                             f"{diff.traceback[0]}")
+            lines.append("")
+
+        if self._profiles:
+            lines.append("cProfile of entry points (cumulative, top 30)")
+            stream = io.StringIO()
+            pstats.Stats(*self._profiles.values(), stream=stream).sort_stats('cumulative').print_stats(30)
+            lines.extend(stream.getvalue().splitlines())
+        return "\n".join(lines) + "\n"
+
+
+def add_profile_arguments(parser):
+    """The ``--profile`` options shared by both editions' ``main``"""
+    parser.add_argument('--profile', nargs='?', metavar='DIR',
+                        const=f"wt_profile-{time.strftime('%Y%m%d-%H%M%S')}",
+                        help="Profile the session and write a report to DIR on exit")
+    parser.add_argument('--profile-interval', type=float, default=5.0, metavar='MS',
+                        help="Stack sampling period in ms (default 5)")
+    parser.add_argument('--profile-deterministic', action='store_true',
+                        help="Also run hotkeys, scans and the Tk loop under cProfile (slower)")
+    parser.add_argument('--profile-no-memory', action='store_true',
+                        help="Skip tracemalloc (it slows allocation-heavy code)")
+
+
+def profiler_from_args(args) -> Optional[SessionProfiler]:
+    """A started profiler if ``--profile`` was given"""
+    if args.profile is None:
+        return None
+    profiler = SessionProfiler(args.profile, interval=args.profile_interval / 1000,
+                               deterministic=args.profile_deterministic,
+                               trace_memory=not args.profile_no_memory)
+    profiler.start()
+    print(f"Profiling to {os.path.abspath(args.profile)}")
+    return profiler
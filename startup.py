@@ -0,0 +1,124 @@
+"""
+War Thunder Rangefinder - Startup
+Shows the overlay window first and loads the detection engine behind it
+
+Only tkinter and small local modules are imported before the window is
+drawn; NumPy, OpenCV, PIL and the hotkey library are imported on a
+background thread, which then warms the detection path up on a synthetic
+frame so the first F11 is as fast as every later one.
+"""
+
+import importlib
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Reference point for the startup report; this module is imported first
+LAUNCHED = time.perf_counter()
+
+# Heavy modules the overlay needs only once detection starts. PIL's
+# ImageGrab and the input libraries are otherwise first imported by the
+# first capture and by hotkey/click listener setup.
+ENGINE_MODULES = ('numpy', 'cv2', 'PIL.ImageGrab', 'keyboard', 'pynput.mouse')
+
+
+class StartupReport:
+    """Times from launch to each startup milestone, in order"""
+
+    def __init__(self, started: float = LAUNCHED):
+        self.started = started
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> float:
+        """Record a milestone (only its first time); returns seconds since launch"""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.started
+        return self.marks[name]
+
+    def format(self) -> str:
+        """e.g. ``Startup: window 92 ms, engine 431 ms, warm-up 655 ms``"""
+        return "Startup: " + ", ".join(f"{name} {seconds * 1000:.0f} ms"
+                                       for name, seconds in self.marks.items())
+
+
+class EngineLoader:
+    """Runs ``build`` on a background thread and hands over to the Tk thread.
+
+    ``build`` imports and creates the heavy detection objects. Tk must
+    only be touched from its own thread, so completion is picked up by a
+    ``schedule`` (``root.after``) poll, which then calls ``on_ready`` or
+    ``on_error`` with the exception ``build`` raised.
+    """
+
+    def __init__(self, build: Callable[[], None], on_ready: Callable[[], None],
+                 schedule: Callable[[int, Callable], object],
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 poll_ms: int = 20):
+        self.build = build
+        self.on_ready = on_ready
+        self.schedule = schedule
+        self.on_error = on_error
+        self.poll_ms = poll_ms
+        self.error: Optional[Exception] = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    def start(self):
+        """Start loading (call on the Tk thread)"""
+        threading.Thread(target=self._run, daemon=True).start()
+        self.schedule(self.poll_ms, self._poll)
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._done.set()
+
+    def _poll(self):
+        if not self._done.is_set():
+            self.schedule(self.poll_ms, self._poll)
+        elif self.error is None:
+            self.on_ready()
+        elif self.on_error:
+            self.on_error(self.error)
+
+
+def preload(modules: Sequence[str] = ENGINE_MODULES):
+    """Import ``modules`` so later imports of them are free"""
+    for name in modules:
+        importlib.import_module(name)
+
+
+def warm_up(tracker, player_locator, bbox: Tuple[int, int, int, int] = (0, 0, 512, 512),
+            detectors: Sequence = ()):
+    """Run the detection path once on a synthetic minimap of ``bbox``'s size.
+
+    Pays OpenCV's first-call costs, loads any colour table, rasterises the
+    player icon templates and sizes the buffers for ``bbox``, so the first
+    real scan of that calibration costs what every later one does. The
+    tracked positions are forgotten afterwards.
+    """
+    import numpy as np
+    from frame_sources import ArrayFrameSource, render_minimap
+    from grid_detection import detect_grid_pitch
+
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    minimap = render_minimap(width, height, marker=(width * 0.3, height * 0.6),
+                             player=(width * 0.5, height * 0.5),
+                             rng=np.random.default_rng(0))
+    frame = minimap.frame
+    tracker.scan(ArrayFrameSource([frame], origin=bbox[:2]), bbox)
+    if tracker.roi_detector.classifier == 'lut':
+        tracker.roi_detector.ensure_lut()
+    for detector in detectors:
+        detector.detect_all(frame)
+    player_locator.locate(frame)
+    detect_grid_pitch(frame)
+
+    tracker.reset()
+    player_locator.reset()
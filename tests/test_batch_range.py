@@ -0,0 +1,71 @@
+"""Batch ranging rows over a directory of synthetic screenshots"""
+
+import json
+import math
+
+import pytest
+from PIL import Image
+
+import batch_range
+from batch_range import main, run_batch
+from frame_sources import render_minimap, render_screen
+
+MAP = (600, 100, 920, 420)
+OPTIONS = {'mode': 'map', 'map': MAP, 'map_size': 16.0, 'grid_size': 0.2,
+           'profile_key': None, 'profiles': None}
+
+
+def save(path, frame):
+    Image.fromarray(frame).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def shots(tmp_path, rng):
+    """Two screenshots with the marker at (100, 300) on the map, and a broken file"""
+    screen = render_screen(960, 540, MAP, rng=rng, grid_pixel_size=40.0,
+                           marker=(100.0, 300.0), decoys=0).frame
+    paths = [save(tmp_path / f"shot{i}.png", screen) for i in range(2)]
+    (tmp_path / "shot2.png").write_bytes(b"not a png")
+    return paths + [str(tmp_path / "shot2.png")]
+
+
+def test_rows_range_the_marker_from_the_map_centre(shots):
+    rows = list(run_batch(shots, OPTIONS, workers=1))
+    assert [row['path'] for row in rows] == shots
+    for row in rows[:2]:
+        assert row['error'] == "" and row['found']
+        assert (row['marker_x'], row['marker_y']) == (100, 300)
+        assert row['metres'] == pytest.approx(math.hypot(60, 140) * 50, abs=75)
+    assert rows[2]['error'].startswith("unreadable")
+
+
+def test_minimap_crops_take_the_map_size_from_the_grid(tmp_path, rng):
+    path = save(tmp_path / "crop.png", render_minimap(400, 400, grid_pixel_size=50.0,
+                                                      marker=(100.0, 300.0), rng=rng).frame)
+    options = dict(OPTIONS, mode='minimap', map_size=None)
+    row, = run_batch([path], options, workers=1)
+    assert row['map_km'] == pytest.approx(1.6, abs=0.02)  # 8 squares of 0.2 km
+    assert (row['map_left'], row['map_right']) == (0, 400)
+
+
+def test_failures_become_error_rows(shots, monkeypatch):
+    rows = list(run_batch(shots[:1], dict(OPTIONS, map=(800, 300, 1200, 700)), workers=1))
+    assert rows[0]['error'] == "map rectangle outside the image"
+
+    def broken(image):
+        raise IndexError("bad crop")
+
+    monkeypatch.setattr(batch_range, '_map_for', broken)
+    rows = list(run_batch(shots, OPTIONS, workers=1))
+    assert [row['error'] for row in rows[:2]] == ["IndexError: bad crop"] * 2
+    assert rows[2]['error'].startswith("unreadable")
+
+
+def test_cli_writes_json_lines_from_a_pool(shots, tmp_path, capsys):
+    out = tmp_path / "rows.jsonl"
+    main([str(tmp_path), '--map', *map(str, MAP), '--map-size', '16', '--workers', '2',
+          '--out', str(out)])
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [row['found'] for row in rows] == [True, True, False]
+    assert "marker found in 2, 1 errors" in capsys.readouterr().err
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+
+from calibration_profiles import (CalibrationProfile, ProfileStore, PROFILE_VERSION,
+                                  layout_key, validate_profile)
+from frame_sources import render_minimap
+from rangefinder_core import MapConfig
+
+
+def make_profile(**overrides):
+    fields = dict(top_left=(1500, 660), bottom_right=(1900, 1060),
+                  map_size_km=16.0, grid_size_km=0.2, grid_pixel_size=50.0,
+                  map_size_manual=True, saved_at=123.0)
+    fields.update(overrides)
+    return CalibrationProfile(**fields)
+
+
+def test_layout_key():
+    assert layout_key((2560, 1440)) == "2560x1440/screen"
+    assert layout_key((2560, 1440), (0, 0, 1920, 1080)) == "2560x1440/window 0,0,1920,1080"
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / 'sub' / 'profiles.json')
+    store = ProfileStore(path)
+    assert store.profiles == {}
+
+    screen = make_profile()
+    window = make_profile(top_left=(10, 20), bottom_right=(330, 340), grid_pixel_size=None)
+    store.put(layout_key((1920, 1080)), screen)
+    store.put(layout_key((1920, 1080), (0, 0, 1280, 720)), window)
+
+    reloaded = ProfileStore(path)
+    assert reloaded.get("1920x1080/screen") == screen
+    assert reloaded.get("1920x1080/window 0,0,1280,720") == window
+    assert reloaded.get("2560x1440/screen") is None
+    assert reloaded.get("1920x1080/screen").bbox == (1500, 660, 1900, 1060)
+
+
+def test_store_ignores_corrupt_and_old_files(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text("{not json")
+    assert ProfileStore(str(path)).profiles == {}
+
+    path.write_text(json.dumps({'version': PROFILE_VERSION + 1,
+                                'profiles': {'1920x1080/screen': {}}}))
+    assert ProfileStore(str(path)).profiles == {}
+
+    path.write_text(json.dumps({'version': PROFILE_VERSION,
+                                'profiles': {'1920x1080/screen': {'top_left': [0, 0]}}}))
+    assert ProfileStore(str(path)).profiles == {}
+
+
+def test_profile_applies_to_config():
+    profile = make_profile()
+    config = MapConfig()
+    profile.apply(config)
+    assert CalibrationProfile.from_config(config).bbox == profile.bbox
+    assert config.grid_pixel_size == 50.0 and config.map_size_manual
+
+
+def test_validate_profile(rng):
+    profile = make_profile(top_left=(0, 0), bottom_right=(400, 400))
+    frame = render_minimap(400, 400, grid_pixel_size=50.0, rng=rng).frame
+    assert validate_profile(profile, frame)
+
+    assert not validate_profile(profile, None)
+    assert not validate_profile(profile, frame[:300])
+    assert not validate_profile(profile, np.full_like(frame, 90))
+    # The map moved: the saved grid pitch no longer fits
+    assert not validate_profile(profile, render_minimap(400, 400, grid_pixel_size=36.0, rng=rng).frame)
@@ -0,0 +1,104 @@
+"""XShm capture checked against PIL ImageGrab (most tests need an X display, e.g. xvfb-run)"""
+
+import ctypes
+import os
+import time
+
+import numpy as np
+import pytest
+
+import capture_backends
+from capture_backends import CaptureUnavailable, XShmFrameSource, _XErrorEvent, _XErrorHandler
+from frame_sources import ScreenFrameSource
+
+needs_display = pytest.mark.skipif(not os.environ.get('DISPLAY'),
+                                   reason="needs an X display (run under Xvfb)")
+
+BBOX = (40, 30, 160, 110)  # Screen rect of the test window
+BACKGROUND = (255, 128, 0)
+PATCH = (0, 192, 255)  # Top-left 60x40 of the window
+
+
+@pytest.fixture
+def xshm():
+    try:
+        source = XShmFrameSource()
+    except CaptureUnavailable as e:
+        pytest.skip(str(e))
+    yield source
+    source.close()
+
+
+@pytest.fixture
+def window():
+    """A borderless two-colour window at ``BBOX``"""
+    tk = pytest.importorskip('tkinter')
+    root = tk.Tk()
+    root.overrideredirect(True)
+    width, height = BBOX[2] - BBOX[0], BBOX[3] - BBOX[1]
+    root.geometry(f"{width}x{height}+{BBOX[0]}+{BBOX[1]}")
+    canvas = tk.Canvas(root, width=width, height=height, highlightthickness=0,
+                       background='#%02x%02x%02x' % BACKGROUND)
+    canvas.create_rectangle(0, 0, 60, 40, fill='#%02x%02x%02x' % PATCH, outline='')
+    canvas.pack()
+    for _ in range(5):
+        root.update()
+        time.sleep(0.05)
+    yield root
+    root.destroy()
+
+
+@needs_display
+def test_xshm_matches_pil(xshm, window):
+    try:
+        expected = ScreenFrameSource().grab(BBOX)
+    except OSError as e:
+        pytest.skip(f"PIL cannot grab this display: {e}")
+    frame = xshm.grab(BBOX)
+    assert frame.shape == expected.shape == (BBOX[3] - BBOX[1], BBOX[2] - BBOX[0], 3)
+    np.testing.assert_array_equal(frame, expected)
+    assert tuple(frame[10, 10]) == PATCH
+    assert tuple(frame[60, 100]) == BACKGROUND
+
+
+@needs_display
+def test_xshm_segments_are_reused_per_size(xshm, window):
+    small = (BBOX[0], BBOX[1], BBOX[0] + 20, BBOX[1] + 20)
+    for bbox in (BBOX, small, BBOX, small):
+        assert xshm.grab(bbox) is not None
+    assert xshm.segments_created == 2
+    assert xshm.grabs == 4
+
+
+@needs_display
+def test_xshm_installs_its_error_handler_once(xshm):
+    set_handler = xshm.libs.x11.XSetErrorHandler
+    installed = set_handler(None)
+    set_handler(installed)
+    assert installed == ctypes.cast(capture_backends._installed_handler, ctypes.c_void_p).value
+
+    second = XShmFrameSource()
+    try:
+        assert xshm.grab((0, 0, 16, 16)) is not None
+        assert second.grab((0, 0, 16, 16)) is not None
+        assert set_handler(installed) == installed  # Not swapped per grab or per backend
+    finally:
+        second.close()
+
+
+def test_errors_on_other_displays_go_to_the_previous_handler(monkeypatch):
+    seen = []
+    previous = _XErrorHandler(lambda display, event: seen.append((display, event.contents.error_code)) or 0)
+    ours = [], []
+    monkeypatch.setattr(capture_backends, '_previous_handler', previous)
+    monkeypatch.setattr(capture_backends, '_error_lists', {0x1000: ours[0], 0x2000: ours[1]})
+
+    def error(display, code):
+        event = _XErrorEvent(error_code=code)
+        return capture_backends._on_x_error(display, ctypes.pointer(event))
+
+    assert error(0x1000, 8) == 0
+    assert error(0x2000, 9) == 0
+    assert error(0x3000, 10) == 0
+    assert ours == ([8], [9])
+    assert seen == [(0x3000, 10)]
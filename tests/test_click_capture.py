@@ -0,0 +1,89 @@
+"""ClickCapture state machine, driven by injected clicks (no mouse listener)"""
+
+from click_capture import ClickCapture, ClickSequence
+
+
+class Recorder:
+    """Collects status lines and runs ``call_soon`` callbacks immediately"""
+
+    def __init__(self):
+        self.statuses = []
+        self.done = []
+        self.cancelled = 0
+
+    def status(self, text):
+        self.statuses.append(text)
+
+    def call_soon(self, callback, *args):
+        callback(*args)
+
+    def sequence(self, prompts=("first", "second"), **kwargs):
+        return ClickSequence(prompts=prompts, on_done=self.done.append,
+                             on_cancel=self.cancel, **kwargs)
+
+    def cancel(self):
+        self.cancelled += 1
+
+
+def capture():
+    recorder = Recorder()
+    return ClickCapture(recorder.status, recorder.call_soon), recorder
+
+
+def test_clicks_while_idle_are_ignored():
+    clicks, recorder = capture()
+    clicks.feed(10, 20)
+    assert clicks.ignored == 1 and clicks.clicks == 0
+    assert recorder.statuses == [] and recorder.done == []
+
+
+def test_sequence_prompts_then_completes():
+    clicks, recorder = capture()
+    assert clicks.begin(recorder.sequence())
+    assert clicks.active
+    clicks.feed(10, 20)
+    clicks.feed(10, 20, pressed=False)  # Releases don't count
+    clicks.feed(30, 40)
+
+    assert recorder.statuses == ["first", "second"]
+    assert recorder.done == [[(10, 20), (30, 40)]]
+    assert not clicks.active
+    assert (clicks.clicks, clicks.completed) == (2, 1)
+
+    clicks.feed(50, 60)  # Back to idle
+    assert clicks.ignored == 1 and len(recorder.done) == 1
+
+
+def test_only_one_sequence_at_a_time():
+    clicks, recorder = capture()
+    assert clicks.begin(recorder.sequence())
+    assert not clicks.begin(recorder.sequence(prompts=("other",)))
+    assert recorder.statuses == ["first"]
+
+
+def test_rejected_clicks_keep_the_prompt():
+    clicks, recorder = capture()
+    sequence = recorder.sequence(prompts=("inside",), accept=lambda x, y: x < 100,
+                                 reject_message="outside the map")
+    clicks.begin(sequence)
+    clicks.feed(150, 10)
+    assert clicks.active and recorder.statuses[-1] == "outside the map"
+    clicks.feed(50, 10)
+    assert recorder.done == [[(50, 10)]]
+
+
+def test_cancel_drops_the_sequence():
+    clicks, recorder = capture()
+    assert not clicks.cancel()
+
+    clicks.begin(recorder.sequence())
+    clicks.feed(1, 2)
+    assert clicks.cancel()
+    assert recorder.cancelled == 1 and clicks.cancelled == 1
+    assert not clicks.active
+
+    # A new sequence starts from its first click
+    clicks.begin(recorder.sequence(prompts=("a", "b")))
+    clicks.feed(3, 4)
+    clicks.feed(5, 6)
+    assert recorder.done == [[(3, 4), (5, 6)]]
@@ -0,0 +1,78 @@
+"""ColorLUT classification checked against the HSV path it stands in for"""
+
+import numpy as np
+import pytest
+
+from color_lut import ColorLUT
+from frame_sources import render_minimap
+from marker_detection import LOWER_YELLOW, UPPER_YELLOW, MarkerDetector
+
+
+@pytest.fixture(scope='module')
+def yellow_lut():
+    """The default yellow table, built without touching ``~/.wt_rangefinder``"""
+    return ColorLUT(LOWER_YELLOW, UPPER_YELLOW, cache_dir=None)
+
+
+def lut_detector(lut, **kwargs):
+    detector = MarkerDetector(classifier='lut', **kwargs)
+    detector.lut = lut  # Matches the thresholds, so ensure_lut keeps it
+    return detector
+
+
+def test_table_is_exact(yellow_lut):
+    assert yellow_lut.agreement == 1.0
+    assert yellow_lut.exact
+    assert yellow_lut.table.shape == (65536,)
+
+
+def test_mask_matches_hsv(yellow_lut, rng):
+    frame = rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8)
+    hsv = MarkerDetector().threshold(frame).copy()
+    assert np.array_equal(hsv, lut_detector(yellow_lut).threshold(frame))
+
+
+def test_mask_matches_hsv_on_cropped_view(yellow_lut, rng):
+    frame = rng.integers(0, 256, size=(200, 300, 3), dtype=np.uint8)
+    view = frame[17:181, 23:287]  # Not contiguous, as ROI scans pass
+    hsv = MarkerDetector().threshold(np.ascontiguousarray(view)).copy()
+    assert np.array_equal(hsv, lut_detector(yellow_lut).threshold(view))
+
+
+def test_detection_matches_hsv(yellow_lut, rng):
+    detector = lut_detector(yellow_lut)
+    for _ in range(5):
+        marker = (float(rng.integers(20, 380)), float(rng.integers(20, 380)))
+        frame = render_minimap(400, 400, marker=marker, decoys=15, rng=rng).frame
+        assert detector.detect(frame) == MarkerDetector().detect(frame)
+
+
+def test_inexpressible_range_falls_back_to_hsv(rng):
+    lower, upper = [100, 50, 50], [130, 255, 200]  # Blue: not a B prefix per (R, G)
+    lut = ColorLUT(lower, upper, cache_dir=None)
+    assert not lut.exact
+
+    frame = rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+    hsv = MarkerDetector(lower=lower, upper=upper).threshold(frame).copy()
+    assert np.array_equal(hsv, lut_detector(lut, lower=lower, upper=upper).threshold(frame))
+
+
+def test_cache_round_trip(tmp_path):
+    built = ColorLUT(LOWER_YELLOW, UPPER_YELLOW, cache_dir=str(tmp_path))
+    loaded = ColorLUT(LOWER_YELLOW, UPPER_YELLOW, cache_dir=str(tmp_path))
+    assert not built.loaded_from_cache and loaded.loaded_from_cache
+    assert np.array_equal(built.table, loaded.table)
+    assert loaded.agreement == built.agreement
+
+    other = ColorLUT([22, 100, 100], UPPER_YELLOW, cache_dir=str(tmp_path))
+    assert not other.loaded_from_cache
+    assert other.matches([22, 100, 100], UPPER_YELLOW)
+    assert not other.matches(LOWER_YELLOW, UPPER_YELLOW)
+
+
+def test_hsv_is_the_default():
+    assert MarkerDetector().classifier == 'hsv'
+    from marker_tracking import MarkerTracker
+    tracker = MarkerTracker(pyramid_factor=4)
+    assert tracker.roi_detector.classifier == 'hsv'
+    assert tracker.detector.full.classifier == 'hsv'
@@ -0,0 +1,196 @@
+"""LatestQueue, the capture/detect/deliver pipeline and the pro capture stage"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from detection_pipeline import DetectionPipeline, FramePacket, LatestQueue
+from frame_change import FrameChangeDetector
+from frame_sources import FrameSource, _crop_to_bbox, render_minimap
+from marker_tracking import TRACK_WINDOW, roi_window
+from rangefinder_core import MapConfig
+from scan_metrics import ScanMetrics
+from scan_scheduler import AdaptiveScanScheduler
+
+
+def test_latest_queue_keeps_the_newest():
+    queue = LatestQueue(maxlen=2)
+    for item in range(5):
+        queue.put(item)
+    assert queue.dropped == 3
+    assert [queue.get_nowait(), queue.get_nowait(), queue.get_nowait()] == [3, 4, None]
+
+
+def test_latest_queue_get_waits_for_a_put():
+    queue = LatestQueue()
+    assert queue.get(timeout=0.01) is None
+    threading.Timer(0.05, queue.put, args=('late',)).start()
+    assert queue.get(timeout=2.0) == 'late'
+
+
+class Pipeline:
+    """A DetectionPipeline whose Tk poll is driven by the test"""
+
+    def __init__(self, capture, detect=lambda packet: packet):
+        self.delivered = []
+        self.errors = []
+        self.polls = []
+        self.pipeline = DetectionPipeline(capture, detect, self.delivered.append,
+                                          lambda ms, func: self.polls.append(func),
+                                          on_error=self.errors.append)
+
+    def poll_until(self, done, timeout=2.0):
+        deadline = time.perf_counter() + timeout
+        while not done() and time.perf_counter() < deadline:
+            self.polls.pop()()
+            time.sleep(0.005)
+
+
+def packet(manual):
+    return FramePacket(np.zeros((4, 4, 3), np.uint8), (0, 0, 4, 4), time.perf_counter(), manual)
+
+
+def test_requests_flow_to_the_tk_thread():
+    test = Pipeline(packet)
+    test.pipeline.start()
+    try:
+        test.pipeline.request(manual=True)
+        test.poll_until(lambda: test.delivered)
+        assert len(test.delivered) == 1 and test.delivered[0].manual
+        assert (test.pipeline.captured, test.pipeline.detected) == (1, 1)
+
+        calls = []
+        test.pipeline.call_soon(calls.append, 'ran')
+        test.polls.pop()()
+        assert calls == ['ran']
+    finally:
+        test.pipeline.stop()
+
+
+def test_manual_request_survives_coalescing():
+    release = threading.Event()
+    seen = []
+
+    def capture(manual):
+        seen.append(manual)
+        release.wait(1.0)
+        return None
+
+    test = Pipeline(capture)
+    test.pipeline.start()
+    try:
+        test.pipeline.request()
+        time.sleep(0.05)  # Capture thread is now inside capture(False)
+        test.pipeline.request()
+        test.pipeline.request(manual=True)
+        test.pipeline.request()
+        release.set()
+        deadline = time.perf_counter() + 2.0
+        while len(seen) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        assert seen == [False, True]  # The three coalesce into one manual capture
+    finally:
+        test.pipeline.stop()
+
+
+def test_stage_errors_reach_the_error_handler():
+    def capture(manual):
+        raise RuntimeError("grab failed")
+
+    test = Pipeline(capture)
+    test.pipeline.start()
+    try:
+        test.pipeline.request()
+        test.poll_until(lambda: test.errors)
+        assert [str(e) for e in test.errors] == ["grab failed"]
+        assert test.pipeline.captured == 0
+    finally:
+        test.pipeline.stop()
+
+
+# ----------------------------------------------------------------------
+# The pro overlay's capture stage, without a window
+# ----------------------------------------------------------------------
+
+MAP = (100, 50, 500, 450)
+
+
+class Screen(FrameSource):
+    def __init__(self, frame):
+        self.frame = frame
+        self.grabs = []
+
+    def grab(self, bbox):
+        self.grabs.append(tuple(bbox))
+        return _crop_to_bbox(self.frame, bbox, (0, 0)).copy()
+
+
+def overlay(rng, marker=(200.0, 150.0), player=None):
+    from wt_rangefinder_pro import AdvancedRangefinderOverlay as Overlay
+
+    screen = np.zeros((600, 800, 3), np.uint8)
+    screen[50:450, 100:500] = render_minimap(400, 400, marker=marker, rng=rng).frame
+    state = SimpleNamespace(
+        config=MapConfig(top_left=MAP[:2], bottom_right=MAP[2:]),
+        analyzer=SimpleNamespace(position=None),
+        frame_source=Screen(screen),
+        change_detector=FrameChangeDetector(),
+        metrics=ScanMetrics(),
+        scheduler=AdaptiveScanScheduler(lambda requested: None, deferred=True),
+        range_all_enabled=False,
+        player_center=player,
+        map_bbox=lambda: MAP,
+    )
+    state.change_windows = lambda bbox: Overlay.change_windows(state, bbox)
+    state.capture = lambda manual: Overlay.capture_frame(state, manual)
+    return state
+
+
+def test_unlocked_scans_fingerprint_the_whole_map(rng):
+    state = overlay(rng)
+    assert state.capture(False).frame.shape == (400, 400, 3)
+    assert state.capture(False) is None  # Unchanged
+    assert state.frame_source.grabs == [MAP, MAP]
+
+
+def test_locked_scans_fingerprint_only_the_tracker_window(rng):
+    state = overlay(rng, player=(380.0, 390.0))
+    state.analyzer.position = (200.0, 150.0)
+    marker_window = roi_window((200.0, 150.0), TRACK_WINDOW, 400, 400)
+    player_window = roi_window((380.0, 390.0), TRACK_WINDOW, 400, 400)
+    windows = [(MAP[0] + x, MAP[1] + y, MAP[0] + x + w, MAP[1] + y + h)
+               for x, y, w, h in (marker_window, player_window)]
+
+    first = state.capture(False)
+    assert first.frame.shape == (400, 400, 3)  # Changed: the whole map for detection
+    assert state.frame_source.grabs == windows + [MAP]
+
+    state.frame_source.grabs.clear()
+    assert state.capture(False) is None
+    assert state.frame_source.grabs == windows  # Unchanged: the map is never grabbed
+    assert state.scheduler.scans == 1  # Recorded as a scan without motion
+
+    # A marker appearing inside the window is a change
+    state.frame_source.frame[50 + 140:50 + 160, 100 + 220:100 + 240] = (255, 214, 0)
+    assert state.capture(False) is not None
+
+
+def test_manual_scans_skip_the_fingerprint(rng):
+    state = overlay(rng)
+    state.analyzer.position = (200.0, 150.0)
+    assert state.capture(True).manual
+    assert state.capture(True) is not None
+    assert state.frame_source.grabs == [MAP, MAP]
+    assert state.change_detector.checks == 0
+
+
+@pytest.mark.parametrize('center, expected', [
+    ((200.0, 150.0), (120, 70, 160, 160)),
+    ((5.0, 395.0), (0, 240, 160, 160)),  # Shifted back inside the map
+])
+def test_roi_window(center, expected):
+    assert roi_window(center, TRACK_WINDOW, 400, 400) == expected
+    assert roi_window(center, 600, 400, 300) == (0, 0, 400, 300)
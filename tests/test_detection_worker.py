@@ -0,0 +1,66 @@
+"""Detection in a worker process: shared memory ring, replies and recovery"""
+
+import pytest
+
+from detection_worker import DetectionWorker, FrameAnalyzer
+from frame_sources import render_minimap
+
+BBOX = (100, 50, 420, 370)
+
+
+@pytest.fixture
+def worker():
+    worker = DetectionWorker(timeout=10.0)
+    worker.start()
+    yield worker
+    worker.close()
+
+
+def minimap(rng, width=320, height=320):
+    return render_minimap(width, height, marker=(120.0, 200.0), player=(200.0, 100.0),
+                          grid_pixel_size=40.0, decoys=0, rng=rng).frame
+
+
+def test_worker_matches_in_process_analysis(worker, rng):
+    frame = minimap(rng)
+    analyzer = FrameAnalyzer()
+    expected = analyzer.analyze(frame, BBOX, 1.0, range_all=True)
+
+    timings = {}
+    result, targets, player = worker.analyze(frame, BBOX, 1.0, range_all=True, timings=timings)
+    assert result == expected[0]
+    assert targets == expected[1]
+    assert player == expected[2]
+    assert worker.position == analyzer.position
+    assert timings and worker.frames == 1
+
+
+def test_ring_grows_for_bigger_maps(worker, rng):
+    small = minimap(rng)
+    for _ in range(worker.slots + 1):  # Wraps around the ring
+        assert worker.analyze(small, BBOX, 1.0, range_all=False)[0].found
+    ring = worker._ring.name
+
+    big = minimap(rng, 480, 480)
+    result = worker.analyze(big, (0, 0, 480, 480), 2.0, range_all=False)[0]
+    assert worker._ring.name != ring
+    assert worker._slot_bytes == big.nbytes
+    assert result.center == pytest.approx((120, 200), abs=1.5)
+    assert worker.restarts == 0 and worker.failures == 0
+
+
+def test_dead_or_slow_worker_is_replaced(worker, rng):
+    frame = minimap(rng)
+    worker._process.kill()
+    worker._process.join()
+    assert worker.analyze(frame, BBOX, 1.0, range_all=False)[0].found
+    assert (worker.failures, worker.restarts) == (1, 1)
+
+    # No reply within the timeout: both attempts fail and the frame is dropped
+    worker.timeout = 0.0
+    assert worker.analyze(frame, BBOX, 2.0, range_all=False) is None
+    assert (worker.failures, worker.restarts) == (3, 2)
+
+    worker.timeout = 10.0
+    assert worker.analyze(frame, BBOX, 3.0, range_all=False)[0].found
+    assert worker.restarts == 3
@@ -0,0 +1,51 @@
+"""FrameChangeDetector: capture noise is ignored, a new marker is not"""
+
+import cv2
+import numpy as np
+
+from frame_change import FrameChangeDetector
+from frame_sources import MARKER_RGB, render_minimap
+
+
+def with_grain(frame, rng, sigma=2.0):
+    grain = rng.normal(0, sigma, frame.shape)
+    return np.clip(frame + grain, 0, 255).astype(np.uint8)
+
+
+def test_sensor_noise_is_unchanged(rng):
+    frame = render_minimap(600, 600, marker=(300.0, 300.0), rng=rng).frame
+    changes = FrameChangeDetector()
+    assert changes.has_changed(frame)  # First frame is always new
+    for _ in range(5):
+        assert not changes.has_changed(with_grain(frame, rng))
+    assert (changes.checks, changes.skipped) == (6, 5)
+    assert changes.skip_ratio == 5 / 6
+
+
+def test_new_marker_is_a_change(rng):
+    frame = render_minimap(600, 600, rng=rng).frame
+    changes = FrameChangeDetector()
+    changes.has_changed(frame)
+    marked = frame.copy()
+    cv2.circle(marked, (123, 456), 7, MARKER_RGB, -1)
+    assert changes.has_changed(marked)
+    assert not changes.has_changed(marked)
+
+
+def test_slow_drift_accumulates(rng):
+    frame = render_minimap(300, 300, noise=0, rng=rng).frame
+    changes = FrameChangeDetector(threshold=3.0)
+    changes.has_changed(frame)
+    results = [changes.has_changed(np.clip(frame.astype(np.int16) + step, 0, 255).astype(np.uint8))
+               for step in range(1, 6)]
+    assert results == [False, False, False, True, False]  # 4 levels from the reference
+
+
+def test_reset_and_resize_count_as_changes(rng):
+    frame = render_minimap(300, 300, rng=rng).frame
+    changes = FrameChangeDetector()
+    changes.has_changed(frame)
+    changes.reset()
+    assert changes.has_changed(frame)
+    assert changes.has_changed(frame[:20, :30])  # Smaller than the grid
+    assert not changes.has_changed(frame[:20, :30])
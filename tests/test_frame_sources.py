@@ -0,0 +1,67 @@
+"""Frame sources and the synthetic minimaps the other tests are built on"""
+
+import numpy as np
+import pytest
+
+from frame_sources import (MARKER_RGB, ArrayFrameSource, DirectoryFrameSource,
+                           SyntheticFrameSource, render_minimap, render_screen)
+
+
+def test_array_source_crops_screens_and_passes_minimaps(rng):
+    screen = rng.integers(0, 256, (100, 200, 3), dtype=np.uint8)
+    bbox = (50, 20, 90, 60)
+    source = ArrayFrameSource([screen])
+    crop = source.grab(bbox)
+    assert np.array_equal(crop, screen[20:60, 50:90])
+    assert np.shares_memory(crop, source.frames[0])  # A view, not a copy
+
+    minimap = screen[:40, :40]
+    assert ArrayFrameSource([minimap]).grab(bbox).shape == (40, 40, 3)
+
+
+def test_array_source_origin_and_looping(rng):
+    frames = [np.full((60, 80, 3), i, dtype=np.uint8) for i in range(2)]
+    source = ArrayFrameSource(frames, loop=False, origin=(100, 200))
+    first = source.grab((110, 210, 130, 240))
+    assert first.shape == (30, 20, 3) and first[0, 0, 0] == 0
+    assert source.grab((110, 210, 130, 240))[0, 0, 0] == 1
+    assert source.grab((110, 210, 130, 240)) is None
+
+    looping = ArrayFrameSource(frames)
+    assert [looping.grab((0, 0, 80, 60))[0, 0, 0] for _ in range(3)] == [0, 1, 0]
+
+
+def test_directory_source_reads_in_name_order(tmp_path):
+    from PIL import Image
+    for name, value in [('b.png', 20), ('a.png', 10), ('notes.txt', None)]:
+        if value is None:
+            (tmp_path / name).write_text("not an image")
+        else:
+            Image.fromarray(np.full((30, 40, 3), value, dtype=np.uint8)).save(tmp_path / name)
+
+    source = DirectoryFrameSource(str(tmp_path), loop=False)
+    assert [f[0, 0, 0] for f in (source.grab((0, 0, 40, 30)), source.grab((0, 0, 40, 30)))] == [10, 20]
+    assert source.grab((0, 0, 40, 30)) is None
+
+
+def test_render_minimap_ground_truth(rng):
+    minimap = render_minimap(300, 200, marker=(120.0, 80.0), marker_radius=6, decoys=5, rng=rng)
+    assert minimap.frame.shape == (200, 300, 3) and minimap.frame.dtype == np.uint8
+    assert tuple(minimap.frame[80, 120]) == MARKER_RGB
+    assert len(minimap.decoys) == 5
+    assert minimap.grid_pixel_size == pytest.approx(200 / 8)
+
+
+def test_render_screen_places_the_minimap(rng):
+    screen = render_screen(640, 480, (400, 200, 600, 400), rng=rng, marker=(50.0, 60.0))
+    assert screen.frame.shape == (480, 640, 3)
+    assert np.array_equal(screen.frame[200:400, 400:600], screen.minimap.frame)
+    assert tuple(screen.frame[260, 450]) == MARKER_RGB
+
+
+def test_synthetic_source_follows_positions():
+    source = SyntheticFrameSource(positions=[(30.0, 40.0), (60.0, 70.0)], seed=1)
+    for expected in [(30.0, 40.0), (60.0, 70.0), (30.0, 40.0)]:
+        frame = source.grab((0, 0, 120, 100))
+        assert frame.shape == (100, 120, 3)
+        assert source.last.marker == expected
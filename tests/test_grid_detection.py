@@ -0,0 +1,51 @@
+"""Grid pitch detection and zoom watching on synthetic minimaps"""
+
+import numpy as np
+import pytest
+
+from frame_sources import render_minimap
+from grid_detection import GridWatcher, detect_grid_pitch
+
+
+@pytest.mark.parametrize('pitch', [18.0, 25.6, 40.0, 63.3])
+def test_pitch_is_sub_pixel(pitch, rng):
+    minimap = render_minimap(512, 512, grid_pixel_size=pitch, marker=(200.0, 300.0),
+                             decoys=10, rng=rng)
+    estimate = detect_grid_pitch(minimap.frame)
+    assert estimate is not None
+    assert estimate.pitch == pytest.approx(pitch, abs=0.1)
+    assert estimate.residual < 1.0
+
+
+def test_non_square_frame(rng):
+    frame = render_minimap(600, 400, grid_pixel_size=30.0, rng=rng).frame
+    assert detect_grid_pitch(frame).pitch == pytest.approx(30.0, abs=0.1)
+
+
+def test_no_grid(rng):
+    frame = render_minimap(300, 300, grid_pixel_size=1000.0, rng=rng).frame
+    assert detect_grid_pitch(frame) is None
+    assert detect_grid_pitch(rng.integers(0, 256, (300, 300, 3), dtype=np.uint8)) is None
+
+
+def test_watcher_reports_confirmed_zoom_changes_only(rng):
+    near = render_minimap(400, 400, grid_pixel_size=50.0, rng=rng).frame
+    far = render_minimap(400, 400, grid_pixel_size=25.0, rng=rng).frame
+    watcher = GridWatcher(interval=1.0)
+    watcher.reset(50.0)  # Calibrated pitch
+
+    readings = [watcher.update(frame, now=t) for t, frame in
+                enumerate([near, far, near, far, far, far])]
+    assert readings[:4] == [None] * 4  # A one-off reading is not a change
+    assert readings[4] == pytest.approx(25.0, abs=0.1)
+    assert readings[5] is None
+    assert watcher.changes == 1
+
+
+def test_watcher_first_reading_is_the_reference(rng):
+    frame = render_minimap(400, 400, grid_pixel_size=40.0, rng=rng).frame
+    watcher = GridWatcher(interval=1.0)
+    assert watcher.update(frame, now=0.0) is None
+    assert watcher.pitch == pytest.approx(40.0, abs=0.1)
+    assert watcher.update(frame, now=0.5) is None  # Within the interval: not checked
+    assert watcher.checks == 1
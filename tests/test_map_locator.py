@@ -0,0 +1,95 @@
+"""Minimap location and the background map watcher on synthetic screens"""
+
+import numpy as np
+import pytest
+
+from frame_sources import render_minimap, render_screen
+from map_locator import MapWatcher, find_minimap, looks_like_map
+
+
+class ScreenSource:
+    """Grabs regions of a fixed synthetic screen"""
+
+    def __init__(self, screen):
+        self.screen = screen
+
+    def grab(self, bbox):
+        left, top, right, bottom = bbox
+        return self.screen[top:bottom, left:right].copy()
+
+
+@pytest.mark.parametrize('screen_size, map_bbox, pitch', [
+    ((1920, 1080), (1500, 660, 1900, 1060), 50.0),
+    ((1920, 1080), (40, 500, 360, 820), 32.0),
+    ((2560, 1440), (1900, 820, 2540, 1420), 40.0),
+])
+def test_find_minimap(screen_size, map_bbox, pitch, rng):
+    # Tactical maps hold a whole number of squares
+    screen = render_screen(*screen_size, map_bbox, rng=rng, grid_pixel_size=pitch,
+                           marker=(100.0, 120.0), decoys=10)
+    location = find_minimap(screen.frame)
+    assert location is not None
+    assert location.bbox == pytest.approx(map_bbox, abs=2)
+    assert location.grid.pitch == pytest.approx(pitch, rel=0.01)
+
+    # Screen coordinates of a capture that doesn't start at (0, 0)
+    left, top = 1000, 200
+    crop = screen.frame[top:, left:]
+    if map_bbox[0] >= left:
+        shifted = find_minimap(crop, origin=(left, top))
+        assert shifted.bbox == location.bbox
+
+
+def test_find_minimap_without_a_map(rng):
+    screen = render_screen(1280, 720, (100, 100, 400, 400), rng=rng).frame
+    screen[90:410, 90:410] = (90, 96, 80)  # Paint the map out, keep the HUD clutter
+    assert find_minimap(screen) is None
+
+
+def test_looks_like_map(rng):
+    frame = render_minimap(300, 300, grid_pixel_size=30.0, rng=rng).frame
+    assert looks_like_map(frame, 30.0)
+    assert not looks_like_map(rng.integers(0, 256, (300, 300, 3), dtype=np.uint8), 30.0)
+    assert not looks_like_map(None, 30.0)
+
+
+def watch(screen, calibration, **kwargs):
+    height, width = screen.shape[:2]
+    changes = []
+    watcher = MapWatcher(ScreenSource(screen), (0, 0, width, height),
+                         calibration, changes.append, **kwargs)
+    return watcher, changes
+
+
+def test_watcher_follows_a_moved_map(rng):
+    screen = render_screen(1280, 720, (800, 300, 1200, 700), rng=rng, grid_pixel_size=40.0).frame
+    watcher, changes = watch(screen, lambda: ((100, 100, 500, 500), 40.0))
+    watcher.check()
+    assert changes == [] and watcher.searches == 0  # One miss isn't enough
+    watcher.check()
+    assert watcher.searches == 1
+    assert changes[0].bbox == pytest.approx((800, 300, 1200, 700), abs=2)
+
+
+def test_watcher_backs_off_while_no_map_is_visible(rng):
+    screen = render_screen(1280, 720, (100, 100, 400, 400), rng=rng).frame
+    screen[90:410, 90:410] = (90, 96, 80)  # Hangar: no map anywhere
+    calibration = [((100, 100, 400, 400), 30.0)]
+    watcher, changes = watch(screen, lambda: calibration[0], misses=2, max_misses=8)
+
+    searched_at = []
+    for tick in range(40):
+        before = watcher.searches
+        watcher.check()
+        if watcher.searches > before:
+            searched_at.append(tick)
+    # Searches after 2, 4, 8, then every 8 failed checks
+    assert searched_at == [1, 5, 13, 21, 29, 37]
+    assert changes == [None]  # Reported once
+
+    # A new calibration (F9, corner clicks) restores the normal rate
+    calibration[0] = ((120, 100, 420, 400), 30.0)
+    watcher.check()
+    assert watcher.searches == len(searched_at)
+    watcher.check()
+    assert watcher.searches == len(searched_at) + 1
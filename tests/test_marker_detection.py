@@ -0,0 +1,62 @@
+"""MarkerDetector checked against the baseline HSV path"""
+
+import numpy as np
+
+from frame_sources import MARKER_RGB, render_minimap
+from marker_detection import MarkerDetector, PyramidMarkerDetector, detect_marker
+
+
+def test_detector_matches_baseline(rng):
+    detector = MarkerDetector()
+    for _ in range(10):
+        marker = (float(rng.integers(20, 380)), float(rng.integers(20, 380)))
+        minimap = render_minimap(400, 400, marker=marker, decoys=15, rng=rng)
+        baseline = detect_marker(minimap.frame)
+        assert baseline.found
+        # Centres are truncated to whole pixels
+        assert np.hypot(baseline.center[0] - marker[0], baseline.center[1] - marker[1]) <= 1.5
+        assert detector.detect(minimap.frame) == baseline
+
+
+def test_no_marker(rng):
+    frame = render_minimap(200, 200, marker=None, rng=rng).frame
+    assert not detect_marker(frame).found
+    assert not MarkerDetector().detect(frame).found
+
+
+def test_buffers_are_reused():
+    detector = MarkerDetector()
+    frame = np.zeros((50, 60, 3), dtype=np.uint8)
+    mask = detector.threshold(frame)
+    for _ in range(3):
+        assert detector.threshold(frame) is mask
+    assert detector.allocations == 1
+    detector.threshold(np.zeros((40, 60, 3), dtype=np.uint8))
+    assert detector.allocations == 2
+
+
+def test_detector_accepts_cropped_views(rng):
+    minimap = render_minimap(300, 300, marker=(150.0, 150.0), rng=rng)
+    view = minimap.frame[50:250, 40:260]  # Not contiguous
+    result = MarkerDetector().detect(view)
+    assert result == detect_marker(np.ascontiguousarray(view))
+    assert result.center == (110, 100)
+
+
+def test_pyramid_matches_full_frame(rng):
+    pyramid = PyramidMarkerDetector(factor=4)
+    for _ in range(10):
+        marker = (float(rng.integers(20, 580)), float(rng.integers(20, 580)))
+        minimap = render_minimap(600, 600, marker=marker, decoys=15, rng=rng)
+        baseline = detect_marker(minimap.frame)
+        assert pyramid.detect(minimap.frame) == baseline
+    assert pyramid.fallbacks == 0
+
+
+def test_pyramid_falls_back_for_tiny_markers(rng):
+    frame = render_minimap(400, 400, marker=None, rng=rng).frame
+    frame[200:203, 101:104] = MARKER_RGB  # Gone after 4x point sampling
+    pyramid = PyramidMarkerDetector(factor=4)
+    result = pyramid.detect(frame)
+    assert pyramid.fallbacks == 1
+    assert result == detect_marker(frame) and result.center == (102, 201)
@@ -0,0 +1,154 @@
+"""MarkerTracker ROI scans and fallbacks, MultiTargetTracker identities"""
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_sources import MARKER_RGB, FrameSource, _crop_to_bbox, render_minimap
+from marker_detection import Blob, MarkerDetector
+from marker_tracking import MarkerTracker, MultiTargetTracker
+
+SIZE = 480
+BBOX = (0, 0, SIZE, SIZE)
+
+
+class StillSource(FrameSource):
+    """The screen at one instant: every grab of a scan sees the same frame"""
+
+    def __init__(self):
+        self.frame = None
+        self.grabs = []
+
+    def grab(self, bbox):
+        self.grabs.append(tuple(bbox))
+        return _crop_to_bbox(self.frame, bbox, (0, 0))
+
+
+def frame_at(position, rng, size=SIZE, decoys=10):
+    return render_minimap(size, size, marker=position, marker_radius=7, decoys=decoys,
+                          rng=rng).frame
+
+
+def track(positions, rng, decoys=0, **kwargs):
+    tracker = MarkerTracker(**kwargs)
+    source = StillSource()
+    results = []
+    for i, position in enumerate(positions):
+        source.frame = frame_at(position, rng, decoys=decoys)
+        results.append(tracker.scan(source, BBOX, now=i * 0.1))
+    return tracker, results, source.grabs
+
+
+def test_roi_scans_follow_a_moving_marker(rng):
+    positions = [(100.0 + 8 * i, 200.0 + 5 * i) for i in range(10)]
+    tracker, results, grabs = track(positions, rng, decoys=10)
+    assert tracker.full_scans == 1
+    assert tracker.roi_scans == 9
+    assert tracker.fallbacks == 0
+    assert all(b[2] - b[0] == tracker.window for b in grabs[1:])
+    for result, (x, y) in zip(results, positions):
+        assert result.found
+        # Centres are truncated to whole pixels
+        assert np.hypot(result.center[0] - x, result.center[1] - y) <= 1.5
+
+
+def test_jump_out_of_window_falls_back_to_full_scan(rng):
+    positions = [(100.0, 100.0), (102.0, 101.0), (400.0, 380.0)]
+    tracker, results, _ = track(positions, rng)
+    assert tracker.fallbacks == 1
+    assert tracker.full_scans == 2
+    assert results[2].center == pytest.approx((400, 380), abs=1)
+    assert tracker.position == pytest.approx((400, 380), abs=1)
+
+
+def test_marker_clipped_by_window_edge_falls_back(rng):
+    # The ROI is predicted around (120, 120), so a marker straddling its
+    # right edge must not be reported from a partial blob
+    window = 80
+    positions = [(120.0, 120.0), (120.0 + window // 2, 120.0)]
+    tracker, results, _ = track(positions, rng, window=window)
+    assert tracker.fallbacks == 1
+    assert results[1].center == pytest.approx(positions[1], abs=1)
+
+
+def test_lost_marker_resets_the_fix(rng):
+    tracker, results, _ = track([(200.0, 200.0), None], rng)
+    assert results[0].found and not results[1].found
+    assert tracker.fallbacks == 1
+    assert tracker.position is None
+
+
+def test_periodic_full_scan(rng):
+    positions = [(240.0, 240.0)] * 7
+    tracker, _, _ = track(positions, rng, full_scan_every=3)
+    assert tracker.full_scans == 2  # Scans 1 and 5
+    assert tracker.roi_scans == 5
+
+
+def test_new_bbox_reconfigures(rng):
+    tracker, _, _ = track([(200.0, 200.0)] * 2, rng)
+    source = StillSource()
+    source.frame = frame_at((50.0, 60.0), rng, size=300)
+    result = tracker.scan(source, (0, 0, 300, 300), now=1.0)
+    assert source.grabs == [(0, 0, 300, 300)]  # Full scan, the old fix is dropped
+    assert tracker.map_bbox == (0, 0, 300, 300)
+    assert result.center == pytest.approx((50, 60), abs=1)
+
+
+def blob(x, y, area=60):
+    return Blob(center=(x, y), area=area, bbox=(int(x) - 4, int(y) - 4, 8, 8))
+
+
+def test_ids_persist_while_targets_move():
+    tracker = MultiTargetTracker(max_distance=40)
+    first = tracker.update([blob(100, 100), blob(300, 300)])
+    assert [t.id for t in first] == [1, 2]
+
+    # Listed in the other order and moved: IDs follow the positions
+    moved = tracker.update([blob(310, 295), blob(110, 104)])
+    assert [(t.id, t.position) for t in moved] == [(1, (110, 104)), (2, (310, 295))]
+    assert all(t.hits == 2 for t in moved)
+
+
+def test_closest_pairs_win():
+    tracker = MultiTargetTracker(max_distance=50)
+    tracker.update([blob(100, 100), blob(140, 100)])
+    # Both new blobs are within range of both targets
+    targets = tracker.update([blob(135, 100), blob(105, 100)])
+    assert {t.id: t.position[0] for t in targets} == {1: 105, 2: 135}
+
+
+def test_far_detection_is_a_new_target():
+    tracker = MultiTargetTracker(max_distance=40)
+    tracker.update([blob(100, 100)])
+    targets = tracker.update([blob(200, 100)])
+    assert [t.id for t in targets] == [2]
+    assert [t.id for t in tracker.targets] == [1, 2]  # 1 is missing, not gone
+
+
+def test_missing_targets_survive_max_misses():
+    tracker = MultiTargetTracker(max_misses=2)
+    tracker.update([blob(100, 100), blob(300, 300)])
+    for _ in range(2):
+        assert [t.id for t in tracker.update([blob(300, 300)])] == [2]
+    assert [t.id for t in tracker.update([blob(101, 100), blob(300, 300)])] == [1, 2]
+
+    for _ in range(3):
+        tracker.update([blob(300, 300)])
+    assert [t.id for t in tracker.targets] == [2]
+    assert [t.id for t in tracker.update([blob(100, 100), blob(300, 300)])] == [2, 3]
+
+
+def test_reset_restarts_ids():
+    tracker = MultiTargetTracker()
+    tracker.update([blob(10, 10)])
+    tracker.reset()
+    assert [t.id for t in tracker.update([blob(10, 10)])] == [1]
+
+
+def test_detect_all_feeds_every_marker(rng):
+    frame = render_minimap(300, 300, marker=(60.0, 70.0), marker_radius=6, decoys=10, rng=rng).frame
+    cv2.circle(frame, (220, 200), 6, MARKER_RGB, -1)
+    blobs = MarkerDetector().detect_all(frame)  # Decoys are below MIN_BLOB_AREA
+    assert sorted((round(b.center[0]), round(b.center[1])) for b in blobs) == [(60, 70), (220, 200)]
+    assert [t.id for t in MultiTargetTracker().update(blobs)] == [1, 2]
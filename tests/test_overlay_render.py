@@ -0,0 +1,83 @@
+"""OverlayRenderer coalescing: only the newest, actually different text reaches Tk"""
+
+import threading
+
+from overlay_render import OverlayRenderer
+
+
+class Var:
+    """Stands in for a Tk StringVar: named, with get/set"""
+
+    def __init__(self, name, value=""):
+        self.name = name
+        self.value = value
+        self.sets = []
+
+    def __str__(self):
+        return self.name
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        self.sets.append(value)
+
+
+def renderer():
+    ticks = []
+    return OverlayRenderer(lambda ms, func: ticks.append((ms, func)), max_fps=20), ticks
+
+
+def test_updates_coalesce_to_the_newest():
+    render, _ = renderer()
+    status, distance = Var('status'), Var('distance')
+    for i in range(10):
+        render.set(status, f"scan {i}")
+    render.set(distance, "1.20 km")
+    render.flush()
+    assert status.sets == ["scan 9"] and distance.sets == ["1.20 km"]
+    assert (render.requested, render.applied, render.frames) == (11, 2, 1)
+
+
+def test_unchanged_text_is_not_set_again():
+    render, _ = renderer()
+    status = Var('status', "ready")
+    render.set(status, "ready")
+    render.flush()
+    assert status.sets == [] and render.frames == 0
+
+    status.value = "typed by the user"  # Entry fields can change underneath
+    render.set(status, "ready")
+    render.flush()
+    assert status.sets == ["ready"]
+
+
+def test_loop_runs_at_the_frame_rate_until_stopped():
+    render, ticks = renderer()
+    render.start()
+    render.start()  # Only one loop
+    assert [ms for ms, _ in ticks] == [50]
+
+    status = Var('status')
+    render.set(status, "a")
+    ticks.pop()[1]()
+    assert status.sets == ["a"] and len(ticks) == 1
+
+    render.stop()
+    ticks.pop()[1]()
+    assert ticks == []
+
+
+def test_set_is_safe_from_other_threads():
+    render, _ = renderer()
+    status = Var('status')
+    threads = [threading.Thread(target=lambda n=n: [render.set(status, f"{n}:{i}") for i in range(200)])
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    render.flush()
+    assert render.requested == 800
+    assert len(status.sets) == 1 and status.sets[0].endswith(":199")
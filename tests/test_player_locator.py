@@ -0,0 +1,54 @@
+"""PlayerLocator: acquiring and following the player arrow on synthetic maps"""
+
+import numpy as np
+import pytest
+
+from frame_sources import render_minimap
+from player_locator import PlayerLocator
+
+
+def heading_error(a, b):
+    return abs((a - b + 180.0) % 360.0 - 180.0)
+
+
+@pytest.mark.parametrize('size, player, heading', [
+    (600, (150.0, 420.0), 0.0),
+    (600, (450.0, 200.0), 135.0),
+    (900, (300.0, 610.0), 250.0),
+])
+def test_acquires_the_icon(size, player, heading, rng):
+    minimap = render_minimap(size, size, marker=(100.0, 100.0), decoys=10, rng=rng,
+                             player=player, player_heading=heading)
+    locator = PlayerLocator()
+    result = locator.locate(minimap.frame)
+    assert result.found
+    assert np.hypot(result.center[0] - player[0], result.center[1] - player[1]) <= 2.0
+    assert heading_error(result.heading, heading) <= 360.0 / locator.headings
+    assert locator.acquisitions == 1
+
+
+def test_follows_the_icon_in_its_window(rng):
+    locator = PlayerLocator()
+    path = [(300.0 + 6 * i, 300.0 - 4 * i) for i in range(6)]
+    for i, player in enumerate(path):
+        frame = render_minimap(600, 600, rng=rng, player=player, player_heading=10.0 * i).frame
+        result = locator.locate(frame)
+        assert result.found
+        assert np.hypot(result.center[0] - player[0], result.center[1] - player[1]) <= 2.0
+    assert (locator.acquisitions, locator.roi_scans) == (1, 5)
+
+
+def test_missing_icon_is_only_searched_for_now_and_then(rng):
+    frame = render_minimap(600, 600, marker=(300.0, 300.0), rng=rng).frame
+    locator = PlayerLocator(retry_every=5)
+    results = [locator.locate(frame) for _ in range(11)]
+    assert not any(r.found for r in results)
+    assert locator.acquisitions == 3  # Scans 1, 6 and 11
+
+
+def test_new_map_size_forgets_the_fix(rng):
+    locator = PlayerLocator()
+    frame = render_minimap(600, 600, rng=rng, player=(200.0, 200.0)).frame
+    assert locator.locate(frame).found
+    locator.configure(500, 500)
+    assert locator.position is None
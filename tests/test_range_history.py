@@ -0,0 +1,126 @@
+"""RangeHistory records written and read back through the memory map"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from range_history import (HEADER, RECORD, RangeHistory, config_id, main, open_history,
+                           parse_time, select, summarise)
+from rangefinder_core import MapConfig
+
+CONFIG = MapConfig(top_left=(100, 100), bottom_right=(500, 500), map_size_km=16.0)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'history.wtr')
+
+
+def write(path, readings):
+    history = RangeHistory(path)
+    for reading in readings:
+        history.append(*reading)
+    history.close()
+    return history
+
+
+def test_records_round_trip(path):
+    cfg = config_id(CONFIG)
+    write(path, [('manual', (1.5, 2.5), (100.0, 200.0), 1234.5, cfg, 1000.0),
+                 ('auto', (0.0, 0.0), (10.0, 10.0), 56.0, cfg, 1001.0)])
+
+    records = open_history(path)
+    assert isinstance(records, np.memmap)
+    assert records.dtype == RECORD and RECORD.itemsize == 36
+    assert len(records) == 2
+    first = records[0]
+    assert first['time'] == 1000.0
+    assert (first['x0'], first['y0'], first['x1'], first['y1']) == (1.5, 2.5, 100.0, 200.0)
+    assert first['metres'] == pytest.approx(1234.5)
+    assert first['config'] == cfg
+    assert list(records['source']) == [0, 2]
+
+
+def test_missing_and_empty_logs(path):
+    assert len(open_history(path)) == 0
+    RangeHistory(path).close()
+    assert len(open_history(path)) == 0
+
+
+def test_appends_across_sessions(path):
+    write(path, [('manual', (0, 0), (1, 1), 1.0, 1, 1.0)])
+    write(path, [('detect', (0, 0), (2, 2), 2.0, 1, 2.0)])
+    assert list(open_history(path)['metres']) == [1.0, 2.0]
+
+
+def test_torn_record_is_dropped(path):
+    write(path, [('manual', (0, 0), (1, 1), 1.0, 1, 1.0)])
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 10)  # Half a record, as a crash would leave
+    write(path, [('auto', (0, 0), (2, 2), 2.0, 1, 2.0)])
+    assert list(open_history(path)['metres']) == [1.0, 2.0]
+
+
+def test_foreign_file_is_rejected(path):
+    with open(path, 'wb') as f:
+        f.write(b'NOPE' + bytes(HEADER.size - 4))
+    with pytest.raises(ValueError):
+        open_history(path)
+    with pytest.raises(ValueError):
+        RangeHistory(path)
+
+
+def test_select_and_summarise(path):
+    other = config_id(MapConfig(top_left=(0, 0), bottom_right=(300, 300)))
+    write(path, [('manual', (0, 0), (1, 1), 100.0, 7, 10.0),
+                 ('detect', (0, 0), (1, 1), 200.0, 7, 20.0),
+                 ('auto', (0, 0), (1, 1), 300.0, other, 30.0),
+                 ('auto', (0, 0), (1, 1), 400.0, 7, 40.0)])
+    records = open_history(path)
+
+    assert list(select(records, since=20.0, until=40.0)['metres']) == [200.0, 300.0]
+    assert list(select(records, sources=['auto'])['metres']) == [300.0, 400.0]
+    assert list(select(records, config=7, sources=['auto', 'manual'])['metres']) == [100.0, 400.0]
+
+    stats = summarise(records)
+    assert stats['count'] == 4
+    assert (stats['first'], stats['last']) == (10.0, 40.0)
+    assert stats['mean_m'] == 250.0 and stats['median_m'] == 250.0
+    assert stats['sources'] == {'manual': 1, 'detect': 1, 'auto': 2}
+    assert stats['configs'] == 2
+    assert summarise(select(records, since=100.0)) == {'count': 0}
+
+
+def test_config_id_tracks_the_calibration():
+    same = MapConfig(top_left=(100, 100), bottom_right=(500, 500), map_size_km=16.0)
+    assert config_id(same) == config_id(CONFIG)
+    same.map_size_km = 17.0
+    assert config_id(same) != config_id(CONFIG)
+
+
+def test_parse_time():
+    assert parse_time('90s', now=1000.0) == 910.0
+    assert parse_time('1.5h', now=10000.0) == 4600.0
+    assert parse_time('2024-05-01 18:00') == datetime(2024, 5, 1, 18, 0).timestamp()
+    with pytest.raises(ValueError):
+        parse_time('yesterday')
+
+
+def test_cli_filters_and_exports(path, tmp_path, capsys):
+    now = time.time()
+    write(path, [('manual', (0, 0), (1, 1), 100.0, 7, now - 7200),
+                 ('auto', (0, 0), (1, 1), 300.0, 7, now - 60)])
+    out = str(tmp_path / 'recent.csv')
+    main(['--file', path, '--since', '1h', '--stats', '--csv', out])
+    assert "1 readings of 2" in capsys.readouterr().out
+    assert (tmp_path / 'recent.csv').read_text().splitlines()[1].startswith(f"{now - 60:.3f},auto,")
+
+
+@pytest.mark.parametrize('option', ['--since', '--until'])
+def test_cli_rejects_bad_times(path, option, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--file', path, option, 'yesterday'])
+    assert exit_info.value.code == 2
+    assert f"argument {option}: invalid time 'yesterday'" in capsys.readouterr().err
@@ -0,0 +1,58 @@
+"""MapConfig scale and the vectorised range conversions"""
+
+import math
+
+import numpy as np
+import pytest
+
+from rangefinder_core import MapConfig, format_range, pixel_distances, ranges_from_m, ranges_m
+
+
+def square_map(size_px=400, map_km=16.0, **kwargs):
+    return MapConfig(top_left=(100, 50), bottom_right=(100 + size_px, 50 + size_px),
+                     map_size_km=map_km, **kwargs)
+
+
+def test_unconfigured_map():
+    config = MapConfig()
+    assert not config.is_configured
+    assert (config.width, config.height, config.km_per_pixel) == (0, 0, 0.0)
+    assert config.auto_calculate_map_size() is None
+
+
+def test_scale_uses_the_mean_side():
+    config = MapConfig(top_left=(0, 0), bottom_right=(500, 300), map_size_km=8.0)
+    assert (config.width, config.height) == (500, 300)
+    assert config.km_per_pixel == pytest.approx(8.0 / 400)
+    assert config.pixels_to_m(400) == pytest.approx(8000)
+    assert config.pixels_to_km(100) == pytest.approx(2.0)
+    assert config.centre == (250, 150)
+
+
+def test_map_size_from_the_grid():
+    config = square_map(size_px=400, grid_size_km=2.0)
+    assert config.auto_calculate_map_size() is None
+    config.grid_pixel_size = 50.0  # 8 squares across
+    assert config.auto_calculate_map_size() == pytest.approx(16.0)
+
+
+def test_scalar_and_array_ranges_agree():
+    config = square_map(size_px=400, map_km=16.0)  # 40 m per pixel
+    starts = np.array([[0, 0], [10, 10], [100, 0]])
+    ends = np.array([[3, 4], [10, 10], [100, 250]])
+    np.testing.assert_allclose(pixel_distances(starts, ends), [5, 0, 250])
+    np.testing.assert_allclose(ranges_m(config, starts, ends), [200, 0, 10000])
+    assert float(ranges_m(config, (0, 0), (30, 40))) == pytest.approx(2000)
+
+
+def test_ranges_from_one_origin_broadcast():
+    config = square_map(size_px=400, map_km=4.0)  # 10 m per pixel
+    points = np.array([[200, 200], [200, 260], [280, 200], [0, 0]])
+    np.testing.assert_allclose(ranges_from_m(config, config.centre, points),
+                               [0, 600, 800, 10 * math.hypot(200, 200)])
+
+
+def test_format_range():
+    assert format_range(999.9) == "999 m"
+    assert format_range(1000) == "1.00 km"
+    assert format_range(12345) == "12.35 km"
@@ -0,0 +1,63 @@
+"""Rolling stage percentiles, stage grouping, scan rate and exports"""
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from scan_metrics import RollingHistogram, ScanMetrics, percentile
+
+
+def test_percentile_matches_numpy():
+    values = sorted(np.random.default_rng(5).exponential(0.004, 101))
+    for p in (0, 50, 95, 99, 100):
+        assert percentile(values, p) == pytest.approx(np.percentile(values, p))
+    assert percentile([], 50) == 0.0
+
+
+def test_histogram_keeps_a_window_but_counts_everything():
+    histogram = RollingHistogram(size=10)
+    for ms in range(100):
+        histogram.add(ms / 1000)
+    summary = histogram.summary()
+    assert (summary['window'], summary['count']) == (10, 100)
+    assert summary['p50'] == pytest.approx(94.5)
+
+
+def test_timings_are_grouped_into_panel_stages():
+    metrics = ScanMetrics()
+    metrics.record('capture', 0.002)
+    metrics.record_timings({'contourArea': 0.001, 'moments': 0.0005, 'cvtColor': 0.003,
+                            'inRange': 0.001, 'something_new': 0.004})
+    summary = metrics.summary()
+    assert list(summary) == ['capture', 'colour', 'mask', 'centroid', 'something_new']
+    assert summary['centroid']['p50'] == pytest.approx(1.5)
+
+
+def test_scan_rate_over_the_window():
+    metrics = ScanMetrics(rate_window=1.0)
+    for i in range(31):
+        metrics.scan_done(now=10.0 + i / 20)  # 20 scans/s for 1.5 s
+    assert metrics.scans == 31
+    assert metrics.scans_per_second(now=11.5) == pytest.approx(20.0)
+    assert metrics.scans_per_second(now=20.0) == 0.0
+    metrics.reset()
+    assert metrics.scans == 0 and metrics.summary() == {}
+
+
+def test_format_and_exports(tmp_path):
+    metrics = ScanMetrics()
+    for ms in (1.0, 2.0, 3.0):
+        metrics.record('detect', ms / 1000)
+    assert metrics.format().splitlines()[1].split() == ['detect', '2.00', '2.90', '2.98']
+
+    metrics.to_json(str(tmp_path / 'metrics.json'))
+    data = json.loads((tmp_path / 'metrics.json').read_text())
+    assert data['stages']['detect']['count'] == 3
+
+    metrics.to_csv(str(tmp_path / 'metrics.csv'))
+    rows = list(csv.reader((tmp_path / 'metrics.csv').read_text().splitlines()))
+    assert rows[0] == ['stage', 'p50_ms', 'p95_ms', 'p99_ms', 'window', 'count']
+    assert rows[1] == ['detect', '2.0', '2.9', '2.98', '3', '3']
+    assert rows[-1][0] == 'scans_per_second'
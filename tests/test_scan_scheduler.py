@@ -0,0 +1,120 @@
+"""AdaptiveScanScheduler intervals, wake-ups and deferred results"""
+
+import threading
+import time
+
+import pytest
+
+from scan_scheduler import AdaptiveScanScheduler
+
+
+def scheduler(**kwargs):
+    return AdaptiveScanScheduler(lambda requested: None, **kwargs)
+
+
+def test_moving_marker_is_scanned_often_enough():
+    s = scheduler(latency_target=0.5, motion_tolerance=3.0, min_interval=0.01)
+    s.record(0.001, (100.0, 100.0), now=0.0)
+    assert s.interval == 0.5  # Newly acquired: watch at the latency target
+    s.record(0.001, (130.0, 100.0), now=0.5)  # 60 px/s, halved by smoothing
+    assert s.speed == pytest.approx(30.0)
+    assert s.interval == pytest.approx(3.0 / 30.0)
+
+
+def test_quiet_map_backs_off_to_the_maximum():
+    s = scheduler(latency_target=0.2, min_interval=0.01, max_interval=1.0, backoff=2.0)
+    s.record(0.001, (50.0, 50.0), now=0.0)
+    steps = []
+    for i in range(1, 5):
+        s.record(0.001, (50.0, 50.0), now=float(i))  # Still
+        steps.append(s.interval)
+    assert steps == pytest.approx([0.4, 0.8, 1.0, 1.0])
+    assert s.position == (50.0, 50.0)
+
+
+def test_cpu_budget_limits_the_rate():
+    s = scheduler(cpu_budget=0.1, min_interval=0.01, latency_target=0.05)
+    s.record(0.02, (0.0, 0.0), now=0.0)
+    assert s.interval == pytest.approx(0.2)  # 20 ms scans at most 10% of a core
+
+
+def test_stop_interrupts_the_wait():
+    scans = []
+    s = AdaptiveScanScheduler(lambda requested: scans.append(requested),
+                              min_interval=5.0, max_interval=5.0)
+    s.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    s.stop()
+    assert time.perf_counter() - start < 0.5
+    assert not s.is_running and scans == [False]
+
+
+def test_request_scan_wakes_the_thread():
+    scanned = threading.Event()
+    scans = []
+
+    def scan(requested):
+        scans.append(requested)
+        scanned.set()
+
+    s = AdaptiveScanScheduler(scan, min_interval=5.0, max_interval=5.0)
+    s.start()
+    try:
+        assert scanned.wait(1.0)
+        scanned.clear()
+        s.request_scan()
+        assert scanned.wait(1.0)
+        assert scans == [False, True] and s.requested_scans == 1
+    finally:
+        s.stop()
+
+
+def test_deferred_results_pace_the_next_scan():
+    scanned = threading.Event()
+    times = []
+
+    def scan(requested):
+        times.append(time.perf_counter())
+        scanned.set()
+        return (1.0, 1.0)  # Ignored: deferred results come through record
+
+    s = AdaptiveScanScheduler(scan, deferred=True, min_interval=0.01, max_interval=10.0,
+                              backoff=1000.0, latency_target=0.05)
+    s.start()
+    try:
+        assert scanned.wait(1.0)
+        scanned.clear()
+        assert s.scans == 0
+
+        s.record(0.001, None)  # Nothing there: back off to 10 s
+        assert s.interval == 10.0
+        assert not scanned.wait(0.2)
+
+        s.record(0.001, (40.0, 40.0))  # Marker appears: the long wait is cut short
+        assert scanned.wait(1.0)
+        assert times[1] - times[0] < 1.0
+    finally:
+        s.stop()
+
+
+def test_restart_never_runs_two_scans_at_once():
+    running = []
+    peak = []
+    release = threading.Event()
+
+    def scan(requested):
+        running.append(1)
+        peak.append(len(running))
+        release.wait(0.3)
+        running.pop()
+
+    s = AdaptiveScanScheduler(scan, min_interval=0.01)
+    s.start()
+    time.sleep(0.05)
+    s.stop(timeout=0.01)  # Times out with the scan still in flight
+    s.start()
+    release.set()
+    time.sleep(0.2)
+    s.stop()
+    assert max(peak) == 1
@@ -0,0 +1,84 @@
+"""Session profiler: entry point timing, stack sampling and the output files"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from session_profiler import SessionProfiler, add_profile_arguments, profiler_from_args
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_wrap_counts_calls_including_failures(tmp_path):
+    profiler = SessionProfiler(str(tmp_path), trace_memory=False)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scan = profiler.wrap('scan', lambda: time.sleep(0.01) or 'found')
+    broken = profiler.wrap('broken', fail)
+    assert scan() == 'found' and scan() == 'found'
+    with pytest.raises(RuntimeError):
+        broken()
+
+    assert profiler.handlers['scan'].calls == 2
+    assert profiler.handlers['scan'].worst >= 0.01
+    assert profiler.handlers['broken'].calls == 1
+
+
+def test_sampler_sees_other_threads(tmp_path):
+    profiler = SessionProfiler(str(tmp_path / 'out'), interval=0.001, trace_memory=False)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='auto-scan')
+    worker.start()
+    profiler.start()
+    time.sleep(0.1)
+    stop.set()
+    worker.join()
+    path = profiler.stop()
+
+    assert profiler.samples > 10
+    assert any(stack.startswith('auto-scan;') and 'busy_loop' in stack for stack in profiler.stacks)
+    assert not any(stack.startswith('profiler;') for stack in profiler.stacks)
+    report = (tmp_path / 'out' / 'report.txt').read_text()
+    assert path == str(tmp_path / 'out' / 'report.txt')
+    assert "Self time (top of stack)" in report
+    assert (tmp_path / 'out' / 'stacks.folded').read_text().strip()
+    assert profiler.stop() is None  # Already stopped
+
+
+def test_deterministic_mode_writes_pstats(tmp_path):
+    profiler = SessionProfiler(str(tmp_path), deterministic=True, trace_memory=True,
+                               snapshot_every=0.01)
+    profiler.start()
+    scan = profiler.wrap('scan', lambda: [bytearray(1024) for _ in range(100)])
+    for _ in range(3):
+        scan()
+    profiler.stop()
+    report = (tmp_path / 'report.txt').read_text()
+    assert (tmp_path / 'profile.pstats').exists()
+    assert "Memory growth since start" in report
+    assert "cProfile of entry points" in report
+
+
+def test_hottest_splits_self_and_total_time(tmp_path):
+    profiler = SessionProfiler(str(tmp_path), trace_memory=False)
+    profiler.stacks = Counter({'main;loop;scan;threshold': 6, 'main;loop;scan': 3,
+                               'main;loop': 1, 'idle': 4})
+    own, total = profiler.hottest()
+    assert dict(own) == {'threshold': 6, 'scan': 3, 'loop': 1}
+    assert dict(total) == {'loop': 10, 'scan': 9, 'threshold': 6}
+
+
+def test_profile_arguments():
+    parser = argparse.ArgumentParser()
+    add_profile_arguments(parser)
+    assert profiler_from_args(parser.parse_args([])) is None
+    args = parser.parse_args(['--profile', 'out', '--profile-interval', '2'])
+    assert (args.profile, args.profile_interval) == ('out', 2.0)
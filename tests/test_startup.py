@@ -0,0 +1,74 @@
+"""Startup report, background engine loading and detection warm-up"""
+
+import threading
+import time
+
+from marker_tracking import MarkerTracker
+from player_locator import PlayerLocator
+from startup import EngineLoader, StartupReport, warm_up
+
+
+class ManualScheduler:
+    """Stands in for ``root.after``: callbacks run when the test says so"""
+
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, delay_ms, callback):
+        self.pending.append(callback)
+
+    def run_until_idle(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self.pending:
+            assert time.monotonic() < deadline
+            self.pending.pop(0)()
+            time.sleep(0.001)
+
+
+def test_report_keeps_the_first_mark_of_each_milestone():
+    report = StartupReport(started=0.0)
+    first = report.mark('window')
+    assert report.mark('window') == first
+    report.mark('engine')
+    assert list(report.marks) == ['window', 'engine']
+    assert report.format().startswith("Startup: window ")
+
+
+def test_loader_hands_over_on_the_scheduler_thread():
+    release = threading.Event()
+    calls = []
+    schedule = ManualScheduler()
+    loader = EngineLoader(lambda: release.wait(5.0), lambda: calls.append(threading.current_thread()),
+                          schedule)
+    loader.start()
+    schedule.pending.pop(0)()  # Still building: polls again
+    assert not loader.ready and calls == [] and len(schedule.pending) == 1
+
+    release.set()
+    schedule.run_until_idle()
+    assert loader.ready
+    assert calls == [threading.current_thread()]
+
+
+def test_loader_reports_build_errors():
+    def build():
+        raise ImportError("no cv2")
+
+    errors, ready = [], []
+    schedule = ManualScheduler()
+    loader = EngineLoader(build, lambda: ready.append(True), schedule, on_error=errors.append)
+    loader.start()
+    schedule.run_until_idle()
+    assert not loader.ready and ready == []
+    assert isinstance(errors[0], ImportError)
+
+
+def test_warm_up_leaves_no_tracked_state():
+    tracker = MarkerTracker(pyramid_factor=4)
+    locator = PlayerLocator()
+    warm_up(tracker, locator, bbox=(100, 50, 420, 370))
+
+    assert tracker.full_scans == 1
+    assert tracker.position is None
+    assert locator.position is None
+    assert tracker.roi_detector.lut is None  # The HSV default needs no table
@@ -0,0 +1,78 @@
+"""Video replay over a short synthetic recording"""
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from calibration_profiles import CalibrationProfile, ProfileStore, layout_key
+from frame_sources import render_screen
+from video_replay import main
+
+SIZE = (640, 360)
+MAP = (300, 20, 620, 340)
+FPS = 10.0
+MARKERS = [(100.0 + 10 * i, 200.0) for i in range(6)]  # Each held for two frames
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    rng = np.random.default_rng(1234)
+    path = str(tmp_path_factory.mktemp('video') / 'match.avi')
+    # Lossless, so a held frame decodes identically both times
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), FPS, SIZE)
+    if not writer.isOpened():
+        pytest.skip("no FFV1 video encoder")
+    for marker in MARKERS:
+        frame = render_screen(*SIZE, MAP, rng=rng, grid_pixel_size=40.0, marker=marker, decoys=0).frame
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        writer.write(frame)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def replay(video, tmp_path, *options):
+    out = tmp_path / 'ranges.jsonl'
+    main([video, '--out', str(out), *options])
+    return [json.loads(line) for line in out.read_text().splitlines()]
+
+
+def test_series_follows_the_marker(video, tmp_path):
+    rows = replay(video, tmp_path, '--map', *map(str, MAP), '--map-size', '16', '--no-skip')
+    assert [row['frame'] for row in rows] == list(range(2 * len(MARKERS)))
+    assert rows[3]['time'] == pytest.approx(0.3)
+    for row in rows:
+        expected = MARKERS[row['frame'] // 2]
+        assert row['found']
+        assert (row['marker_x'], row['marker_y']) == pytest.approx(expected, abs=2)
+        assert row['metres'] > 0
+
+
+def test_unchanged_frames_are_skipped_and_strided(video, tmp_path):
+    rows = replay(video, tmp_path, '--map', *map(str, MAP), '--map-size', '16')
+    assert [row['frame'] for row in rows] == list(range(0, 2 * len(MARKERS), 2))
+    rows = replay(video, tmp_path, '--map', *map(str, MAP), '--map-size', '16', '--stride', '3')
+    assert [row['frame'] for row in rows] == [0, 3, 6, 9]
+
+
+def test_map_size_from_the_first_frame_grid(video, tmp_path, capsys):
+    rows = replay(video, tmp_path, '--map', *map(str, MAP))
+    assert "Map size from the grid: 16.0 km" in capsys.readouterr().err  # 8 squares of 2 km
+    assert len(rows) == len(MARKERS)
+
+
+@pytest.mark.parametrize('bbox', [(-1, 20, 319, 340), (300, 20, 700, 340),
+                                  (620, 20, 300, 340), (300, 340, 620, 340)])
+def test_map_outside_the_video_is_rejected(video, tmp_path, bbox):
+    with pytest.raises(SystemExit, match="does not fit the 640x360 video"):
+        replay(video, tmp_path, '--map', *map(str, bbox), '--map-size', '16')
+
+
+def test_saved_calibration_outside_the_video_is_rejected(video, tmp_path):
+    profiles = str(tmp_path / 'profiles.json')
+    ProfileStore(profiles).put(layout_key(SIZE), CalibrationProfile(
+        top_left=(1500, 660), bottom_right=(1900, 1060), map_size_km=16.0, grid_size_km=0.2))
+    with pytest.raises(SystemExit, match="1500 660 1900 1060 does not fit"):
+        replay(video, tmp_path, '--profiles', profiles)
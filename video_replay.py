@@ -0,0 +1,244 @@
+"""
+War Thunder Rangefinder - Video Replay
+Ranges the yellow marker through a gameplay recording, frame by frame
+
+Frames flow through generators, one at a time, so memory stays flat for
+recordings of any length:
+
+    read_video -> crop_minimap -> skip_unchanged -> range_series -> CSV/JSONL
+
+``stride`` decodes only every Nth frame (the others are grabbed without
+being decoded) and the change check drops frames whose minimap looks the
+same as the last one ranged, exactly as auto-scan does. Detection is the
+pro overlay's ``FrameAnalyzer``, with the video timestamp as capture time
+so marker tracking behaves as it does live.
+
+Usage:
+    python video_replay.py match.mp4 --out ranges.csv
+    python video_replay.py match.mp4 --map 1500 660 1900 1060 --map-size 16 --stride 3
+    python video_replay.py match.mp4 --locate --no-skip --out ranges.jsonl
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from batch_range import RowWriter, map_size_from_grid, positive_float, saved_calibration
+from detection_worker import FrameAnalyzer
+from frame_change import FrameChangeDetector
+from frame_sources import BBox
+from rangefinder_core import MapConfig, ranges_from_m
+
+FIELDS = ['frame', 'time', 'found', 'marker_x', 'marker_y', 'player_found',
+          'player_x', 'player_y', 'metres']
+
+
+@dataclass
+class VideoFrame:
+    """One decoded frame and where it sits in the recording"""
+    index: int
+    time: float  # Seconds from the start of the video
+    image: np.ndarray  # BGR from the decoder, RGB once cropped
+
+
+@dataclass
+class RangeSample:
+    """One point of the range time series"""
+    frame: int
+    time: float
+    found: bool
+    marker: Optional[Tuple[int, int]] = None  # Minimap pixels
+    player: Optional[Tuple[float, float]] = None
+    metres: Optional[float] = None
+
+    def as_row(self) -> dict:
+        row = {'frame': self.frame, 'time': round(self.time, 3), 'found': self.found,
+               'player_found': self.player is not None}
+        if self.marker is not None:
+            row['marker_x'], row['marker_y'] = self.marker
+        if self.player is not None:
+            row['player_x'], row['player_y'] = (round(v, 1) for v in self.player)
+        if self.metres is not None:
+            row['metres'] = round(self.metres, 1)
+        return row
+
+
+def open_video(path: str) -> cv2.VideoCapture:
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise OSError(f"cannot open video {path}")
+    return capture
+
+
+def video_info(path: str) -> Tuple[Tuple[int, int], float, int, np.ndarray]:
+    """Frame size, frame rate, frame count and first frame (BGR) of a video"""
+    capture = open_video(path)
+    try:
+        ok, first = capture.read()
+        if not ok:
+            raise OSError(f"no frames in {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        return (first.shape[1], first.shape[0]), fps, count, first
+    finally:
+        capture.release()
+
+
+def read_video(path: str, stride: int = 1, start: float = 0.0,
+               end: Optional[float] = None) -> Iterator[VideoFrame]:
+    """Every ``stride``th frame between ``start`` and ``end`` seconds"""
+    capture = open_video(path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        index = 0
+        if start > 0:
+            index = int(start * fps)
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        while end is None or index / fps < end:
+            if (index % stride) == 0:
+                ok, image = capture.read()
+                if not ok:
+                    break
+                yield VideoFrame(index, index / fps, image)
+            elif not capture.grab():  # Skipped frames are not decoded
+                break
+            index += 1
+    finally:
+        capture.release()
+
+
+def counted(frames: Iterator[VideoFrame], counts: Dict[str, float]) -> Iterator[VideoFrame]:
+    """Pass frames through, keeping the number decoded and the last time"""
+    for frame in frames:
+        counts['decoded'] += 1
+        counts['time'] = frame.time
+        yield frame
+
+
+def crop_minimap(frames: Iterator[VideoFrame], bbox: BBox) -> Iterator[VideoFrame]:
+    """The minimap rectangle of each frame, converted to RGB"""
+    left, top, right, bottom = bbox
+    for frame in frames:
+        frame.image = cv2.cvtColor(frame.image[top:bottom, left:right], cv2.COLOR_BGR2RGB)
+        yield frame
+
+
+def skip_unchanged(frames: Iterator[VideoFrame],
+                   detector: Optional[FrameChangeDetector]) -> Iterator[VideoFrame]:
+    """Drop frames whose minimap hasn't changed since the last one passed on"""
+    for frame in frames:
+        if detector is None or detector.has_changed(frame.image):
+            yield frame
+
+
+def range_series(frames: Iterator[VideoFrame], config: MapConfig,
+                 analyzer: Optional[FrameAnalyzer] = None) -> Iterator[RangeSample]:
+    """Marker range from the player icon (or the map centre) for each frame"""
+    analyzer = analyzer or FrameAnalyzer()
+    bbox = (config.top_left[0], config.top_left[1], config.bottom_right[0], config.bottom_right[1])
+    for frame in frames:
+        result, _, player = analyzer.analyze(frame.image, bbox, frame.time, range_all=False)
+        sample = RangeSample(frame.index, frame.time, bool(result.found and result.center is not None))
+        if player.found:
+            sample.player = player.center
+        if sample.found:
+            sample.marker = (int(result.center[0]), int(result.center[1]))
+            origin = player.center if player.found else config.centre
+            sample.metres = float(ranges_from_m(config, origin, result.center))
+        yield sample
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Range the marker through a gameplay video")
+    parser.add_argument('video', help="Recording (any format OpenCV can read)")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument('--map', nargs=4, type=int, metavar=('LEFT', 'TOP', 'RIGHT', 'BOTTOM'),
+                       help="Minimap rectangle in video pixels")
+    where.add_argument('--locate', action='store_true', help="Find the minimap on the first frame")
+    where.add_argument('--profile-key', help="Use this saved calibration (default: by resolution)")
+    parser.add_argument('--profiles', default=None, help="Calibration profiles file")
+    parser.add_argument('--map-size', type=positive_float,
+                        help="Map size in km (default: saved, else read from the grid)")
+    parser.add_argument('--grid-size', type=positive_float, default=MapConfig.grid_size_km,
+                        help="Grid square size in km, to derive the map size (default: %(default)s)")
+    parser.add_argument('--stride', type=int, default=1, help="Decode every Nth frame")
+    parser.add_argument('--start', type=float, default=0.0, help="Start at this many seconds")
+    parser.add_argument('--end', type=float, help="Stop at this many seconds")
+    parser.add_argument('--no-skip', action='store_true', help="Range unchanged frames too")
+    parser.add_argument('--out', help="Output file; .jsonl/.json for JSON Lines, else CSV")
+    parser.add_argument('--jsonl', action='store_true', help="JSON Lines on stdout")
+    args = parser.parse_args(argv)
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from calibration_profiles import PROFILE_PATH
+
+    size, fps, count, first = video_info(args.video)
+    first = cv2.cvtColor(first, cv2.COLOR_BGR2RGB)
+    pitch = None
+    if args.map:
+        bbox, map_size = tuple(args.map), args.map_size
+    elif args.locate:
+        from map_locator import find_minimap
+        location = find_minimap(first)
+        if location is None:
+            sys.exit("Minimap not found on the first frame; pass --map")
+        bbox, map_size, pitch = location.bbox, args.map_size, location.grid.pitch
+    else:
+        profile = saved_calibration(args.profiles or PROFILE_PATH, size, args.profile_key)
+        if profile is None:
+            sys.exit(f"No saved calibration for {size[0]}x{size[1]}; pass --map or --locate")
+        bbox, map_size = profile.bbox, args.map_size or profile.map_size_km
+    left, top, right, bottom = bbox
+    if not (0 <= left < right <= size[0] and 0 <= top < bottom <= size[1]):
+        sys.exit(f"Map rectangle {left} {top} {right} {bottom} does not fit the "
+                 f"{size[0]}x{size[1]} video; pass --map LEFT TOP RIGHT BOTTOM inside it")
+    if map_size is None:
+        # Read off the first frame's grid, as F6 does
+        map_size = map_size_from_grid(first[bbox[1]:bbox[3], bbox[0]:bbox[2]], args.grid_size, pitch)
+        if map_size is None:
+            sys.exit("Grid not found on the first frame; pass --map-size")
+        print(f"Map size from the grid: {map_size:.1f} km", file=sys.stderr)
+    config = MapConfig(top_left=bbox[:2], bottom_right=bbox[2:], map_size_km=map_size)
+    del first
+
+    json_lines = args.jsonl or (args.out or '').lower().endswith(('.jsonl', '.json'))
+    stream = open(args.out, 'w', newline='') if args.out else sys.stdout
+    writer = RowWriter(stream, json_lines, FIELDS)
+
+    changes = None if args.no_skip else FrameChangeDetector()
+    counts = {'decoded': 0, 'time': args.start}
+    frames = counted(read_video(args.video, args.stride, args.start, args.end), counts)
+    frames = crop_minimap(frames, bbox)
+    samples = range_series(skip_unchanged(frames, changes), config)
+
+    start = time.perf_counter()
+    ranged = found = 0
+    try:
+        for sample in samples:
+            writer.write(sample.as_row())
+            ranged += 1
+            found += sample.found
+    finally:
+        if args.out:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    video_seconds = counts['time'] - args.start + args.stride / fps
+    skipped = changes.skipped if changes is not None else 0
+    print(f"{video_seconds:.1f} s of video ({count} frames at {fps:.0f} fps) in {elapsed:.1f} s "
+          f"({video_seconds / max(elapsed, 1e-9):.1f}x real time): {counts['decoded']} decoded, "
+          f"{ranged} ranged, "
+          f"{skipped} unchanged skipped, marker found in {found}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
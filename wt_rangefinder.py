@@ -3,71 +3,31 @@ War Thunder Rangefinder - Streamlined Edition
 Always-on-top overlay for measuring distances on the map
 """
 
+# First, so the startup report's clock starts before anything else loads
+from startup import EngineLoader, StartupReport, preload, warm_up
+
+import argparse
 import tkinter as tk
 from tkinter import ttk
-import pyautogui
-import numpy as np
-from PIL import Image, ImageGrab, ImageTk
-import cv2
-import keyboard
-import threading
 import time
-from dataclasses import dataclass
-from typing import Optional, Tuple
-
-@dataclass
-class MapConfig:
-    """Configuration for map measurements"""
-    top_left: Optional[Tuple[int, int]] = None
-    bottom_right: Optional[Tuple[int, int]] = None
-    map_size_km: float = 65.0  # Default War Thunder map size in km
-    grid_size_km: float = 2.0  # Size of one grid square in km
-    grid_pixel_size: Optional[float] = None  # Measured pixel size of one grid square
-
-    @property
-    def is_configured(self) -> bool:
-        return self.top_left is not None and self.bottom_right is not None
+from typing import TYPE_CHECKING, Optional
 
-    @property
-    def is_grid_measured(self) -> bool:
-        return self.grid_pixel_size is not None
+from click_capture import ClickCapture, ClickSequence
+from overlay_render import OverlayRenderer
+from rangefinder_core import MapConfig, format_range, pixel_distances, ranges_from_m, ranges_m
 
-    @property
-    def width(self) -> int:
-        if not self.is_configured:
-            return 0
-        return self.bottom_right[0] - self.top_left[0]
-
-    @property
-    def height(self) -> int:
-        if not self.is_configured:
-            return 0
-        return self.bottom_right[1] - self.top_left[1]
-
-    def pixels_to_km(self, pixel_distance: float) -> float:
-        """Convert pixel distance to kilometers"""
-        if not self.is_configured:
-            return 0
-        avg_dimension = (self.width + self.height) / 2
-        return (pixel_distance / avg_dimension) * self.map_size_km
-
-    def auto_calculate_map_size(self) -> Optional[float]:
-        """Auto-calculate map size based on grid measurements"""
-        if not self.is_configured or not self.is_grid_measured:
-            return None
-
-        # Calculate average map dimension in pixels
-        avg_dimension = (self.width + self.height) / 2
-
-        # Calculate number of grid squares that fit in the map
-        num_grids = avg_dimension / self.grid_pixel_size
-
-        # Calculate total map size
-        return num_grids * self.grid_size_km
+# NumPy/OpenCV-backed modules load in build_engine, after the window is up
+if TYPE_CHECKING:
+    from detection_pipeline import FramePacket
+    from frame_sources import FrameSource
+    from session_profiler import SessionProfiler
 
 
 class RangefinderOverlay:
-    def __init__(self):
+    def __init__(self, frame_source: Optional['FrameSource'] = None,
+                 profiler: Optional['SessionProfiler'] = None):
+        self.startup = StartupReport()
+        self.profiler = profiler
         self.root = tk.Tk()
         self.root.title("WT Rangefinder")
         self.root.attributes('-topmost', True)  # Always on top
@@ -76,17 +36,109 @@ class RangefinderOverlay:
         
         # Configuration
         self.config = MapConfig()
-        self.is_measuring = False
+        self.frame_source = frame_source
+        self.capture_report = ""
+        self.grid_bbox = None
+        self.screen_bbox = (0, 0, self.root.winfo_screenwidth(), self.root.winfo_screenheight())
         self.detection_enabled = False
-        self.measuring_points = []
+        
+        # Detection engine, created by build_engine behind the window
+        self.tracker = None
+        self.player_locator = None
+        self.grid_watcher = None
+        self.profiles = None
+        self.profile_key = None
+        self.map_watcher = None
+        self.locating_map = False  # An F9 search is running on the watcher thread
+        self.measuring_grid = False  # An F6 grid read is running on the watcher thread
+        self.history = None
+        self.pipeline = None
+        
+        # Display changes are coalesced and drawn at a capped frame rate
+        self.renderer = OverlayRenderer(self.root.after)
+        
+        # One mouse listener for the session feeds every click measurement
+        self.clicks = ClickCapture(self.update_status,
+                                   lambda func, *args: self.pipeline.call_soon(func, *args))
         
         # Style
         self.setup_ui()
-        self.setup_hotkeys()
+        self.renderer.start()
         
         # Position window in top-right corner
         self.root.geometry('320x330+{}+50'.format(self.root.winfo_screenwidth() - 370))
         
+        # Show the window now; OpenCV and friends load behind it
+        self.root.update()
+        self.startup.mark('window')
+        self.update_status("⏳ Loading detection engine...")
+        self.engine = EngineLoader(self.build_engine, self.start_engine, self.root.after,
+                                   on_error=self.show_engine_error)
+        self.engine.start()
+        
+    def build_engine(self):
+        """Import and create the detection engine, then warm it up (loader thread)"""
+        preload()
+        from calibration_profiles import ProfileStore, game_window_rect, layout_key
+        from capture_backends import select_capture_source
+        from detection_pipeline import DetectionPipeline
+        from grid_detection import GridWatcher
+        from map_locator import MapWatcher
+        from range_history import RangeHistory
+        from marker_tracking import MarkerTracker
+        from player_locator import PlayerLocator
+        self.startup.mark('engine')
+        
+        # Fastest screen capture backend that works here (or WT_CAPTURE_BACKEND)
+        if self.frame_source is None:
+            self.frame_source, self.capture_report = select_capture_source()
+        self.tracker = MarkerTracker(pyramid_factor=4)
+        self.player_locator = PlayerLocator()
+        self.grid_watcher = GridWatcher()
+        
+        # Saved calibrations, keyed by screen resolution and game window layout
+        self.profiles = ProfileStore()
+        self.profile_key = layout_key(self.screen_bbox[2:], game_window_rect())
+        
+        # Every reading is appended to a compact on-disk log
+        try:
+            self.history = RangeHistory()
+        except (OSError, ValueError) as e:
+            print(f"Range history disabled: {e}")
+        
+        # Finds the minimap on screen and re-checks it in case the UI scale changes
+        self.map_watcher = MapWatcher(self.frame_source, self.screen_bbox, self.map_calibration,
+                                      lambda location: self.pipeline.call_soon(self.apply_map_location, location, False))
+        
+        # Capture -> detect -> UI stages; the UI stage runs on the Tk loop
+        self.pipeline = DetectionPipeline(self.profiled('capture', self.capture_frame),
+                                          self.profiled('detect', self.detect_frame),
+                                          self.profiled('ui', self.show_detection),
+                                          self.root.after, on_error=self.show_detection_error)
+        
+        # First-call costs are paid here instead of by the first F11
+        profile = self.profiles.get(self.profile_key)
+        bbox = profile.bbox if profile is not None else (0, 0, 512, 512)
+        warm_up(self.tracker, self.player_locator, bbox)
+        self.startup.mark('warm-up')
+    
+    def start_engine(self):
+        """Hotkeys, pipeline and saved calibration once the engine is built (Tk thread)"""
+        self.setup_hotkeys()
+        self.clicks.start()
+        self.pipeline.start()
+        self.update_status("Press F9 to setup map")
+        self.load_profile()
+        self.map_watcher.start()
+        self.startup.mark('ready')
+        print(self.startup.format())
+        if self.capture_report:
+            print(self.capture_report)
+    
+    def show_engine_error(self, error: Exception):
+        """The engine failed to load (Tk thread)"""
+        self.update_status(f"❌ Detection engine failed to load:\n{str(error)[:60]}")
+        
     def setup_ui(self):
         """Create the UI elements"""
         style = ttk.Style()
@@ -167,24 +219,61 @@ TIP: Hold SHIFT+ALT in-game to
         update_btn.grid(row=0, column=2, padx=5)
         
     def setup_hotkeys(self):
-        """Setup global hotkeys"""
-        keyboard.add_hotkey('f6', self.measure_grid)
-        keyboard.add_hotkey('f9', self.setup_map_corners)
-        keyboard.add_hotkey('f10', self.manual_measure)
-        keyboard.add_hotkey('f11', self.auto_detect_marker)
-        keyboard.add_hotkey('esc', self.cancel_operation)
+        """Setup global hotkeys (handlers are marshalled onto the Tk thread)"""
+        import keyboard
+        call_soon = self.pipeline.call_soon
+        hotkeys = (
+            ('f6', self.measure_grid),
+            ('f9', self.setup_map_corners),
+            ('f10', self.manual_measure),
+            ('f11', self.auto_detect_marker),
+            ('esc', self.cancel_operation),
+        )
+        for key, handler in hotkeys:
+            keyboard.add_hotkey(key, call_soon, args=(self.profiled(f'hotkey {key}', handler),))
         
     def update_status(self, message: str):
-        """Update status message"""
-        self.status_var.set(message)
-        self.root.update()
+        """Update status message (safe from any thread; drawn on the next render tick)"""
+        self.renderer.set(self.status_var, message)
+        
+    def load_profile(self):
+        """Restore the saved calibration for this screen layout if it still fits"""
+        from calibration_profiles import validate_profile
+        start = time.perf_counter()
+        profile = self.profiles.get(self.profile_key)
+        if profile is None:
+            return
         
+        # One quick capture of the saved bbox to check the minimap is still there
+        try:
+            frame = self.frame_source.grab(profile.bbox)
+        except Exception:
+            frame = None
+        if not validate_profile(profile, frame):
+            self.update_status("⚠ Saved calibration doesn't match the screen\nPress F9 to setup map")
+            return
+        
+        profile.apply(self.config)
+        self.grid_watcher.reset(profile.grid_pixel_size)
+        self.renderer.set(self.map_size_var, f"{profile.map_size_km:.1f}")
+        self.renderer.set(self.grid_size_var, str(profile.grid_size_km))
+        elapsed = (time.perf_counter() - start) * 1000
+        self.update_status(f"✓ Calibration loaded in {elapsed:.0f} ms\n{self.config.width}x{self.config.height}px")
+    
+    def save_profile(self):
+        """Remember the current calibration for this screen layout"""
+        from calibration_profiles import CalibrationProfile
+        if self.profiles is not None and self.config.is_configured:
+            self.profiles.put(self.profile_key, CalibrationProfile.from_config(self.config))
+    
     def update_map_size(self):
         """Update the map size configuration"""
         try:
             new_size = float(self.map_size_var.get())
             if new_size > 0:
                 self.config.map_size_km = new_size
+                self.config.map_size_manual = True
+                self.save_profile()
                 self.update_status(f"Map size updated to {new_size} km")
             else:
                 self.update_status("Error: Map size must be positive")
@@ -197,81 +286,142 @@ TIP: Hold SHIFT+ALT in-game to
             new_size = float(self.grid_size_var.get())
             if new_size > 0:
                 self.config.grid_size_km = new_size
+                self.save_profile()
                 self.update_status(f"Grid size updated to {new_size} km")
             else:
                 self.update_status("Error: Grid size must be positive")
         except ValueError:
             self.update_status("Error: Invalid grid size value")
 
+    def read_grid_pitch(self, bbox):
+        """Grid estimate from one capture of the map (watcher thread)"""
+        from grid_detection import detect_grid_pitch
+        frame = self.frame_source.grab(bbox)
+        return detect_grid_pitch(frame) if frame is not None else None
+    
+    def apply_grid_pitch(self, pitch: float, explicit: bool = True):
+        """Use a detected grid pitch and re-derive the map size (Tk thread).
+
+        Automatic re-measures (``explicit=False``) keep a map size typed in
+        by the user.
+        """
+        self.config.grid_pixel_size = pitch
+        auto_size = None
+        if explicit or not self.config.map_size_manual:
+            auto_size = self.config.auto_calculate_map_size()
+        if auto_size:
+            self.config.map_size_km = auto_size
+            self.config.map_size_manual = False
+            self.renderer.set(self.map_size_var, f"{auto_size:.1f}")
+        self.save_profile()
+        message = f"📐 Grid detected: {pitch:.2f}px = {self.config.grid_size_km} km"
+        if auto_size:
+            message += f"\nMap size: {auto_size:.1f} km"
+        self.update_status(message)
+    
     def measure_grid(self):
         """Measure a single grid square to calibrate map size"""
-        if self.is_measuring:
+        if self.clicks.active or self.measuring_grid:
             return
-
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, click two adjacent grid corners...")
-
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-
-            self.measuring_points.append((x, y))
-
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ First corner set!\nPress SHIFT+ALT, click second corner...")
-            elif len(self.measuring_points) == 2:
-                # Calculate pixel distance between grid corners
-                p1, p2 = self.measuring_points
-                pixel_dist = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-                self.config.grid_pixel_size = pixel_dist
-                self.is_measuring = False
-                self.update_status(f"✓ Grid measured: {pixel_dist:.1f} pixels = {self.config.grid_size_km} km")
-                return False  # Stop listener
-
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        
+        # Read the grid off the map when possible (watcher thread), clicks are the fallback
+        if self.config.is_configured:
+            self.measuring_grid = True
+            self.update_status("📐 Measuring grid...")
+            bbox = self.map_bbox()
+            self.map_watcher.submit(lambda: self.read_grid_pitch(bbox),
+                                    lambda estimate: self.pipeline.call_soon(self.finish_auto_grid, estimate))
+            return
+        self.begin_grid_clicks("Press SHIFT+ALT, click two adjacent grid corners...")
+    
+    def finish_auto_grid(self, estimate):
+        """F6 grid reading: use it, else ask for two corner clicks (Tk thread)"""
+        self.measuring_grid = False
+        if self.clicks.active:
+            return
+        if estimate is not None:
+            self.grid_watcher.reset(estimate.pitch)
+            self.apply_grid_pitch(estimate.pitch)
+            return
+        self.begin_grid_clicks("Grid not found automatically\n"
+                               "Press SHIFT+ALT, click two adjacent grid corners...")
+    
+    def begin_grid_clicks(self, first: str):
+        self.clicks.begin(ClickSequence(
+            prompts=[first, "✓ First corner set!\nPress SHIFT+ALT, click second corner..."],
+            on_done=self.finish_grid_clicks))
+    
+    def finish_grid_clicks(self, points):
+        """Calculate the grid pitch from two clicked corners (Tk thread)"""
+        p1, p2 = points
+        pixel_dist = float(pixel_distances(p1, p2))
+        self.config.grid_pixel_size = pixel_dist
+        self.grid_watcher.reset(pixel_dist)
+        self.save_profile()
+        self.update_status(f"✓ Grid measured: {pixel_dist:.1f} pixels = {self.config.grid_size_km} km")
+    
+    def map_calibration(self):
+        """Calibrated bbox and grid pitch for the map watcher, None until set up"""
+        if not self.config.is_configured:
+            return None
+        return self.map_bbox(), self.config.grid_pixel_size
+    
+    def apply_map_location(self, location, explicit: bool = True):
+        """Use a minimap found on screen as the calibration (Tk thread)"""
+        if self.clicks.active:
+            return  # Corner clicks in progress win
+        if location is None:
+            self.update_status("⚠ Minimap not found on screen\nPress F9 to setup map")
+            return
+        self.config.top_left = location.bbox[:2]
+        self.config.bottom_right = location.bbox[2:]
+        self.grid_watcher.reset(location.grid.pitch)
+        self.apply_grid_pitch(location.grid.pitch, explicit)
+        self.update_status(f"🗺 Map found: {self.config.width}x{self.config.height}px\n"
+                           f"Grid {location.grid.pitch:.1f}px, map {self.config.map_size_km:.1f} km")
     
     def setup_map_corners(self):
         """Setup map corner coordinates"""
-        if self.is_measuring:
+        if self.clicks.active or self.locating_map:
             return
 
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, then click TOP-LEFT corner...")
-
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-
-            self.measuring_points.append((x, y))
-
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ Top-left set!\nPress SHIFT+ALT, click BOTTOM-RIGHT...")
-            elif len(self.measuring_points) == 2:
-                self.config.top_left = self.measuring_points[0]
-                self.config.bottom_right = self.measuring_points[1]
-                self.is_measuring = False
-
-                # Auto-calculate map size if grid was measured
-                if self.config.is_grid_measured:
-                    auto_size = self.config.auto_calculate_map_size()
-                    if auto_size:
-                        self.config.map_size_km = auto_size
-                        self.map_size_var.set(f"{auto_size:.1f}")
-                        self.update_status(f"✓ Map configured! Auto-calculated size: {auto_size:.1f} km\nDimensions: {self.config.width}x{self.config.height}px")
-                    else:
-                        self.update_status(f"✓ Map configured!\nSize: {self.config.width}x{self.config.height}px")
-                else:
-                    self.update_status(f"✓ Map configured!\nSize: {self.config.width}x{self.config.height}px\nTIP: Use F6 first for auto-calculation")
-
-                return False  # Stop listener
-
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        # Look for the map on screen first, corner clicks are the fallback. The
+        # full-screen grab and search run on the watcher thread, not the UI's
+        self.locating_map = True
+        self.update_status("🔍 Looking for the minimap...")
+        self.map_watcher.submit(self.map_watcher.locate,
+                                lambda location: self.pipeline.call_soon(self.finish_auto_locate, location))
+    
+    def finish_auto_locate(self, location):
+        """F9 search result: use the map found, else ask for corners (Tk thread)"""
+        self.locating_map = False
+        if self.clicks.active:
+            return
+        if location is not None:
+            self.apply_map_location(location)
+            return
+        self.clicks.begin(ClickSequence(
+            prompts=["Map not found automatically\nPress SHIFT+ALT, then click TOP-LEFT corner...",
+                     "✓ Top-left set!\nPress SHIFT+ALT, click BOTTOM-RIGHT..."],
+            on_done=self.finish_corner_clicks))
+    
+    def finish_corner_clicks(self, points):
+        """Set the map corners from two clicks (Tk thread)"""
+        self.config.top_left, self.config.bottom_right = points
+
+        # Auto-calculate map size if grid was measured
+        if self.config.is_grid_measured:
+            auto_size = self.config.auto_calculate_map_size()
+            if auto_size:
+                self.config.map_size_km = auto_size
+                self.config.map_size_manual = False
+                self.renderer.set(self.map_size_var, f"{auto_size:.1f}")
+                self.update_status(f"✓ Map configured! Auto-calculated size: {auto_size:.1f} km\nDimensions: {self.config.width}x{self.config.height}px")
+            else:
+                self.update_status(f"✓ Map configured!\nSize: {self.config.width}x{self.config.height}px")
+        else:
+            self.update_status(f"✓ Map configured!\nSize: {self.config.width}x{self.config.height}px\nTIP: Use F6 first for auto-calculation")
+        self.save_profile()
     
     def manual_measure(self):
         """Manual two-point measurement"""
@@ -279,57 +429,30 @@ TIP: Hold SHIFT+ALT in-game to
             self.update_status("⚠ Setup map corners first (F9)")
             return
         
-        if self.is_measuring:
+        if self.clicks.active:
             return
         
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, click FIRST point...")
-        
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-            
-            # Check if click is within map bounds
-            if not (self.config.top_left[0] <= x <= self.config.bottom_right[0] and
-                    self.config.top_left[1] <= y <= self.config.bottom_right[1]):
-                self.update_status("⚠ Click inside the map area!")
-                return
-            
-            self.measuring_points.append((x, y))
-            
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ Point 1 set!\nPress SHIFT+ALT, click SECOND point...")
-            elif len(self.measuring_points) == 2:
-                self.calculate_distance()
-                self.is_measuring = False
-                return False  # Stop listener
-        
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        self.clicks.begin(ClickSequence(
+            prompts=["Press SHIFT+ALT, click FIRST point...",
+                     "✓ Point 1 set!\nPress SHIFT+ALT, click SECOND point..."],
+            on_done=self.calculate_distance,
+            accept=self.inside_map, reject_message="⚠ Click inside the map area!"))
     
-    def calculate_distance(self):
-        """Calculate distance between two points"""
-        if len(self.measuring_points) != 2:
-            return
-        
-        p1, p2 = self.measuring_points
-        
-        # Calculate pixel distance
-        pixel_dist = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-        
-        # Convert to kilometers
-        km_dist = self.config.pixels_to_km(pixel_dist)
+    def inside_map(self, x: int, y: int) -> bool:
+        """Check if a screen point is within the map bounds"""
+        return (self.config.top_left[0] <= x <= self.config.bottom_right[0] and
+                self.config.top_left[1] <= y <= self.config.bottom_right[1])
+    
+    def calculate_distance(self, points):
+        """Calculate distance between two clicked points (Tk thread)"""
+        p1, p2 = points
         
-        # Convert to meters
-        meters_dist = km_dist * 1000
+        # Pixel distance -> metres on the ground
+        meters_dist = float(ranges_m(self.config, p1, p2))
         
         # Update display
-        if meters_dist >= 1000:
-            self.distance_var.set(f"{km_dist:.2f} km")
-        else:
-            self.distance_var.set(f"{int(meters_dist)} m")
+        self.renderer.set(self.distance_var, format_range(meters_dist))
+        self.record_reading('manual', self.map_point(p1), self.map_point(p2), meters_dist)
         
         self.update_status(f"✓ Distance calculated!")
     
@@ -340,76 +463,125 @@ TIP: Hold SHIFT+ALT in-game to
             return
         
         self.update_status("🔍 Scanning for yellow marker...")
-        
-        # Capture map area
-        screenshot = ImageGrab.grab(bbox=(
+        self.pipeline.request(manual=True)
+    
+    def map_bbox(self):
+        """Screen bbox of the configured map"""
+        return (
             self.config.top_left[0],
             self.config.top_left[1],
             self.config.bottom_right[0],
             self.config.bottom_right[1]
-        ))
-        
-        # Convert to OpenCV format
-        img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Yellow color range for War Thunder markers
-        lower_yellow = np.array([20, 100, 100])
-        upper_yellow = np.array([35, 255, 255])
-        
-        # Create mask
-        mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-        
-        # Find contours
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if not contours:
+        )
+    
+    def capture_frame(self, manual: bool) -> Optional['FramePacket']:
+        """Pipeline capture stage: grab the map area (capture thread)"""
+        from detection_pipeline import FramePacket
+        if not self.config.is_configured:
+            return None
+        bbox = self.map_bbox()
+        frame = self.frame_source.grab(bbox)
+        if frame is None:
+            return None
+        return FramePacket(frame, bbox, time.perf_counter(), manual)
+    
+    def detect_frame(self, packet: 'FramePacket'):
+        """Pipeline detect stage: locate the marker (detect thread)"""
+        from frame_sources import ArrayFrameSource
+        # The tracker crops its window straight out of this capture
+        source = ArrayFrameSource([packet.frame], origin=packet.bbox[:2])
+        result = self.tracker.scan(source, packet.bbox)
+        
+        # Re-measure the grid now and then so zoom changes are picked up
+        if packet.bbox != self.grid_bbox:
+            self.grid_watcher.reset(self.config.grid_pixel_size)
+            self.grid_bbox = packet.bbox
+        pitch = self.grid_watcher.update(packet.frame, packet.captured_at)
+        if pitch is not None:
+            self.pipeline.call_soon(self.apply_grid_pitch, pitch, False)
+        return packet.bbox, result, self.player_locator.locate(packet.frame)
+    
+    def show_detection(self, detection):
+        """Pipeline UI stage: display a detection result (Tk thread)"""
+        bbox, result, player = detection
+        if 'first detection' not in self.startup.marks:
+            self.startup.mark('first detection')
+            print(self.startup.format())
+        if not self.config.is_configured or bbox != self.map_bbox():
+            return  # Map was recalibrated while this frame was in flight
+        
+        if not result.found:
             self.update_status("❌ No yellow marker detected")
-            self.distance_var.set("---")
+            self.renderer.set(self.distance_var, "---")
             return
         
-        # Get largest contour (likely the marker)
-        largest_contour = max(contours, key=cv2.contourArea)
-        
-        # Get marker center
-        M = cv2.moments(largest_contour)
-        if M["m00"] == 0:
+        if result.center is None:
             self.update_status("❌ Could not locate marker center")
             return
         
-        marker_x = int(M["m10"] / M["m00"])
-        marker_y = int(M["m01"] / M["m00"])
+        marker_x, marker_y = result.center
         
-        # Player is typically at center of map
-        player_x = self.config.width // 2
-        player_y = self.config.height // 2
-        
-        # Calculate distance
-        pixel_dist = np.sqrt((marker_x - player_x)**2 + (marker_y - player_y)**2)
-        km_dist = self.config.pixels_to_km(pixel_dist)
-        meters_dist = km_dist * 1000
+        # Range from the player icon (map centre if it wasn't found)
+        origin = self.player_position(player)
+        meters_dist = float(ranges_from_m(self.config, origin, result.center))
         
         # Update display
-        if meters_dist >= 1000:
-            self.distance_var.set(f"{km_dist:.2f} km")
-        else:
-            self.distance_var.set(f"{int(meters_dist)} m")
+        self.renderer.set(self.distance_var, format_range(meters_dist))
+        self.record_reading('detect', origin, result.center, meters_dist)
         
-        self.update_status(f"✓ Marker detected at ({marker_x}, {marker_y})")
+        if player.found:
+            self.update_status(f"✓ Marker detected at ({marker_x}, {marker_y})")
+        else:
+            self.update_status(f"✓ Marker detected at ({marker_x}, {marker_y}), player assumed at centre")
+    
+    def map_point(self, point):
+        """Screen point -> minimap pixels"""
+        return point[0] - self.config.top_left[0], point[1] - self.config.top_left[1]
+    
+    def record_reading(self, source: str, start, end, metres: float):
+        """Append a reading to the range history (Tk thread)"""
+        from range_history import config_id
+        if self.history is not None:
+            self.history.append(source, start, end, metres, config_id(self.config))
+    
+    def player_position(self, player):
+        """Player icon position, or the map centre if it wasn't found"""
+        if player is not None and player.found:
+            return player.center
+        return self.config.centre
+    
+    def show_detection_error(self, error: Exception):
+        """Pipeline error handler (Tk thread)"""
+        self.update_status(f"❌ Error: {str(error)[:30]}")
     
     def cancel_operation(self):
         """Cancel current operation"""
-        self.is_measuring = False
-        self.measuring_points = []
+        self.clicks.cancel()
         self.update_status("Operation cancelled")
     
     def run(self):
         """Start the application"""
-        self.root.mainloop()
+        self.profiled('tk mainloop', self.root.mainloop)()
+        if self.history is not None:
+            self.history.close()
+    
+    def profiled(self, name: str, func):
+        """``func`` timed and sampled under ``name`` when profiling, else itself"""
+        if self.profiler is None:
+            return func
+        return self.profiler.wrap(name, func)
+
+
+def parse_args(argv=None):
+    from session_profiler import add_profile_arguments
+    parser = argparse.ArgumentParser(description="War Thunder Rangefinder - Streamlined Edition")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """Main entry point"""
+    args = parse_args(argv)
     print("=" * 50)
     print("War Thunder Rangefinder - Streamlined Edition")
     print("=" * 50)
@@ -420,8 +592,14 @@ def main():
     print("- Easy hotkey controls")
     print("\nStarting overlay...")
     
-    app = RangefinderOverlay()
-    app.run()
+    from session_profiler import profiler_from_args
+    profiler = profiler_from_args(args)
+    try:
+        app = RangefinderOverlay(profiler=profiler)
+        app.run()
+    finally:
+        if profiler is not None:
+            print(f"Profile report written to {profiler.stop()}")
 
 
 if __name__ == "__main__":
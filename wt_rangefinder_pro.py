@@ -3,20 +3,27 @@ War Thunder Rangefinder - Advanced Edition
 Includes click-through overlay mode for maximum game interaction
 """
 
+# First, so the startup report's clock starts before anything else loads
+from startup import EngineLoader, StartupReport, preload
+
+import argparse
 import tkinter as tk
 from tkinter import ttk
-import pyautogui
-import numpy as np
-from PIL import Image, ImageGrab, ImageTk
-import cv2
-import keyboard
-import threading
 import time
-from dataclasses import dataclass
-from typing import Optional, Tuple
-import sys
+from typing import TYPE_CHECKING, Optional
 import ctypes
-from ctypes import wintypes
+
+from click_capture import ClickCapture, ClickSequence
+from overlay_render import OverlayRenderer
+from rangefinder_core import MapConfig, format_range, pixel_distances, ranges_from_m, ranges_m
+from scan_metrics import ScanMetrics
+from scan_scheduler import AdaptiveScanScheduler
+
+# NumPy/OpenCV-backed modules load in build_engine, after the window is up
+if TYPE_CHECKING:
+    from detection_pipeline import FramePacket
+    from frame_sources import FrameSource
+    from session_profiler import SessionProfiler
 
 # Windows API for click-through window
 try:
@@ -39,58 +46,13 @@ except:
     def remove_click_through(hwnd): pass
 
 
-@dataclass
-class MapConfig:
-    """Configuration for map measurements"""
-    top_left: Optional[Tuple[int, int]] = None
-    bottom_right: Optional[Tuple[int, int]] = None
-    map_size_km: float = 65.0
-    grid_size_km: float = 2.0  # Size of one grid square in km
-    grid_pixel_size: Optional[float] = None  # Measured pixel size of one grid square
-
-    @property
-    def is_configured(self) -> bool:
-        return self.top_left is not None and self.bottom_right is not None
-
-    @property
-    def is_grid_measured(self) -> bool:
-        return self.grid_pixel_size is not None
-
-    @property
-    def width(self) -> int:
-        if not self.is_configured:
-            return 0
-        return self.bottom_right[0] - self.top_left[0]
-
-    @property
-    def height(self) -> int:
-        if not self.is_configured:
-            return 0
-        return self.bottom_right[1] - self.top_left[1]
-
-    def pixels_to_km(self, pixel_distance: float) -> float:
-        if not self.is_configured:
-            return 0
-        avg_dimension = (self.width + self.height) / 2
-        return (pixel_distance / avg_dimension) * self.map_size_km
-
-    def auto_calculate_map_size(self) -> Optional[float]:
-        """Auto-calculate map size based on grid measurements"""
-        if not self.is_configured or not self.is_grid_measured:
-            return None
-
-        # Calculate average map dimension in pixels
-        avg_dimension = (self.width + self.height) / 2
-
-        # Calculate number of grid squares that fit in the map
-        num_grids = avg_dimension / self.grid_pixel_size
-
-        # Calculate total map size
-        return num_grids * self.grid_size_km
-
-
 class AdvancedRangefinderOverlay:
-    def __init__(self):
+    def __init__(self, frame_source: Optional['FrameSource'] = None,
+                 profiler: Optional['SessionProfiler'] = None,
+                 detect_worker: bool = False):
+        self.startup = StartupReport()
+        self.profiler = profiler
+        self.detect_worker = detect_worker
         self.root = tk.Tk()
         self.root.title("WT Rangefinder Pro")
         self.root.attributes('-topmost', True)
@@ -98,25 +60,130 @@ class AdvancedRangefinderOverlay:
         self.root.overrideredirect(False)
         
         self.config = MapConfig()
-        self.is_measuring = False
-        self.measuring_points = []
+        self.frame_source = frame_source
+        self.capture_report = ""
+        self.grid_bbox = None
+        self.screen_bbox = (0, 0, self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        
+        # Detection engine, created by build_engine behind the window
+        self.analyzer = None  # FrameAnalyzer, or a DetectionWorker running one
+        self.grid_watcher = None
+        self.profiles = None
+        self.profile_key = None
+        self.map_watcher = None
+        self.locating_map = False  # An F9 search is running on the watcher thread
+        self.measuring_grid = False  # An F6 grid read is running on the watcher thread
+        self.history = None
+        self.change_detector = None
+        self.player_center = None  # Player icon in map pixels, from the last detection
+        self.pipeline = None
+        # Every yellow ping, ranged from the same capture
+        self.range_all_enabled = False
         self.click_through_mode = False
         self.auto_scan_enabled = False
-        self.scan_thread = None
+        # Paced by the results of the frames it requests (see update_detection)
+        self.scheduler = AdaptiveScanScheduler(self.profiled('auto-scan', self.auto_scan_tick),
+                                               deferred=True)
+        
+        # Rolling per-stage timings for the performance panel
+        self.metrics = ScanMetrics()
+        self.metrics_visible = False
+        
+        # Display changes are coalesced and drawn at a capped frame rate
+        self.renderer = OverlayRenderer(self.root.after)
+        
+        # One mouse listener for the session feeds every click measurement
+        self.clicks = ClickCapture(self.update_status,
+                                   lambda func, *args: self.pipeline.call_soon(func, *args))
         
         self.setup_ui()
-        self.setup_hotkeys()
+        self.renderer.start()
         
         # Position window
-        self.root.geometry('360x370+{}+50'.format(self.root.winfo_screenwidth() - 410))
+        self.root.geometry('360x500+{}+50'.format(self.root.winfo_screenwidth() - 410))
         
         # Get window handle for click-through
         self.root.update()
+        self.startup.mark('window')
         self.hwnd = None
         try:
             self.hwnd = int(self.root.frame(), 16)
         except:
             pass
+        
+        # OpenCV and friends load behind the window
+        self.update_status("⏳ Loading detection engine...")
+        self.engine = EngineLoader(self.build_engine, self.start_engine, self.root.after,
+                                   on_error=self.show_engine_error)
+        self.engine.start()
+    
+    def build_engine(self):
+        """Import and create the detection engine, then warm it up (loader thread)"""
+        preload()
+        from calibration_profiles import ProfileStore, game_window_rect, layout_key
+        from capture_backends import select_capture_source
+        from detection_pipeline import DetectionPipeline
+        from detection_worker import DetectionWorker, FrameAnalyzer
+        from frame_change import FrameChangeDetector
+        from grid_detection import GridWatcher
+        from map_locator import MapWatcher
+        from range_history import RangeHistory
+        self.startup.mark('engine')
+        
+        # Fastest screen capture backend that works here (or WT_CAPTURE_BACKEND)
+        if self.frame_source is None:
+            self.frame_source, self.capture_report = select_capture_source()
+        self.grid_watcher = GridWatcher()
+        self.change_detector = FrameChangeDetector()
+        
+        # Saved calibrations, keyed by screen resolution and game window layout
+        self.profiles = ProfileStore()
+        self.profile_key = layout_key(self.screen_bbox[2:], game_window_rect())
+        
+        # Every reading is appended to a compact on-disk log
+        try:
+            self.history = RangeHistory()
+        except (OSError, ValueError) as e:
+            print(f"Range history disabled: {e}")
+        
+        # Finds the minimap on screen and re-checks it in case the UI scale changes
+        self.map_watcher = MapWatcher(self.frame_source, self.screen_bbox, self.map_calibration,
+                                      lambda location: self.pipeline.call_soon(self.apply_map_location, location, False))
+        
+        # Capture -> detect -> UI stages; the UI stage runs on the Tk loop
+        self.pipeline = DetectionPipeline(self.profiled('capture', self.capture_frame),
+                                          self.profiled('detect', self.detect_frame),
+                                          self.profiled('ui', self.show_detection),
+                                          self.root.after, on_error=self.show_detection_error)
+        
+        # First-call costs are paid here instead of by the first F11
+        profile = self.profiles.get(self.profile_key)
+        bbox = profile.bbox if profile is not None else (0, 0, 512, 512)
+        if self.detect_worker:
+            # Detection in its own process, off this process's GIL
+            self.analyzer = DetectionWorker(warm_up_bbox=bbox)
+            self.analyzer.start()
+        else:
+            self.analyzer = FrameAnalyzer()
+            self.analyzer.warm_up(bbox)
+        self.startup.mark('warm-up')
+    
+    def start_engine(self):
+        """Hotkeys, pipeline and saved calibration once the engine is built (Tk thread)"""
+        self.setup_hotkeys()
+        self.clicks.start()
+        self.pipeline.start()
+        self.update_status("Press F9 to setup map")
+        self.load_profile()
+        self.map_watcher.start()
+        self.startup.mark('ready')
+        print(self.startup.format())
+        if self.capture_report:
+            print(self.capture_report)
+    
+    def show_engine_error(self, error: Exception):
+        """The engine failed to load (Tk thread)"""
+        self.update_status(f"❌ Detection engine failed to load:\n{str(error)[:60]}")
     
     def setup_ui(self):
         """Create UI elements"""
@@ -149,6 +216,12 @@ class AdvancedRangefinderOverlay:
                                    foreground='#00ff00')
         distance_label.pack()
         
+        # Range table for all tracked markers
+        self.targets_var = tk.StringVar(value="")
+        targets_label = ttk.Label(distance_frame, textvariable=self.targets_var,
+                                  font=('Consolas', 8), justify=tk.LEFT)
+        targets_label.pack()
+        
         # Status
         self.status_var = tk.StringVar(value="Press F9 to setup map")
         status_label = ttk.Label(main_frame, textvariable=self.status_var,
@@ -209,6 +282,24 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
 
         ttk.Button(size_frame, text="Set", command=self.update_map_size,
                   width=5).pack(side=tk.RIGHT, padx=2)
+
+        # Scan latency target
+        latency_frame = ttk.Frame(options_frame)
+        latency_frame.pack(fill=tk.X, pady=2)
+
+        ttk.Label(latency_frame, text="Scan Latency:",
+                 font=('Segoe UI', 8)).pack(side=tk.LEFT, padx=2)
+
+        self.latency_var = tk.StringVar(value=str(self.scheduler.latency_target))
+        latency_entry = ttk.Entry(latency_frame, textvariable=self.latency_var,
+                                  width=6, font=('Consolas', 8))
+        latency_entry.pack(side=tk.LEFT, padx=2)
+
+        ttk.Label(latency_frame, text="s",
+                 font=('Segoe UI', 8)).pack(side=tk.LEFT)
+
+        ttk.Button(latency_frame, text="Set", command=self.update_scan_latency,
+                  width=5).pack(side=tk.RIGHT, padx=2)
         
         # Auto-scan toggle
         self.auto_scan_var = tk.BooleanVar(value=False)
@@ -217,15 +308,50 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
                                      command=self.toggle_auto_scan)
         auto_check.pack(anchor=tk.W, pady=2)
         
+        # Multi-target ranging toggle
+        self.range_all_var = tk.BooleanVar(value=False)
+        range_all_check = ttk.Checkbutton(options_frame, text="Range all markers",
+                                          variable=self.range_all_var,
+                                          command=self.toggle_range_all)
+        range_all_check.pack(anchor=tk.W, pady=2)
+        
+        # Performance panel (collapsed until opened)
+        self.metrics_button = ttk.Button(main_frame, text="▸ Performance",
+                                         command=self.toggle_metrics_panel)
+        self.metrics_button.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
+        self.metrics_frame = ttk.Frame(main_frame)
+        self.metrics_frame.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        
+        self.metrics_var = tk.StringVar(value="No scans yet")
+        ttk.Label(self.metrics_frame, textvariable=self.metrics_var,
+                  font=('Consolas', 7), justify=tk.LEFT).pack(anchor=tk.W)
+        
+        export_frame = ttk.Frame(self.metrics_frame)
+        export_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(export_frame, text="Export JSON", width=11,
+                   command=lambda: self.export_metrics('json')).pack(side=tk.LEFT, padx=2)
+        ttk.Button(export_frame, text="Export CSV", width=11,
+                   command=lambda: self.export_metrics('csv')).pack(side=tk.LEFT, padx=2)
+        ttk.Button(export_frame, text="Reset", width=6,
+                   command=self.metrics.reset).pack(side=tk.RIGHT, padx=2)
+        self.metrics_frame.grid_remove()
+        
     def setup_hotkeys(self):
-        """Setup hotkeys"""
-        keyboard.add_hotkey('f6', self.measure_grid)
-        keyboard.add_hotkey('f9', self.setup_map_corners)
-        keyboard.add_hotkey('f10', self.manual_measure)
-        keyboard.add_hotkey('f11', self.auto_detect_marker)
-        keyboard.add_hotkey('f12', self.toggle_click_through)
-        keyboard.add_hotkey('f8', self.toggle_auto_scan)
-        keyboard.add_hotkey('esc', self.cancel_operation)
+        """Setup hotkeys (handlers are marshalled onto the Tk thread)"""
+        import keyboard
+        call_soon = self.pipeline.call_soon
+        hotkeys = (
+            ('f6', self.measure_grid),
+            ('f9', self.setup_map_corners),
+            ('f10', self.manual_measure),
+            ('f11', self.auto_detect_marker),
+            ('f12', self.toggle_click_through),
+            ('f8', self.toggle_auto_scan),
+            ('esc', self.cancel_operation),
+        )
+        for key, handler in hotkeys:
+            keyboard.add_hotkey(key, call_soon, args=(self.profiled(f'hotkey {key}', handler),))
     
     def toggle_click_through(self):
         """Toggle click-through mode"""
@@ -237,51 +363,127 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
         
         if self.click_through_mode:
             make_click_through(self.hwnd)
-            self.mode_var.set("🖱️ Click-Through Mode")
+            self.renderer.set(self.mode_var, "🖱️ Click-Through Mode")
             self.update_status("✓ Click-through enabled - Press F12 to disable")
             self.root.attributes('-alpha', 0.6)  # More transparent
         else:
             remove_click_through(self.hwnd)
-            self.mode_var.set("Normal Mode")
+            self.renderer.set(self.mode_var, "Normal Mode")
             self.update_status("Click-through disabled")
             self.root.attributes('-alpha', 0.85)
     
     def toggle_auto_scan(self):
         """Toggle automatic scanning"""
+        if not self.engine.ready:
+            self.auto_scan_var.set(False)
+            self.update_status("⏳ Detection engine still loading...")
+            return
         self.auto_scan_enabled = not self.auto_scan_enabled
         self.auto_scan_var.set(self.auto_scan_enabled)
         
         if self.auto_scan_enabled:
-            self.update_status("🔄 Auto-scan enabled (every 3s)")
+            self.update_status("🔄 Auto-scan enabled (adaptive)")
             self.start_auto_scan()
         else:
-            self.update_status("Auto-scan disabled")
+            changes = self.change_detector
+            self.update_status(f"Auto-scan disabled\n"
+                               f"{changes.skipped}/{changes.checks} unchanged scans skipped")
             self.stop_auto_scan()
     
+    def toggle_metrics_panel(self):
+        """Show or hide the performance panel, resizing the window to fit"""
+        self.metrics_visible = not self.metrics_visible
+        if self.metrics_visible:
+            self.metrics_frame.grid()
+            self.metrics_button.config(text="▾ Performance")
+            self.refresh_metrics()
+        else:
+            self.metrics_frame.grid_remove()
+            self.metrics_button.config(text="▸ Performance")
+        self.root.update_idletasks()
+        self.root.geometry(f"{self.root.winfo_width()}x{self.root.winfo_reqheight()}")
+    
+    def refresh_metrics(self):
+        """Redraw the performance panel once a second while it is open"""
+        if not self.metrics_visible:
+            return
+        self.renderer.set(self.metrics_var,
+                          self.metrics.format() if self.metrics.scans else "No scans yet")
+        self.root.after(1000, self.refresh_metrics)
+    
+    def export_metrics(self, kind: str):
+        """Write the panel's numbers to the settings folder as JSON or CSV"""
+        import os
+        from paths import CACHE_DIR
+        path = os.path.join(CACHE_DIR, f"metrics-{time.strftime('%Y%m%d-%H%M%S')}.{kind}")
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            if kind == 'json':
+                self.metrics.to_json(path)
+            else:
+                self.metrics.to_csv(path)
+        except OSError as e:
+            self.update_status(f"⚠ Export failed: {e}")
+            return
+        self.update_status(f"✓ Metrics saved:\n{path}")
+    
+    def toggle_range_all(self):
+        """Toggle ranging of every marker on the map"""
+        self.range_all_enabled = self.range_all_var.get()
+        if not self.range_all_enabled:
+            self.renderer.set(self.targets_var, "")
+        self.update_status("Ranging all markers" if self.range_all_enabled
+                           else "Ranging closest marker only")
+    
     def start_auto_scan(self):
         """Start auto-scanning thread"""
-        if self.scan_thread and self.scan_thread.is_alive():
-            return
-        
-        def scan_loop():
-            while self.auto_scan_enabled:
-                if self.config.is_configured and not self.is_measuring:
-                    self.auto_detect_marker()
-                time.sleep(3)
-        
-        self.scan_thread = threading.Thread(target=scan_loop, daemon=True)
-        self.scan_thread.start()
+        self.scheduler.start()
     
     def stop_auto_scan(self):
         """Stop auto-scanning"""
         self.auto_scan_enabled = False
-        if self.scan_thread:
-            self.scan_thread.join(timeout=1)
+        self.scheduler.stop()
+    
+    def auto_scan_tick(self, requested: bool = False):
+        """One auto-scan pass; the frame's result is recorded when it arrives"""
+        if self.config.is_configured and not self.clicks.active:
+            self.pipeline.request(manual=requested)
     
     def update_status(self, message: str):
-        """Update status"""
-        self.status_var.set(message)
-        self.root.update()
+        """Update status (safe from any thread; drawn on the next render tick)"""
+        self.renderer.set(self.status_var, message)
+    
+    def load_profile(self):
+        """Restore the saved calibration for this screen layout if it still fits"""
+        from calibration_profiles import validate_profile
+        start = time.perf_counter()
+        profile = self.profiles.get(self.profile_key)
+        if profile is None:
+            return
+        
+        # One quick capture of the saved bbox to check the minimap is still there
+        try:
+            frame = self.frame_source.grab(profile.bbox)
+        except Exception:
+            frame = None
+        if not validate_profile(profile, frame):
+            self.update_status("⚠ Saved calibration doesn't match the screen\nPress F9 to setup map")
+            return
+        
+        profile.apply(self.config)
+        self.grid_watcher.reset(profile.grid_pixel_size)
+        self.change_detector.reset()
+        self.player_center = None
+        self.renderer.set(self.map_size_var, f"{profile.map_size_km:.1f}")
+        self.renderer.set(self.grid_size_var, str(profile.grid_size_km))
+        elapsed = (time.perf_counter() - start) * 1000
+        self.update_status(f"✓ Calibration loaded in {elapsed:.0f} ms\n{self.config.width}x{self.config.height}px")
+    
+    def save_profile(self):
+        """Remember the current calibration for this screen layout"""
+        from calibration_profiles import CalibrationProfile
+        if self.profiles is not None and self.config.is_configured:
+            self.profiles.put(self.profile_key, CalibrationProfile.from_config(self.config))
     
     def update_map_size(self):
         """Update map size"""
@@ -289,112 +491,196 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
             new_size = float(self.map_size_var.get())
             if new_size > 0:
                 self.config.map_size_km = new_size
+                self.config.map_size_manual = True
+                self.save_profile()
                 self.update_status(f"✓ Map size: {new_size} km")
             else:
                 self.update_status("⚠ Invalid map size")
         except ValueError:
             self.update_status("⚠ Invalid map size")
 
+    def update_scan_latency(self):
+        """Update auto-scan latency target"""
+        try:
+            new_latency = float(self.latency_var.get())
+            if new_latency > 0:
+                self.scheduler.set_latency_target(new_latency)
+                self.update_status(f"✓ Scan latency: {new_latency} s")
+            else:
+                self.update_status("⚠ Invalid scan latency")
+        except ValueError:
+            self.update_status("⚠ Invalid scan latency")
+
     def update_grid_size(self):
         """Update grid size"""
         try:
             new_size = float(self.grid_size_var.get())
             if new_size > 0:
                 self.config.grid_size_km = new_size
+                self.save_profile()
                 self.update_status(f"✓ Grid size: {new_size} km")
             else:
                 self.update_status("⚠ Invalid grid size")
         except ValueError:
             self.update_status("⚠ Invalid grid size")
 
+    def read_grid_pitch(self, bbox):
+        """Grid estimate from one capture of the map (watcher thread)"""
+        from grid_detection import detect_grid_pitch
+        frame = self.frame_source.grab(bbox)
+        return detect_grid_pitch(frame) if frame is not None else None
+    
+    def apply_grid_pitch(self, pitch: float, explicit: bool = True):
+        """Use a detected grid pitch and re-derive the map size (Tk thread).
+
+        Automatic re-measures (``explicit=False``) keep a map size typed in
+        by the user and stay quiet while auto-scan runs.
+        """
+        self.config.grid_pixel_size = pitch
+        auto_size = None
+        if explicit or not self.config.map_size_manual:
+            auto_size = self.config.auto_calculate_map_size()
+        if auto_size:
+            self.config.map_size_km = auto_size
+            self.config.map_size_manual = False
+            self.renderer.set(self.map_size_var, f"{auto_size:.1f}")
+        self.save_profile()
+        if not explicit and self.auto_scan_enabled:
+            return  # Auto-scan owns the status line
+        message = f"📐 Grid detected: {pitch:.2f}px = {self.config.grid_size_km} km"
+        if auto_size:
+            message += f"\nMap size: {auto_size:.1f} km"
+        self.update_status(message)
+    
     def measure_grid(self):
         """Measure a single grid square to calibrate map size"""
-        if self.is_measuring:
+        if self.clicks.active or self.measuring_grid:
             return
-
-        # Temporarily disable click-through
-        was_click_through = self.click_through_mode
-        if was_click_through:
-            self.toggle_click_through()
-
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, click two adjacent grid corners...")
-
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-
-            self.measuring_points.append((x, y))
-
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ First corner set!\nPress SHIFT+ALT, click second corner...")
-            elif len(self.measuring_points) == 2:
-                # Calculate pixel distance between grid corners
-                p1, p2 = self.measuring_points
-                pixel_dist = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-                self.config.grid_pixel_size = pixel_dist
-                self.is_measuring = False
-                self.update_status(f"✓ Grid measured: {pixel_dist:.1f}px = {self.config.grid_size_km} km")
-
-                # Re-enable click-through if it was on
-                if was_click_through:
-                    self.root.after(500, self.toggle_click_through)
-
-                return False  # Stop listener
-
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        
+        # Read the grid off the map when possible (watcher thread), clicks are the fallback
+        if self.config.is_configured:
+            self.measuring_grid = True
+            self.update_status("📐 Measuring grid...")
+            bbox = self.map_bbox()
+            self.map_watcher.submit(lambda: self.read_grid_pitch(bbox),
+                                    lambda estimate: self.pipeline.call_soon(self.finish_auto_grid, estimate))
+            return
+        self.begin_grid_clicks("Press SHIFT+ALT, click two adjacent grid corners...")
+    
+    def finish_auto_grid(self, estimate):
+        """F6 grid reading: use it, else ask for two corner clicks (Tk thread)"""
+        self.measuring_grid = False
+        if self.clicks.active:
+            return
+        if estimate is not None:
+            self.grid_watcher.reset(estimate.pitch)
+            self.apply_grid_pitch(estimate.pitch)
+            return
+        self.begin_grid_clicks("Grid not found automatically\n"
+                               "Press SHIFT+ALT, click two adjacent grid corners...")
+    
+    def begin_grid_clicks(self, first: str):
+        self.begin_clicks(ClickSequence(
+            prompts=[first, "✓ First corner set!\nPress SHIFT+ALT, click second corner..."],
+            on_done=self.finish_grid_clicks))
+    
+    def finish_grid_clicks(self, points):
+        """Grid pitch from two clicked corners (Tk thread)"""
+        p1, p2 = points
+        pixel_dist = float(pixel_distances(p1, p2))
+        self.config.grid_pixel_size = pixel_dist
+        self.grid_watcher.reset(pixel_dist)
+        self.save_profile()
+        self.update_status(f"✓ Grid measured: {pixel_dist:.1f}px = {self.config.grid_size_km} km")
+    
+    def begin_clicks(self, sequence: ClickSequence):
+        """Start collecting clicks, with click-through off until they are in"""
+        if not self.click_through_mode:
+            self.clicks.begin(sequence)
+            return
+        
+        # Temporarily disable click-through; re-enabled when done or cancelled
+        self.toggle_click_through()
+        on_done, on_cancel = sequence.on_done, sequence.on_cancel
+        
+        def done(points):
+            on_done(points)
+            self.root.after(500, self.toggle_click_through)
+        
+        def cancelled():
+            if on_cancel:
+                on_cancel()
+            self.root.after(500, self.toggle_click_through)
+        
+        sequence.on_done, sequence.on_cancel = done, cancelled
+        self.clicks.begin(sequence)
+    
+    def map_calibration(self):
+        """Calibrated bbox and grid pitch for the map watcher, None until set up"""
+        if not self.config.is_configured:
+            return None
+        return self.map_bbox(), self.config.grid_pixel_size
+    
+    def apply_map_location(self, location, explicit: bool = True):
+        """Use a minimap found on screen as the calibration (Tk thread)"""
+        if self.clicks.active:
+            return  # Corner clicks in progress win
+        if location is None:
+            self.update_status("⚠ Minimap not found on screen\nPress F9 to setup map")
+            return
+        self.config.top_left = location.bbox[:2]
+        self.config.bottom_right = location.bbox[2:]
+        self.change_detector.reset()
+        self.player_center = None
+        self.grid_watcher.reset(location.grid.pitch)
+        self.apply_grid_pitch(location.grid.pitch, explicit)
+        self.update_status(f"🗺 Map found: {self.config.width}x{self.config.height}px\n"
+                           f"Grid {location.grid.pitch:.1f}px, map {self.config.map_size_km:.1f} km")
     
     def setup_map_corners(self):
         """Setup map corners"""
-        if self.is_measuring:
+        if self.clicks.active or self.locating_map:
             return
 
-        # Temporarily disable click-through
-        was_click_through = self.click_through_mode
-        if was_click_through:
-            self.toggle_click_through()
-
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, click TOP-LEFT...")
-
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-
-            self.measuring_points.append((x, y))
-
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ Top-left set!\nPress SHIFT+ALT, click BOTTOM-RIGHT...")
-            elif len(self.measuring_points) == 2:
-                self.config.top_left = self.measuring_points[0]
-                self.config.bottom_right = self.measuring_points[1]
-                self.is_measuring = False
-
-                # Auto-calculate map size if grid was measured
-                if self.config.is_grid_measured:
-                    auto_size = self.config.auto_calculate_map_size()
-                    if auto_size:
-                        self.config.map_size_km = auto_size
-                        self.map_size_var.set(f"{auto_size:.1f}")
-                        self.update_status(f"✓ Map configured! Auto-calc: {auto_size:.1f} km\n{self.config.width}x{self.config.height}px")
-                    else:
-                        self.update_status(f"✓ Map configured: {self.config.width}x{self.config.height}px")
-                else:
-                    self.update_status(f"✓ Map configured: {self.config.width}x{self.config.height}px\nTIP: Use F6 first for auto-calc")
-
-                # Re-enable click-through if it was on
-                if was_click_through:
-                    self.root.after(500, self.toggle_click_through)
-
-                return False
-
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        # Look for the map on screen first, corner clicks are the fallback. The
+        # full-screen grab and search run on the watcher thread, not the UI's
+        self.locating_map = True
+        self.update_status("🔍 Looking for the minimap...")
+        self.map_watcher.submit(self.map_watcher.locate,
+                                lambda location: self.pipeline.call_soon(self.finish_auto_locate, location))
+    
+    def finish_auto_locate(self, location):
+        """F9 search result: use the map found, else ask for corners (Tk thread)"""
+        self.locating_map = False
+        if self.clicks.active:
+            return
+        if location is not None:
+            self.apply_map_location(location)
+            return
+        self.begin_clicks(ClickSequence(
+            prompts=["Map not found automatically\nPress SHIFT+ALT, click TOP-LEFT...",
+                     "✓ Top-left set!\nPress SHIFT+ALT, click BOTTOM-RIGHT..."],
+            on_done=self.finish_corner_clicks))
+    
+    def finish_corner_clicks(self, points):
+        """Map corners from two clicks (Tk thread)"""
+        self.config.top_left, self.config.bottom_right = points
+        self.change_detector.reset()
+        self.player_center = None
+
+        # Auto-calculate map size if grid was measured
+        if self.config.is_grid_measured:
+            auto_size = self.config.auto_calculate_map_size()
+            if auto_size:
+                self.config.map_size_km = auto_size
+                self.config.map_size_manual = False
+                self.renderer.set(self.map_size_var, f"{auto_size:.1f}")
+                self.update_status(f"✓ Map configured! Auto-calc: {auto_size:.1f} km\n{self.config.width}x{self.config.height}px")
+            else:
+                self.update_status(f"✓ Map configured: {self.config.width}x{self.config.height}px")
+        else:
+            self.update_status(f"✓ Map configured: {self.config.width}x{self.config.height}px\nTIP: Use F6 first for auto-calc")
+        self.save_profile()
     
     def manual_measure(self):
         """Manual measurement"""
@@ -402,59 +688,26 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
             self.update_status("⚠ Setup map first (F9)")
             return
         
-        if self.is_measuring:
-            return
-        
-        # Temporarily disable click-through
-        was_click_through = self.click_through_mode
-        if was_click_through:
-            self.toggle_click_through()
-        
-        self.is_measuring = True
-        self.measuring_points = []
-        self.update_status("Press SHIFT+ALT, click FIRST point...")
-        
-        def on_click(x, y, button, pressed):
-            if not pressed:
-                return
-            
-            if not (self.config.top_left[0] <= x <= self.config.bottom_right[0] and
-                    self.config.top_left[1] <= y <= self.config.bottom_right[1]):
-                self.update_status("⚠ Click inside map!")
-                return
-            
-            self.measuring_points.append((x, y))
-            
-            if len(self.measuring_points) == 1:
-                self.update_status(f"✓ Point 1 set!\nPress SHIFT+ALT, click SECOND point...")
-            elif len(self.measuring_points) == 2:
-                self.calculate_distance()
-                self.is_measuring = False
-                
-                # Re-enable click-through if it was on
-                if was_click_through:
-                    self.root.after(500, self.toggle_click_through)
-                
-                return False
-        
-        from pynput import mouse
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
-    
-    def calculate_distance(self):
-        """Calculate distance"""
-        if len(self.measuring_points) != 2:
+        if self.clicks.active:
             return
         
-        p1, p2 = self.measuring_points
-        pixel_dist = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-        km_dist = self.config.pixels_to_km(pixel_dist)
-        meters_dist = km_dist * 1000
-        
-        if meters_dist >= 1000:
-            self.distance_var.set(f"{km_dist:.2f} km")
-        else:
-            self.distance_var.set(f"{int(meters_dist)} m")
+        self.begin_clicks(ClickSequence(
+            prompts=["Press SHIFT+ALT, click FIRST point...",
+                     "✓ Point 1 set!\nPress SHIFT+ALT, click SECOND point..."],
+            on_done=self.calculate_distance,
+            accept=self.inside_map, reject_message="⚠ Click inside map!"))
+    
+    def inside_map(self, x: int, y: int) -> bool:
+        """Whether a screen point lies on the configured map"""
+        return (self.config.top_left[0] <= x <= self.config.bottom_right[0] and
+                self.config.top_left[1] <= y <= self.config.bottom_right[1])
+    
+    def calculate_distance(self, points):
+        """Calculate distance between two clicked points (Tk thread)"""
+        p1, p2 = points
+        meters_dist = float(ranges_m(self.config, p1, p2))
+        self.renderer.set(self.distance_var, format_range(meters_dist))
+        self.record_reading('manual', self.map_point(p1), self.map_point(p2), meters_dist)
         
         self.update_status(f"✓ Distance: {int(meters_dist)}m")
     
@@ -465,72 +718,214 @@ TIP: Use SHIFT+ALT in-game to show cursor!"""
                 self.update_status("⚠ Setup map first (F9)")
             return
         
-        if not self.auto_scan_enabled:
-            self.update_status("🔍 Scanning...")
+        if self.auto_scan_enabled:
+            self.scheduler.request_scan()  # Scans now and restarts the pacing
+            return
         
+        self.update_status("🔍 Scanning...")
+        self.pipeline.request(manual=True)
+    
+    def map_bbox(self):
+        """Screen bbox of the configured map"""
+        return (
+            self.config.top_left[0],
+            self.config.top_left[1],
+            self.config.bottom_right[0],
+            self.config.bottom_right[1]
+        )
+    
+    def change_windows(self, bbox):
+        """Screen rects an auto-scan fingerprints before grabbing the whole map.
+
+        While the tracker has a lock only its window and the player icon's
+        are grabbed; without one (or when every marker is ranged) the full
+        map is, and that capture is then used for detection as well.
+        """
+        from marker_tracking import TRACK_WINDOW, roi_window
+        position = self.analyzer.position
+        if position is None or self.range_all_enabled:
+            return None
+        width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        windows = []
+        for center in (position, self.player_center):
+            if center is not None:
+                x, y, w, h = roi_window(center, TRACK_WINDOW, width, height)
+                windows.append((bbox[0] + x, bbox[1] + y, bbox[0] + x + w, bbox[1] + y + h))
+        return windows
+    
+    def capture_frame(self, manual: bool) -> Optional['FramePacket']:
+        """Pipeline capture stage (capture thread)"""
+        import numpy as np
+        from detection_pipeline import FramePacket
+        if not self.config.is_configured:
+            return None
+        bbox = self.map_bbox()
+        t0 = time.perf_counter()
+        windows = None if manual else self.change_windows(bbox)
+        if windows:
+            crops = [self.frame_source.grab(window) for window in windows]
+            if any(crop is None for crop in crops):
+                return None
+            frame = None
+            # Both windows are the same size, so they fingerprint as one image
+            sample = crops[0] if len(crops) == 1 else np.vstack(crops)
+        else:
+            frame = sample = self.frame_source.grab(bbox)
+            if frame is None:
+                return None
+        t1 = time.perf_counter()
+        self.metrics.record('capture', t1 - t0)
+        if not manual:
+            changed = self.change_detector.has_changed(sample)
+            now = time.perf_counter()
+            self.metrics.record('change', now - t1)
+            if not changed:
+                # Minimap unchanged: keep the previous reading, the marker hasn't moved
+                self.scheduler.record(now - t0, self.scheduler.position, now)
+                return None
+        if frame is None:
+            frame = self.frame_source.grab(bbox)  # Changed: detection needs the whole map
+            if frame is None:
+                return None
+        now = time.perf_counter()
+        return FramePacket(frame, bbox, now, manual, cost=now - t0)
+    
+    def detect_frame(self, packet: 'FramePacket'):
+        """Pipeline detect stage (detect thread)"""
+        start = time.perf_counter()
+        timings = {}
+        analysis = self.analyzer.analyze(packet.frame, packet.bbox, packet.captured_at,
+                                         self.range_all_enabled, timings)
+        if analysis is None:
+            return None  # Worker was restarting; the next scan retries
+        result, targets, player = analysis
+        self.player_center = player.center if player.found else None
+        
+        # Re-measure the grid now and then so zoom changes are picked up
+        if packet.bbox != self.grid_bbox:
+            self.grid_watcher.reset(self.config.grid_pixel_size)
+            self.grid_bbox = packet.bbox
+        pitch = self.grid_watcher.update(packet.frame, packet.captured_at)
+        if pitch is not None:
+            self.pipeline.call_soon(self.apply_grid_pitch, pitch, False)
+        
+        self.metrics.record_timings(timings)
+        elapsed = time.perf_counter() - start
+        self.metrics.record('detect', elapsed)
+        self.metrics.scan_done()
+        packet.cost += elapsed
+        return packet, result, targets, player
+    
+    def show_detection(self, detection):
+        """Pipeline UI stage (Tk thread)"""
+        start = time.perf_counter()
         try:
-            screenshot = ImageGrab.grab(bbox=(
-                self.config.top_left[0],
-                self.config.top_left[1],
-                self.config.bottom_right[0],
-                self.config.bottom_right[1]
-            ))
-            
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-            
-            lower_yellow = np.array([20, 100, 100])
-            upper_yellow = np.array([35, 255, 255])
-            
-            mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if not contours:
-                if not self.auto_scan_enabled:
-                    self.update_status("❌ No marker found")
-                    self.distance_var.set("---")
-                return
-            
-            largest_contour = max(contours, key=cv2.contourArea)
-            M = cv2.moments(largest_contour)
-            
-            if M["m00"] == 0:
-                return
-            
-            marker_x = int(M["m10"] / M["m00"])
-            marker_y = int(M["m01"] / M["m00"])
-            
-            player_x = self.config.width // 2
-            player_y = self.config.height // 2
-            
-            pixel_dist = np.sqrt((marker_x - player_x)**2 + (marker_y - player_y)**2)
-            km_dist = self.config.pixels_to_km(pixel_dist)
-            meters_dist = km_dist * 1000
-            
+            self.update_detection(*detection)
+        finally:
+            self.metrics.record('ui', time.perf_counter() - start)
+    
+    def update_detection(self, packet, result, targets, player):
+        """Show one detection's ranges"""
+        if 'first detection' not in self.startup.marks:
+            self.startup.mark('first detection')
+            print(self.startup.format())
+        if not self.config.is_configured or packet.bbox != self.map_bbox():
+            return  # Map was recalibrated while this frame was in flight
+        if self.scheduler.is_running:
+            # Auto-scan pacing from this frame's own position and cost
+            self.scheduler.record(packet.cost, result.center, packet.captured_at)
+        quiet = self.auto_scan_enabled and not packet.manual
+        
+        if targets is not None and self.range_all_enabled:
+            self.show_targets(targets, player)
+        
+        if not result.found:
+            if not quiet:
+                self.update_status("❌ No marker found")
+                self.renderer.set(self.distance_var, "---")
+            return
+        
+        if result.center is None:
+            return
+        
+        origin = self.player_position(player)
+        meters_dist = float(ranges_from_m(self.config, origin, result.center))
+        self.renderer.set(self.distance_var, format_range(meters_dist))
+        self.record_reading('detect' if packet.manual else 'auto', origin, result.center, meters_dist)
+        
+        if not quiet:
+            self.update_status(f"✓ Marker found: {int(meters_dist)}m")
+    
+    def show_targets(self, targets, player):
+        """Fill the range table, one line per tracked marker"""
+        if not targets:
+            self.renderer.set(self.targets_var, "No markers tracked")
+            return
+        
+        # All targets ranged in one call
+        ranges = ranges_from_m(self.config, self.player_position(player),
+                               [t.position for t in targets])
+        
+        lines = []
+        for target, meters_dist in zip(targets, ranges):
             if meters_dist >= 1000:
-                self.distance_var.set(f"{km_dist:.2f} km")
+                lines.append(f"#{target.id:<3} {meters_dist / 1000:6.2f} km")
             else:
-                self.distance_var.set(f"{int(meters_dist)} m")
-            
-            if not self.auto_scan_enabled:
-                self.update_status(f"✓ Marker found: {int(meters_dist)}m")
-                
-        except Exception as e:
-            if not self.auto_scan_enabled:
-                self.update_status(f"❌ Error: {str(e)[:30]}")
+                lines.append(f"#{target.id:<3} {int(meters_dist):6d} m")
+        self.renderer.set(self.targets_var, "\n".join(lines))
+    
+    def map_point(self, point):
+        """Screen point -> minimap pixels"""
+        return point[0] - self.config.top_left[0], point[1] - self.config.top_left[1]
+    
+    def record_reading(self, source: str, start, end, metres: float):
+        """Append a reading to the range history (Tk thread)"""
+        from range_history import config_id
+        if self.history is not None:
+            self.history.append(source, start, end, metres, config_id(self.config))
+    
+    def player_position(self, player):
+        """Player icon position, or the map centre if it wasn't found"""
+        if player is not None and player.found:
+            return player.center
+        return self.config.centre
+    
+    def show_detection_error(self, error: Exception):
+        """Pipeline error handler (Tk thread)"""
+        if not self.auto_scan_enabled:
+            self.update_status(f"❌ Error: {str(error)[:30]}")
     
     def cancel_operation(self):
         """Cancel operation"""
-        self.is_measuring = False
-        self.measuring_points = []
+        self.clicks.cancel()
         self.update_status("Operation cancelled")
     
     def run(self):
         """Start application"""
-        self.root.mainloop()
+        self.profiled('tk mainloop', self.root.mainloop)()
+        if self.history is not None:
+            self.history.close()
+        if self.analyzer is not None:
+            self.analyzer.close()
+    
+    def profiled(self, name: str, func):
+        """``func`` timed and sampled under ``name`` when profiling, else itself"""
+        if self.profiler is None:
+            return func
+        return self.profiler.wrap(name, func)
+
+
+def parse_args(argv=None):
+    from session_profiler import add_profile_arguments
+    parser = argparse.ArgumentParser(description="War Thunder Rangefinder - Advanced Edition")
+    parser.add_argument('--worker', action='store_true',
+                        help="Run detection in a separate process (restarted if it crashes)")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     print("=" * 60)
     print("War Thunder Rangefinder - Advanced Edition")
     print("=" * 60)
@@ -542,9 +937,18 @@ def main():
     print("✓ Lightweight and fast")
     print("\nStarting...")
     
-    app = AdvancedRangefinderOverlay()
-    app.run()
+    from session_profiler import profiler_from_args
+    profiler = profiler_from_args(args)
+    try:
+        app = AdvancedRangefinderOverlay(profiler=profiler, detect_worker=args.worker)
+        app.run()
+    finally:
+        if profiler is not None:
+            print(f"Profile report written to {profiler.stop()}")
 
 
 if __name__ == "__main__":
+    # Needed by the --worker process in the frozen executable
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()